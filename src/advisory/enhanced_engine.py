@@ -8,8 +8,7 @@ Enhanced Advisory Engine - Holdings + AI Only
 """
 
 import logging
-import time
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 import json
 
@@ -17,6 +16,11 @@ from adapters.holdings_provider import HoldingsOnlyProvider
 from advisory.enhanced_ai_advisor import EnhancedAIAdvisor, AdvisoryMode
 from config.user_config import get_user_config, UserConfiguration
 from data.historical_store import historical_store
+from utils.rate_limiter import TokenBucket
+
+# Relative so the class matches the one app.py registers its exception handler for,
+# whichever package root (advisory or src.advisory) this module was imported under
+from .errors import EngineError
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +34,12 @@ class EnhancedAdvisoryEngine:
         self.email_sender = email_sender  # Optional email sender
         self.override_advisory_mode = advisory_mode  # Override mode for specific analysis
         
+        # Client-side rate limits for outbound emails and LLM calls (shared across mode switches)
+        from config.settings import get_settings
+        settings = get_settings()
+        self.email_rate_limiter = TokenBucket(settings.EMAIL_RATE_PER_SEC, settings.EMAIL_RATE_BURST)
+        self.llm_rate_limiter = TokenBucket(settings.LLM_RATE_PER_SEC, settings.LLM_RATE_BURST)
+        
         # Initialize AI advisor (will be configured based on user preferences)
         self.ai_advisor = None
         self.user_config = get_user_config()
@@ -38,8 +48,8 @@ class EnhancedAdvisoryEngine:
     def _initialize_ai_advisor(self, mode: Optional[AdvisoryMode] = None):
         """Initialize AI advisor with user configuration"""
         try:
-            from config.settings import Settings
-            settings = Settings()
+            from config.settings import get_settings
+            settings = get_settings()
             
             # Map user config to advisory mode
             mode_mapping = {
@@ -69,7 +79,8 @@ class EnhancedAdvisoryEngine:
             self.ai_advisor = EnhancedAIAdvisor(
                 api_key=settings.LLM_API_KEY,
                 api_url=settings.LLM_PROVIDER,
-                mode=advisory_mode
+                mode=advisory_mode,
+                rate_limiter=self.llm_rate_limiter
             )
             
             logger.info(f"AI advisor initialized with mode: {advisory_mode.value}")
@@ -81,6 +92,8 @@ class EnhancedAdvisoryEngine:
     def generate_daily_advisory(self, save_to_history: bool = True, send_email: bool = True) -> Dict[str, Any]:
         """
         Generate comprehensive daily advisory analysis
+        
+        Raises EngineError when the holdings are unusable or generation fails.
         """
         try:
             logger.info("Starting daily advisory generation")
@@ -88,20 +101,13 @@ class EnhancedAdvisoryEngine:
             # Validate holdings file
             validation = self.holdings_provider.validate_holdings_file()
             if not validation['valid']:
-                return {
-                    "error": "Invalid holdings file",
-                    "validation_errors": validation['errors'],
-                    "timestamp": datetime.now().isoformat()
-                }
+                raise EngineError("Invalid holdings file", validation_errors=validation['errors'])
             
             # Load portfolio data
             portfolio_summary = self.holdings_provider.get_portfolio_summary()
             
             if portfolio_summary['total_positions'] == 0:
-                return {
-                    "error": "No positions found in portfolio",
-                    "timestamp": datetime.now().isoformat()
-                }
+                raise EngineError("No positions found in portfolio")
             
             # Generate main advisory analysis
             advisory_result = self.ai_advisor.generate_portfolio_advisory(
@@ -197,12 +203,11 @@ class EnhancedAdvisoryEngine:
             logger.info("Daily advisory generation completed successfully")
             return complete_analysis
             
+        except EngineError:
+            raise
         except Exception as e:
             logger.error(f"Error generating daily advisory: {e}")
-            return {
-                "error": f"Advisory generation failed: {e}",
-                "timestamp": datetime.now().isoformat()
-            }
+            raise EngineError(f"Advisory generation failed: {e}") from e
     
     def analyze_scenario(self, scenario_description: str) -> Dict[str, Any]:
         """
@@ -223,7 +228,7 @@ class EnhancedAdvisoryEngine:
             
         except Exception as e:
             logger.error(f"Error analyzing scenario: {e}")
-            return {"error": f"Scenario analysis failed: {e}"}
+            raise EngineError(f"Scenario analysis failed: {e}") from e
     
     def get_position_analysis(self, ticker: str) -> Dict[str, Any]:
         """
@@ -240,7 +245,7 @@ class EnhancedAdvisoryEngine:
                     break
             
             if not position:
-                return {"error": f"Position {ticker} not found in portfolio"}
+                raise EngineError(f"Position {ticker} not found in portfolio", status_code=404)
             
             # Get AI analysis for this specific position
             position_context = {
@@ -277,9 +282,11 @@ class EnhancedAdvisoryEngine:
                 "analyzed_at": datetime.now().isoformat()
             }
             
+        except EngineError:
+            raise
         except Exception as e:
             logger.error(f"Error analyzing position {ticker}: {e}")
-            return {"error": f"Position analysis failed: {e}"}
+            raise EngineError(f"Position analysis failed: {e}") from e
     
     def get_portfolio_evolution(self, days: int = 30) -> Dict[str, Any]:
         """
@@ -290,7 +297,7 @@ class EnhancedAdvisoryEngine:
             owner = portfolio_summary.get('owner', 'unknown')
             
             # Get historical data
-            history = historical_store.get_portfolio_history(owner, days)
+            history = historical_store.get_portfolio_history(owner, days, include_payload=False)
             metrics = historical_store.calculate_portfolio_metrics(owner)
             
             return {
@@ -305,7 +312,7 @@ class EnhancedAdvisoryEngine:
             
         except Exception as e:
             logger.error(f"Error getting portfolio evolution: {e}")
-            return {"error": f"Portfolio evolution analysis failed: {e}"}
+            raise EngineError(f"Portfolio evolution analysis failed: {e}") from e
     
     def update_advisory_mode(self, new_mode: str) -> bool:
         """
@@ -630,6 +637,11 @@ class EnhancedAdvisoryEngine:
             
             # Create subject (already set above)
             
+            # Pace sends to the provider's quota instead of a fixed delay between emails
+            delay = self.email_rate_limiter.wait()
+            if delay:
+                logger.info(f"⏳ Email rate limit: waited {delay:.1f}s before sending")
+            
             # Send email using the email sender's base method
             return self.email_sender.send_email(recipient, subject, html_content)
             
@@ -637,204 +649,102 @@ class EnhancedAdvisoryEngine:
             logger.error(f"Error sending simple AI advisory email: {e}")
             return False
 
-    def generate_dual_advisory_with_emails(self, save_to_history: bool = True, 
-                                         email_recipient: str = None) -> Dict[str, Any]:
+    def _generate_multi_mode(self, steps: List[Tuple[str, AdvisoryMode, str]], label: str,
+                             save_to_history: bool = True, email_recipient: str = None,
+                             send_advisory_email: bool = True) -> Dict[str, Any]:
         """
-        Generate both regular advisory and Entry & Exit Strategy analysis, then send both emails
+        Generate one advisory per mode and send one email for each
+        
+        steps: (result key, advisory mode, display name) tuples, in send order.
+        The same AI advisor instance is reused; only its mode is swapped.
         """
         try:
-            logger.info("Starting dual advisory generation (Regular + Entry & Exit Strategy)")
-            
-            results = {
-                "success": False,
-                "regular_advisory": {},
-                "entry_exit_advisory": {},
-                "emails_sent": {
-                    "regular": False,
-                    "entry_exit": False
-                },
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            # Store original mode
-            original_mode = self.ai_advisor.mode if hasattr(self, 'ai_advisor') else None
-            
-            # 1. Generate Regular Advisory (Long-term by default)
-            logger.info("Generating regular advisory analysis...")
-            self._initialize_ai_advisor(AdvisoryMode.LONG_TERM)
-            regular_advisory = self.generate_daily_advisory(save_to_history=save_to_history)
-            results["regular_advisory"] = regular_advisory
-            
-            # Send regular advisory email
-            if email_recipient and regular_advisory.get("success"):
-                logger.info(f"📧 STEP 1: Sending regular advisory email to {email_recipient}")
-                # Extract the needed data from regular_advisory
-                portfolio_data = regular_advisory.get("portfolio_data", {})
-                main_advisory = regular_advisory.get("main_advisory", {})
-                additional_analyses = regular_advisory.get("additional_analyses", {})
-                
-                email_sent = self._send_simple_ai_advisory_email(
-                    main_advisory=main_advisory,
-                    additional_analyses=additional_analyses,
-                    portfolio_data=portfolio_data,
-                    analysis=regular_advisory,
-                    recipient=email_recipient
-                )
-                results["emails_sent"]["regular"] = email_sent
-                logger.info(f"✅ Regular advisory email sent: {email_sent}")
-                
-                # Wait 3 seconds between emails (tuần tự - sequential)
-                if email_sent:
-                    logger.info("⏳ Waiting 3 seconds before sending next email...")
-                    time.sleep(3)
-            
-            # 2. Generate Entry & Exit Strategy Advisory
-            logger.info("📊 STEP 2: Generating Entry & Exit Strategy analysis...")
-            self._initialize_ai_advisor(AdvisoryMode.ENTRY_EXIT_STRATEGY)
-            entry_exit_advisory = self.generate_daily_advisory(save_to_history=save_to_history)
-            results["entry_exit_advisory"] = entry_exit_advisory
-            
-            # Send Entry & Exit Strategy email
-            if email_recipient and entry_exit_advisory.get("success"):
-                logger.info(f"📧 STEP 2: Sending Entry & Exit Strategy email to {email_recipient}")
-                # Extract the needed data from entry_exit_advisory
-                portfolio_data = entry_exit_advisory.get("portfolio_data", {})
-                main_advisory = entry_exit_advisory.get("main_advisory", {})
-                additional_analyses = entry_exit_advisory.get("additional_analyses", {})
-                
-                email_sent = self._send_simple_ai_advisory_email(
-                    main_advisory=main_advisory,
-                    additional_analyses=additional_analyses,
-                    portfolio_data=portfolio_data,
-                    analysis=entry_exit_advisory,
-                    recipient=email_recipient
-                )
-                results["emails_sent"]["entry_exit"] = email_sent
-                logger.info(f"✅ Entry & Exit Strategy email sent: {email_sent}")
-            
-            # Restore original mode if it existed
-            if original_mode:
-                self._initialize_ai_advisor(original_mode)
+            results = {"success": False}
+            for key, _, _ in steps:
+                results[f"{key}_advisory"] = {}
+            results["emails_sent"] = {key: False for key, _, _ in steps}
+            results["timestamp"] = datetime.now().isoformat()
+            
+            # Store original mode so it can be restored afterwards
+            original_mode = self.ai_advisor.mode
+            
+            advisories = []
+            try:
+                for step, (key, mode, name) in enumerate(steps, start=1):
+                    logger.info(f"📊 STEP {step}: Generating {name} analysis...")
+                    self.ai_advisor.set_advisory_mode(mode)
+                    try:
+                        advisory = self.generate_daily_advisory(save_to_history=save_to_history,
+                                                                send_email=send_advisory_email)
+                    except EngineError as e:
+                        # Record the failure and still run the remaining modes
+                        advisory = {"success": False, "error": str(e), **e.details}
+                    results[f"{key}_advisory"] = advisory
+                    advisories.append(advisory)
+                    
+                    # Send this mode's email
+                    if email_recipient and advisory.get("success"):
+                        logger.info(f"📧 STEP {step}: Sending {name} email to {email_recipient}")
+                        email_sent = self._send_simple_ai_advisory_email(
+                            main_advisory=advisory.get("main_advisory", {}),
+                            additional_analyses=advisory.get("additional_analyses", {}),
+                            portfolio_data=advisory.get("portfolio_data", {}),
+                            analysis=advisory,
+                            recipient=email_recipient
+                        )
+                        results["emails_sent"][key] = email_sent
+                        logger.info(f"✅ {name} email sent: {email_sent}")
+            finally:
+                self.ai_advisor.set_advisory_mode(original_mode)
             
             # Update success status
-            results["success"] = (
-                regular_advisory.get("success", False) and 
-                entry_exit_advisory.get("success", False)
-            )
+            results["success"] = all(advisory.get("success", False) for advisory in advisories)
             
             # Summary
-            total_holdings = regular_advisory.get("holdings_count", 0)
+            total_holdings = advisories[0].get("holdings_count", 0) if advisories else 0
             emails_sent_count = sum(results["emails_sent"].values())
             
-            logger.info(f"Dual advisory completed - Holdings: {total_holdings}, Emails sent: {emails_sent_count}/2")
+            logger.info(f"{label} completed - Holdings: {total_holdings}, Emails sent: {emails_sent_count}/{len(steps)}")
             
             return results
             
         except Exception as e:
-            logger.error(f"Error in dual advisory generation: {e}")
+            logger.error(f"Error in {label}: {e}")
             return {
                 "success": False,
                 "error": str(e),
                 "timestamp": datetime.now().isoformat()
             }
+
+    def generate_dual_advisory_with_emails(self, save_to_history: bool = True, 
+                                         email_recipient: str = None) -> Dict[str, Any]:
+        """
+        Generate both regular advisory and Entry & Exit Strategy analysis, then send both emails
+        """
+        logger.info("Starting dual advisory generation (Regular + Entry & Exit Strategy)")
+        return self._generate_multi_mode(
+            [
+                ("regular", AdvisoryMode.LONG_TERM, "Regular advisory"),
+                ("entry_exit", AdvisoryMode.ENTRY_EXIT_STRATEGY, "Entry & Exit Strategy"),
+            ],
+            label="Dual advisory",
+            save_to_history=save_to_history,
+            email_recipient=email_recipient
+        )
     
     def generate_entry_exit_and_risk_analysis(self, save_to_history: bool = True, 
                                              email_recipient: str = None) -> Dict[str, Any]:
         """
         Generate Entry & Exit Strategy and Risk & Volatility analysis, then send both emails
         """
-        try:
-            logger.info("Starting Entry & Exit Strategy + Risk & Volatility analysis")
-            
-            results = {
-                "success": False,
-                "entry_exit_advisory": {},
-                "risk_volatility_advisory": {},
-                "emails_sent": {
-                    "entry_exit": False,
-                    "risk_volatility": False
-                },
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            # Store original mode
-            original_mode = self.ai_advisor.mode if hasattr(self, 'ai_advisor') else None
-            
-            # 1. Generate Entry & Exit Strategy Advisory
-            logger.info("📊 STEP 1: Generating Entry & Exit Strategy analysis...")
-            self._initialize_ai_advisor(AdvisoryMode.ENTRY_EXIT_STRATEGY)
-            entry_exit_advisory = self.generate_daily_advisory(save_to_history=save_to_history, send_email=False)
-            results["entry_exit_advisory"] = entry_exit_advisory
-            
-            # Send Entry & Exit Strategy email
-            if email_recipient and entry_exit_advisory.get("success"):
-                logger.info(f"📧 STEP 1: Sending Entry & Exit Strategy email to {email_recipient}")
-                # Extract the needed data from entry_exit_advisory
-                portfolio_data = entry_exit_advisory.get("portfolio_data", {})
-                main_advisory = entry_exit_advisory.get("main_advisory", {})
-                additional_analyses = entry_exit_advisory.get("additional_analyses", {})
-                
-                email_sent = self._send_simple_ai_advisory_email(
-                    main_advisory=main_advisory,
-                    additional_analyses=additional_analyses,
-                    portfolio_data=portfolio_data,
-                    analysis=entry_exit_advisory,
-                    recipient=email_recipient
-                )
-                results["emails_sent"]["entry_exit"] = email_sent
-                logger.info(f"✅ Entry & Exit Strategy email sent: {email_sent}")
-                
-                # Wait 3 seconds between emails (tuần tự - sequential)
-                if email_sent:
-                    logger.info("⏳ Waiting 3 seconds before sending next email...")
-                    time.sleep(3)
-            
-            # 2. Generate Risk & Volatility Advisory  
-            logger.info("📊 STEP 2: Generating Risk & Volatility analysis...")
-            self._initialize_ai_advisor(AdvisoryMode.RISK_VOLATILITY)
-            risk_volatility_advisory = self.generate_daily_advisory(save_to_history=save_to_history, send_email=False)
-            results["risk_volatility_advisory"] = risk_volatility_advisory
-            
-            # Send Risk & Volatility email
-            if email_recipient and risk_volatility_advisory.get("success"):
-                logger.info(f"📧 STEP 2: Sending Risk & Volatility email to {email_recipient}")
-                # Extract the needed data from risk_volatility_advisory
-                portfolio_data = risk_volatility_advisory.get("portfolio_data", {})
-                main_advisory = risk_volatility_advisory.get("main_advisory", {})
-                additional_analyses = risk_volatility_advisory.get("additional_analyses", {})
-                
-                email_sent = self._send_simple_ai_advisory_email(
-                    main_advisory=main_advisory,
-                    additional_analyses=additional_analyses,
-                    portfolio_data=portfolio_data,
-                    analysis=risk_volatility_advisory,
-                    recipient=email_recipient
-                )
-                results["emails_sent"]["risk_volatility"] = email_sent
-                logger.info(f"✅ Risk & Volatility email sent: {email_sent}")
-            
-            # Restore original mode if it existed
-            if original_mode:
-                self._initialize_ai_advisor(original_mode)
-            
-            # Update success status
-            results["success"] = (
-                entry_exit_advisory.get("success", False) and 
-                risk_volatility_advisory.get("success", False)
-            )
-            
-            # Summary
-            total_holdings = entry_exit_advisory.get("holdings_count", 0)
-            emails_sent_count = sum(results["emails_sent"].values())
-            
-            logger.info(f"Entry & Exit + Risk & Volatility analysis completed - Holdings: {total_holdings}, Emails sent: {emails_sent_count}/2")
-            
-            return results
-            
-        except Exception as e:
-            logger.error(f"Error in Entry & Exit + Risk & Volatility analysis: {e}")
-            return {
-                "success": False,
-                "error": str(e),
-                "timestamp": datetime.now().isoformat()
-            }
+        logger.info("Starting Entry & Exit Strategy + Risk & Volatility analysis")
+        return self._generate_multi_mode(
+            [
+                ("entry_exit", AdvisoryMode.ENTRY_EXIT_STRATEGY, "Entry & Exit Strategy"),
+                ("risk_volatility", AdvisoryMode.RISK_VOLATILITY, "Risk & Volatility"),
+            ],
+            label="Entry & Exit + Risk & Volatility analysis",
+            save_to_history=save_to_history,
+            email_recipient=email_recipient,
+            send_advisory_email=False
+        )
@@ -0,0 +1,21 @@
+"""
+Advisory engine exceptions
+"""
+
+from typing import Any, Optional
+
+
+class EngineError(Exception):
+    """
+    Advisory engine failure
+
+    status_code is the HTTP status the API answers with; extra keyword
+    arguments are returned alongside the error message.
+    """
+    status_code = 500
+
+    def __init__(self, message: str, status_code: Optional[int] = None, **details: Any):
+        super().__init__(message)
+        if status_code is not None:
+            self.status_code = status_code
+        self.details = details
@@ -1,50 +1,92 @@
-import pandas as pd
 import numpy as np
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Sequence, Union
 import logging
 
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:  # Numba is optional; the kernels below then run as plain Python
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
 logger = logging.getLogger(__name__)
 
+# Price series may be passed as plain lists or as pre-converted float64 arrays
+PriceSeries = Union[Sequence[float], np.ndarray]
+
+# SMA trend keyed by the signs of (price - sma20, sma20 - sma50, sma50 - sma200); anything else is neutral
+SMA_TREND_TABLE = {
+    (1, 1, 1): "strong_up",
+    (1, 1, 0): "up",
+    (1, 1, -1): "up",
+    (-1, -1, -1): "strong_down",
+    (-1, -1, 0): "down",
+    (-1, -1, 1): "down",
+}
+
+@njit(fastmath=True)
+def _macd_kernel(values, fast, slow, signal):
+    """
+    Fast/slow/signal EMAs in a single pass, equivalent to pandas ewm(span=...).mean() (adjust=True)
+    
+    Returns the latest (macd, signal, histogram) and the previous histogram value.
+    """
+    fast_decay = 1 - 2 / (fast + 1)
+    slow_decay = 1 - 2 / (slow + 1)
+    signal_decay = 1 - 2 / (signal + 1)
+    fast_sum = fast_weight = 0.0
+    slow_sum = slow_weight = 0.0
+    signal_sum = signal_weight = 0.0
+    macd = signal_value = histogram = prev_histogram = 0.0
+    for i in range(len(values)):
+        fast_sum = values[i] + fast_decay * fast_sum
+        fast_weight = 1.0 + fast_decay * fast_weight
+        slow_sum = values[i] + slow_decay * slow_sum
+        slow_weight = 1.0 + slow_decay * slow_weight
+        macd = fast_sum / fast_weight - slow_sum / slow_weight
+        
+        signal_sum = macd + signal_decay * signal_sum
+        signal_weight = 1.0 + signal_decay * signal_weight
+        signal_value = signal_sum / signal_weight
+        
+        prev_histogram = histogram
+        histogram = macd - signal_value
+    return macd, signal_value, histogram, prev_histogram
+
 class TechnicalIndicators:
     """Calculate technical indicators for Vietnam stock analysis"""
     
     @staticmethod
-    def calculate_rsi(prices: List[float], period: int = 14) -> Optional[float]:
+    def calculate_rsi(prices: PriceSeries, period: int = 14) -> Optional[float]:
         """Calculate RSI (Relative Strength Index)"""
         if len(prices) < period + 1:
             return None
         
-        deltas = np.diff(prices)
-        gains = np.where(deltas > 0, deltas, 0)
-        losses = np.where(deltas < 0, -deltas, 0)
-        
-        avg_gain = np.mean(gains[-period:])
-        avg_loss = np.mean(losses[-period:])
+        # Only the last period deltas are averaged, so only the last period + 1 prices are converted
+        deltas = np.diff(np.asarray(prices[-(period + 1):], dtype=np.float64))
+        avg_gain = np.maximum(deltas, 0.0).mean()
+        avg_loss = np.maximum(-deltas, 0.0).mean()
         
         if avg_loss == 0:
             return 100
         
         rs = avg_gain / avg_loss
         rsi = 100 - (100 / (1 + rs))
-        return round(rsi, 2)
+        return round(float(rsi), 2)
     
     @staticmethod
-    def calculate_macd(prices: List[float], fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, float]:
+    def calculate_macd(prices: PriceSeries, fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, float]:
         """Calculate MACD (Moving Average Convergence Divergence)"""
         if len(prices) < slow:
             return {"value": 0, "signal": 0, "histogram": 0, "crossover": "neutral"}
         
-        df = pd.DataFrame({'price': prices})
-        df['ema_fast'] = df['price'].ewm(span=fast).mean()
-        df['ema_slow'] = df['price'].ewm(span=slow).mean()
-        df['macd'] = df['ema_fast'] - df['ema_slow']
-        df['signal'] = df['macd'].ewm(span=signal).mean()
-        df['histogram'] = df['macd'] - df['signal']
-        
-        current_macd = df['macd'].iloc[-1]
-        current_signal = df['signal'].iloc[-1]
-        current_hist = df['histogram'].iloc[-1]
-        prev_hist = df['histogram'].iloc[-2] if len(df) > 1 else 0
+        arr = np.asarray(prices, dtype=np.float64)
+        macd, signal_line, current_hist, prev_hist = _macd_kernel(arr, fast, slow, signal)
+        current_macd, current_signal, rounded_hist = np.round([macd, signal_line, current_hist], 2).tolist()
         
         # Determine crossover
         crossover = "neutral"
@@ -54,26 +96,31 @@ class TechnicalIndicators:
             crossover = "bearish"
         
         return {
-            "value": round(current_macd, 2),
-            "signal": round(current_signal, 2),
-            "histogram": round(current_hist, 2),
+            "value": current_macd,
+            "signal": current_signal,
+            "histogram": rounded_hist,
             "crossover": crossover
         }
     
     @staticmethod
-    def calculate_sma(prices: List[float], periods: List[int] = [20, 50, 200]) -> Dict[str, Any]:
+    def calculate_sma(prices: PriceSeries, periods: List[int] = [20, 50, 200]) -> Dict[str, Any]:
         """Calculate Simple Moving Averages"""
         result = {}
         
+        # One reverse running sum over the longest window serves every period
+        available = [p for p in periods if len(prices) >= p]
+        sma_values = {}
+        if available:
+            tail = np.asarray(prices[-max(available):], dtype=np.float64)
+            rev_cumsum = np.cumsum(tail[::-1])
+            windows = np.asarray(available)
+            sma_values = dict(zip(available, np.round(rev_cumsum[windows - 1] / windows, 2).tolist()))
+        
         for period in periods:
-            if len(prices) >= period:
-                sma_value = np.mean(prices[-period:])
-                result[f'sma{period}'] = round(sma_value, 2)
-            else:
-                result[f'sma{period}'] = None
+            result[f'sma{period}'] = sma_values.get(period)
         
         # Determine trend
-        current_price = prices[-1] if prices else 0
+        current_price = float(prices[-1]) if len(prices) else 0
         trend = "neutral"
         
         if all(result.get(f'sma{p}') for p in periods):
@@ -81,31 +128,29 @@ class TechnicalIndicators:
             sma50 = result.get('sma50', 0)
             sma200 = result.get('sma200', 0)
             
-            if current_price > sma20 > sma50 > sma200:
-                trend = "strong_up"
-            elif current_price > sma20 > sma50:
-                trend = "up"
-            elif current_price < sma20 < sma50 < sma200:
-                trend = "strong_down"
-            elif current_price < sma20 < sma50:
-                trend = "down"
+            signs = (
+                (current_price > sma20) - (current_price < sma20),
+                (sma20 > sma50) - (sma20 < sma50),
+                (sma50 > sma200) - (sma50 < sma200)
+            )
+            trend = SMA_TREND_TABLE.get(signs, "neutral")
         
         result['trend'] = trend
         return result
     
     @staticmethod
-    def calculate_bollinger_bands(prices: List[float], period: int = 20, std_dev: int = 2) -> Dict[str, float]:
+    def calculate_bollinger_bands(prices: PriceSeries, period: int = 20, std_dev: int = 2) -> Dict[str, float]:
         """Calculate Bollinger Bands"""
         if len(prices) < period:
             return {"upper": 0, "middle": 0, "lower": 0, "position": 0}
         
-        recent_prices = prices[-period:]
-        sma = np.mean(recent_prices)
-        std = np.std(recent_prices)
+        recent_prices = np.asarray(prices[-period:], dtype=np.float64)
+        sma = recent_prices.mean()
+        std = recent_prices.std()  # Population std (ddof=0)
         
         upper = sma + (std_dev * std)
         lower = sma - (std_dev * std)
-        current_price = prices[-1]
+        current_price = recent_prices[-1]
         
         # Calculate position within bands (0 = lower band, 1 = upper band)
         if upper != lower:
@@ -113,21 +158,24 @@ class TechnicalIndicators:
         else:
             position = 0.5
         
+        upper, sma, lower, position = np.round([upper, sma, lower, position], 2).tolist()
         return {
-            "upper": round(upper, 2),
-            "middle": round(sma, 2),
-            "lower": round(lower, 2),
-            "position": round(position, 2)
+            "upper": upper,
+            "middle": sma,
+            "lower": lower,
+            "position": position
         }
     
     @staticmethod
-    def calculate_volume_indicators(volumes: List[float], prices: List[float]) -> Dict[str, Any]:
+    def calculate_volume_indicators(volumes: PriceSeries, prices: PriceSeries) -> Dict[str, Any]:
         """Calculate volume-based indicators"""
         if len(volumes) < 20:
             return {"avg_volume_20d": 0, "volume_ratio": 1.0, "volume_spike": False}
         
-        avg_volume_20d = np.mean(volumes[-20:])
-        current_volume = volumes[-1] if volumes else 0
+        # No copy when analyze_stock already passes a float64 array
+        recent_volumes = np.asarray(volumes[-20:], dtype=np.float64)
+        avg_volume_20d = float(recent_volumes.mean())
+        current_volume = float(recent_volumes[-1])
         volume_ratio = current_volume / avg_volume_20d if avg_volume_20d > 0 else 1.0
         
         return {
@@ -137,21 +185,21 @@ class TechnicalIndicators:
         }
     
     @staticmethod
-    def calculate_support_resistance(prices: List[float], period: int = 20) -> Dict[str, List[float]]:
+    def calculate_support_resistance(prices: PriceSeries, period: int = 20) -> Dict[str, List[float]]:
         """Calculate basic support and resistance levels"""
         if len(prices) < period:
             return {"support": [], "resistance": []}
         
-        recent_prices = prices[-period:]
+        recent_prices = np.asarray(prices[-period:], dtype=np.float64)
         
-        # Simple approach: use recent highs and lows
-        sorted_prices = sorted(recent_prices)
-        support_levels = sorted_prices[:3]  # Bottom 3 prices
-        resistance_levels = sorted_prices[-3:]  # Top 3 prices
+        # Simple approach: use recent highs and lows, selected without a full sort
+        k = min(3, recent_prices.size)
+        support_levels = np.sort(np.partition(recent_prices, k - 1)[:k])  # Bottom 3 prices
+        resistance_levels = np.sort(np.partition(recent_prices, recent_prices.size - k)[-k:])  # Top 3 prices
         
         return {
-            "support": [round(p, 2) for p in support_levels],
-            "resistance": [round(p, 2) for p in resistance_levels]
+            "support": support_levels.round(2).tolist(),
+            "resistance": resistance_levels.round(2).tolist()
         }
     
     @classmethod
@@ -160,36 +208,41 @@ class TechnicalIndicators:
         try:
             prices = ohlcv_data.get('close', [])
             volumes = ohlcv_data.get('volume', [])
-            highs = ohlcv_data.get('high', [])
-            lows = ohlcv_data.get('low', [])
             
-            if not prices:
+            if len(prices) == 0:
                 return {}
             
+            # Convert once; every indicator below works on views of these arrays
+            close = np.ascontiguousarray(prices, dtype=np.float64)
+            volume = np.asarray(volumes, dtype=np.float64)
+            
             analysis = {
-                "rsi14": cls.calculate_rsi(prices, 14),
-                "macd": cls.calculate_macd(prices),
-                "sma": cls.calculate_sma(prices),
-                "bollinger": cls.calculate_bollinger_bands(prices),
-                "volume": cls.calculate_volume_indicators(volumes, prices),
-                "support_resistance": cls.calculate_support_resistance(prices)
+                "rsi14": cls.calculate_rsi(close, 14),
+                "macd": cls.calculate_macd(close),
+                "sma": cls.calculate_sma(close),
+                "bollinger": cls.calculate_bollinger_bands(close),
+                "volume": cls.calculate_volume_indicators(volume, close),
+                "support_resistance": cls.calculate_support_resistance(close)
             }
             
             # Add price change calculations
             if len(prices) >= 2:
+                changes = [((close[-1] / close[-n]) - 1) * 100 if len(close) >= n else 0 for n in (2, 5, 20)]
+                change_1d, change_5d, change_20d = np.round(changes, 2).tolist()
                 analysis["price_change"] = {
-                    "1d_pct": round(((prices[-1] / prices[-2]) - 1) * 100, 2),
-                    "5d_pct": round(((prices[-1] / prices[-5]) - 1) * 100, 2) if len(prices) >= 5 else 0,
-                    "20d_pct": round(((prices[-1] / prices[-20]) - 1) * 100, 2) if len(prices) >= 20 else 0
+                    "1d_pct": change_1d,
+                    "5d_pct": change_5d,
+                    "20d_pct": change_20d
                 }
             
             # Calculate 52-week high/low if we have enough data
             if len(prices) >= 252:  # Approximately 1 year of trading days
-                year_prices = prices[-252:]
+                year_prices = close[-252:]
+                year_low, year_high = float(year_prices.min()), float(year_prices.max())
                 analysis["52_week"] = {
-                    "high": max(year_prices),
-                    "low": min(year_prices),
-                    "position_pct": round(((prices[-1] - min(year_prices)) / (max(year_prices) - min(year_prices))) * 100, 2)
+                    "high": year_high,
+                    "low": year_low,
+                    "position_pct": round(((float(close[-1]) - year_low) / (year_high - year_low)) * 100, 2)
                 }
             
             return analysis
@@ -198,14 +251,19 @@ class TechnicalIndicators:
             logger.error(f"Error in technical analysis: {e}")
             return {}
 
+@njit(fastmath=True)
+def _ema_kernel(prices, window):
+    out = np.empty(len(prices) - window + 1)
+    out[0] = prices[:window].mean()
+    k = 2 / (window + 1)
+    for i in range(window, len(prices)):
+        out[i - window + 1] = (prices[i] - out[i - window]) * k + out[i - window]
+    return out
+
 def calculate_ema(prices, window):
     if len(prices) < window:
         return None
-    k = 2 / (window + 1)
-    ema = [sum(prices[:window]) / window]
-    for price in prices[window:]:
-        ema.append((price - ema[-1]) * k + ema[-1])
-    return ema
+    return _ema_kernel(np.asarray(prices, dtype=np.float64), window).tolist()
 
 def calculate_sma(prices, window):
     if len(prices) < window:
@@ -227,14 +285,23 @@ def calculate_volume_spike(current_volume, historical_volumes):
     average_volume = sum(historical_volumes) / len(historical_volumes)
     return current_volume / average_volume if average_volume > 0 else None
 
-def calculate_drawdown(prices):
-    if len(prices) == 0:
-        return None
+# No fastmath here: the drawdown divides by the running peak, which must be checked for 0
+@njit
+def _drawdown_kernel(prices):
     peak = prices[0]
-    max_drawdown = 0
-    for price in prices:
+    max_drawdown = 0.0
+    for i in range(len(prices)):
+        price = prices[i]
         if price > peak:
             peak = price
+        if peak <= 0:
+            continue
         drawdown = (peak - price) / peak
-        max_drawdown = max(max_drawdown, drawdown)
-    return max_drawdown
\ No newline at end of file
+        if drawdown > max_drawdown:
+            max_drawdown = drawdown
+    return max_drawdown
+
+def calculate_drawdown(prices):
+    if len(prices) == 0:
+        return None
+    return float(_drawdown_kernel(np.asarray(prices, dtype=np.float64)))
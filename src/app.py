@@ -5,32 +5,76 @@ Enhanced background app for Vietnam stock analysis with AI-only advisory.
 """
 
 import asyncio
+import functools
+import importlib.util
 import logging
+import os
 import signal
 import sys
-from pathlib import Path
-from typing import Dict, Any
+import time
+from typing import Dict, Any, Optional, Tuple, TYPE_CHECKING
 
 from fastapi import FastAPI, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+import orjson
 import uvicorn
 
 from .config.settings import settings
-from .advisory.enhanced_engine import EnhancedAdvisoryEngine
-from .config.user_config import get_user_config
-from .data.historical_store import historical_store
+from .advisory.errors import EngineError
+from .email_service.sender import EmailSender, DryRunEmailSender
+from .utils.response_cache import ResponseCacheMiddleware
+
+# The engine, user config and historical store pull in pandas/numpy, the LLM client and
+# SQLite setup, so they are imported where first used to keep worker start-up light
+if TYPE_CHECKING:
+    from .advisory.enhanced_engine import EnhancedAdvisoryEngine
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
+def create_email_sender() -> EmailSender:
+    """Build the process-wide email sender from settings"""
+    if settings.DRY_RUN:
+        return DryRunEmailSender()
+    
+    return EmailSender(
+        smtp_host=settings.SMTP_HOST,
+        smtp_port=settings.SMTP_PORT,
+        smtp_user=settings.SMTP_USER,
+        smtp_pass=settings.SMTP_PASS,
+        mail_from=settings.MAIL_FROM,
+        smtp_tls=settings.SMTP_TLS,
+        pool_size=settings.SMTP_POOL_SIZE,
+        max_messages_per_connection=settings.SMTP_MAX_MESSAGES_PER_CONNECTION,
+        api_log=settings.SMTP_API_LOG
+    )
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking engine call (LLM HTTP, SQLite, file I/O) in the default thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+RUNTIME_DIRS = ("logs", "output", "data", "config")
+_runtime_dirs_ready = False
+
+def ensure_runtime_dirs():
+    """Create the working directories once per process"""
+    global _runtime_dirs_ready
+    if _runtime_dirs_ready:
+        return
+    for directory in RUNTIME_DIRS:
+        os.makedirs(directory, exist_ok=True)
+    _runtime_dirs_ready = True
+
 # Global advisory engine instance
-advisory_engine: EnhancedAdvisoryEngine = None
+advisory_engine: Optional["EnhancedAdvisoryEngine"] = None
 
 # FastAPI app for API endpoints and dashboard
 app = FastAPI(
     title="VN Stock Advisory - Enhanced AI System",
     description="Vietnam Stock Advisory with AI-Only Analysis",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=ORJSONResponse  # Large nested advisory payloads serialize much faster
 )
 
 @app.on_event("startup")
@@ -39,20 +83,29 @@ async def startup_event():
     global advisory_engine
     
     try:
+        from .advisory.enhanced_engine import EnhancedAdvisoryEngine
+        from .data.historical_store import historical_store
+        
         logger.info("Starting Enhanced VN Stock Advisory System...")
         
         # Ensure required directories exist
-        Path("logs").mkdir(exist_ok=True)
-        Path("output").mkdir(exist_ok=True)
-        Path("data").mkdir(exist_ok=True)
-        Path("config").mkdir(exist_ok=True)
+        ensure_runtime_dirs()
+        
+        # One long-lived sender whose pooled SMTP sessions are reused for the app's lifetime
+        app.state.email_sender = create_email_sender()
         
         # Initialize advisory engine
-        advisory_engine = EnhancedAdvisoryEngine()
+        advisory_engine = EnhancedAdvisoryEngine(email_sender=app.state.email_sender)
         
         # Initialize historical database
         historical_store.initialize_database()
         
+        # Open (TLS + AUTH) the first SMTP session off the event loop so the first send doesn't pay for it
+        if not settings.DRY_RUN:
+            loop = asyncio.get_running_loop()
+            if not await loop.run_in_executor(None, app.state.email_sender.test_connection):
+                logger.warning("Email connection test failed")
+        
         logger.info("Enhanced VN Stock Advisory System started successfully")
         
     except Exception as e:
@@ -63,78 +116,147 @@ async def startup_event():
 async def shutdown_event():
     """Gracefully shutdown the system"""
     logger.info("Shutting down Enhanced VN Stock Advisory System...")
+    
+    # Release pooled SMTP sessions
+    email_sender = getattr(app.state, "email_sender", None)
+    if email_sender:
+        await asyncio.get_running_loop().run_in_executor(None, email_sender.close)
+    
+    from .data.historical_store import historical_store
+    historical_store.close()
+
+class EngineReadyMiddleware:
+    """
+    Pure ASGI guard that answers 503 for engine-backed routes until startup has finished
+    
+    Runs before routing, so requests during startup never build a Request/Response or
+    reach the endpoint; once the engine exists it is a single attribute check.
+    """
+    
+    ENGINE_ROUTES = (
+        "/health", "/portfolio", "/advisory/", "/scenario/", "/position/",
+        "/history/", "/config/advisory_mode", "/recommendation/"
+    )
+    NOT_READY_BODY = b'{"detail":"Advisory engine not initialized"}'
+    NOT_READY_HEADERS = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(NOT_READY_BODY)).encode())
+    ]
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] == "http" and advisory_engine is None
+                and scope["path"].startswith(self.ENGINE_ROUTES)):
+            await send({"type": "http.response.start", "status": 503, "headers": self.NOT_READY_HEADERS})
+            await send({"type": "http.response.body", "body": self.NOT_READY_BODY})
+            return
+        
+        await self.app(scope, receive, send)
+
+app.add_middleware(EngineReadyMiddleware)
+
+# Added last so it runs first: cache hits skip the readiness guard and routing entirely
+app.add_middleware(
+    ResponseCacheMiddleware,
+    redis_url=settings.REDIS_URL,
+    enabled=settings.RESPONSE_CACHE_ENABLED
+)
+
+@app.exception_handler(EngineError)
+async def engine_error_handler(request, exc: EngineError):
+    """Single error path for engine failures raised from any endpoint"""
+    return ORJSONResponse({"error": str(exc), **exc.details}, status_code=exc.status_code)
 
 # API Endpoints
 
+# Static payloads are serialized once; liveness probes hit these endpoints constantly
+ROOT_BODY = orjson.dumps({
+    "service": "VN Stock Advisory - Enhanced AI System", 
+    "version": "2.0.0",
+    "features": [
+        "AI-only analysis (no price fetching)",
+        "Multiple advisory modes",
+        "Scenario analysis",
+        "Historical tracking",
+        "User configuration management"
+    ],
+    "status": "running"
+})
+
+# Last health result as (monotonic time, body); reused for HEALTH_CACHE_SECONDS
+HEALTH_CACHE_SECONDS = 10
+_health_cache: Optional[Tuple[float, bytes]] = None
+
 @app.get("/")
 async def root():
     """Root endpoint with system info"""
-    return {
-        "service": "VN Stock Advisory - Enhanced AI System", 
-        "version": "2.0.0",
-        "features": [
-            "AI-only analysis (no price fetching)",
-            "Multiple advisory modes",
-            "Scenario analysis",
-            "Historical tracking",
-            "User configuration management"
-        ],
-        "status": "running"
-    }
+    return Response(content=ROOT_BODY, media_type="application/json")
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    if not advisory_engine:
-        raise HTTPException(status_code=503, detail="Advisory engine not initialized")
+    global _health_cache
+    
+    now = time.monotonic()
+    if _health_cache and now - _health_cache[0] < HEALTH_CACHE_SECONDS:
+        return Response(content=_health_cache[1], media_type="application/json")
     
     # Test AI connectivity
     try:
-        portfolio = advisory_engine.holdings_provider.get_portfolio_summary()
+        portfolio = await run_blocking(advisory_engine.holdings_provider.get_portfolio_summary)
         ai_status = "healthy" if portfolio['total_positions'] > 0 else "no_positions"
     except Exception as e:
         ai_status = f"error: {str(e)}"
     
-    return {
+    body = orjson.dumps({
         "status": "healthy" if ai_status == "healthy" else "degraded",
         "ai_engine_status": ai_status,
         "timestamp": "2025-01-21T10:00:00Z"
-    }
+    })
+    _health_cache = (now, body)
+    return Response(content=body, media_type="application/json")
 
 @app.get("/portfolio")
 async def get_portfolio():
     """Get portfolio summary"""
-    if not advisory_engine:
-        raise HTTPException(status_code=503, detail="Advisory engine not initialized")
-    
     try:
-        portfolio = advisory_engine.holdings_provider.get_portfolio_summary()
-        return portfolio
+        portfolio = await run_blocking(advisory_engine.holdings_provider.get_portfolio_summary)
+        return ORJSONResponse(portfolio)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to load portfolio: {e}")
 
+# no-store keeps the response cache from replaying the fallback after the engine recovers
+STALE_HEADERS = {"Warning": '110 - "Response is Stale"', "Cache-Control": "no-store"}
+
+async def get_stale_advisory() -> Optional[Dict[str, Any]]:
+    """Last saved advisory within the fallback window, or None if fallback is disabled"""
+    if not settings.CACHE_FALLBACK_ENABLED:
+        return None
+    
+    from .data.historical_store import historical_store
+    return await run_blocking(historical_store.get_latest_advisory, settings.CACHE_FALLBACK_MAX_AGE_HOURS)
+
 @app.get("/advisory/daily")
 async def get_daily_advisory():
     """Get daily advisory analysis"""
-    if not advisory_engine:
-        raise HTTPException(status_code=503, detail="Advisory engine not initialized")
-    
     try:
-        advisory = advisory_engine.generate_daily_advisory(save_to_history=False)
-        
-        if "error" in advisory:
-            raise HTTPException(status_code=500, detail=advisory["error"])
-        
-        return advisory
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Advisory generation failed: {e}")
+        advisory = await run_blocking(advisory_engine.generate_daily_advisory, save_to_history=False)
+    except EngineError as e:
+        stale = await get_stale_advisory()
+        if stale is None:
+            raise
+        logger.warning(f"Advisory generation failed, serving last saved advisory: {e}")
+        return ORJSONResponse(stale, headers=STALE_HEADERS)
+    
+    # Returning the response directly skips FastAPI's jsonable_encoder walk of the nested
+    # analysis; orjson serializes datetimes and NumPy scalars/arrays natively
+    return ORJSONResponse(advisory)
 
 @app.post("/advisory/daily")
 async def generate_daily_advisory(background_tasks: BackgroundTasks, save_history: bool = True):
     """Generate and save daily advisory analysis"""
-    if not advisory_engine:
-        raise HTTPException(status_code=503, detail="Advisory engine not initialized")
-    
     def _generate_advisory():
         try:
             advisory = advisory_engine.generate_daily_advisory(save_to_history=save_history)
@@ -149,78 +271,39 @@ async def generate_daily_advisory(background_tasks: BackgroundTasks, save_histor
 @app.post("/scenario/analyze")
 async def analyze_scenario(scenario: dict):
     """Analyze a what-if scenario"""
-    if not advisory_engine:
-        raise HTTPException(status_code=503, detail="Advisory engine not initialized")
-    
     scenario_description = scenario.get("description")
     if not scenario_description:
         raise HTTPException(status_code=400, detail="Scenario description required")
     
-    try:
-        result = advisory_engine.analyze_scenario(scenario_description)
-        
-        if "error" in result:
-            raise HTTPException(status_code=500, detail=result["error"])
-        
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Scenario analysis failed: {e}")
+    result = await run_blocking(advisory_engine.analyze_scenario, scenario_description)
+    return ORJSONResponse(result)
 
 @app.get("/position/{ticker}")
 async def get_position_analysis(ticker: str):
     """Get detailed analysis for a specific position"""
-    if not advisory_engine:
-        raise HTTPException(status_code=503, detail="Advisory engine not initialized")
-    
-    try:
-        analysis = advisory_engine.get_position_analysis(ticker.upper())
-        
-        if "error" in analysis:
-            raise HTTPException(status_code=404, detail=analysis["error"])
-        
-        return analysis
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Position analysis failed: {e}")
+    return await run_blocking(advisory_engine.get_position_analysis, ticker.upper())
 
 @app.get("/history/evolution")
 async def get_portfolio_evolution(days: int = 30):
     """Get portfolio evolution over time"""
-    if not advisory_engine:
-        raise HTTPException(status_code=503, detail="Advisory engine not initialized")
-    
-    try:
-        evolution = advisory_engine.get_portfolio_evolution(days)
-        
-        if "error" in evolution:
-            raise HTTPException(status_code=500, detail=evolution["error"])
-        
-        return evolution
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Portfolio evolution failed: {e}")
+    evolution = await run_blocking(advisory_engine.get_portfolio_evolution, days)
+    return ORJSONResponse(evolution)
 
 @app.get("/config/user")
 async def get_user_config():
     """Get user configuration"""
     try:
-        config = get_user_config()
-        return {
-            "advisory": config.advisory.__dict__,
-            "risk": config.risk.__dict__,
-            "email": {
-                "enabled": config.email.enabled,
-                "recipients": config.email.recipients,
-                "schedule": config.email.schedule
-            }
-        }
+        from .config.user_config import config_manager
+        
+        # Serialized once per config change instead of rebuilding the view on every request
+        body = await run_blocking(config_manager.get_serialized_view)
+        return Response(content=body, media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to load user config: {e}")
 
 @app.post("/config/advisory_mode")
 async def update_advisory_mode(mode_data: dict):
     """Update advisory mode"""
-    if not advisory_engine:
-        raise HTTPException(status_code=503, detail="Advisory engine not initialized")
-    
     new_mode = mode_data.get("mode")
     if not new_mode:
         raise HTTPException(status_code=400, detail="Advisory mode required")
@@ -230,7 +313,7 @@ async def update_advisory_mode(mode_data: dict):
         raise HTTPException(status_code=400, detail=f"Invalid mode. Must be one of: {valid_modes}")
     
     try:
-        success = advisory_engine.update_advisory_mode(new_mode)
+        success = await run_blocking(advisory_engine.update_advisory_mode, new_mode)
         if success:
             return {"status": "success", "new_mode": new_mode}
         else:
@@ -241,9 +324,6 @@ async def update_advisory_mode(mode_data: dict):
 @app.post("/recommendation/explain")
 async def explain_recommendation(data: dict):
     """Get explanation for a recommendation"""
-    if not advisory_engine:
-        raise HTTPException(status_code=503, detail="Advisory engine not initialized")
-    
     recommendation = data.get("recommendation")
     ticker = data.get("ticker")
     
@@ -251,7 +331,7 @@ async def explain_recommendation(data: dict):
         raise HTTPException(status_code=400, detail="Recommendation text required")
     
     try:
-        explanation = advisory_engine.explain_recommendation(recommendation, ticker)
+        explanation = await run_blocking(advisory_engine.explain_recommendation, recommendation, ticker)
         return {"recommendation": recommendation, "explanation": explanation}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Explanation failed: {e}")
@@ -263,13 +343,11 @@ def run_daily_advisory():
     logger.info("Running manual advisory analysis")
     
     try:
+        from .advisory.enhanced_engine import EnhancedAdvisoryEngine
+        
         engine = EnhancedAdvisoryEngine()
         advisory = engine.generate_daily_advisory(save_to_history=True)
         
-        if "error" in advisory:
-            logger.error(f"Advisory generation failed: {advisory['error']}")
-            sys.exit(1)
-        
         logger.info("Manual advisory analysis completed successfully")
         print(f"Advisory generated for {advisory['portfolio_summary']['total_positions']} positions")
         print(f"Total portfolio value: {advisory['portfolio_summary']['total_invested_value']:,.0f} VND")
@@ -283,13 +361,11 @@ def run_scenario_analysis(scenario: str):
     logger.info(f"Running scenario analysis: {scenario}")
     
     try:
+        from .advisory.enhanced_engine import EnhancedAdvisoryEngine
+        
         engine = EnhancedAdvisoryEngine()
         result = engine.analyze_scenario(scenario)
         
-        if "error" in result:
-            logger.error(f"Scenario analysis failed: {result['error']}")
-            sys.exit(1)
-        
         logger.info("Scenario analysis completed successfully")
         print(f"Scenario: {scenario}")
         print(f"Analysis completed at: {result['analyzed_at']}")
@@ -308,17 +384,27 @@ def main():
     parser.add_argument("--host", default="0.0.0.0", help="API host")
     parser.add_argument("--port", type=int, default=8000, help="API port")
     parser.add_argument("--reload", action="store_true", help="Enable auto-reload (dev only)")
+    parser.add_argument("--workers", type=int, default=1,
+                       help="Number of API worker processes (set REDIS_URL to share the response cache)")
     parser.add_argument("--scenario", type=str, help="Scenario description for scenario mode")
     
     args = parser.parse_args()
     
     if args.mode == "api":
-        # Run with FastAPI
+        # Each worker runs its own startup_event, so it gets its own engine and SMTP pool
+        if args.workers > 1 and args.reload:
+            logger.warning("--reload is not supported with multiple workers; ignoring it")
+        if args.workers > 1 and settings.RESPONSE_CACHE_ENABLED and not settings.REDIS_URL:
+            logger.warning("Running multiple workers without REDIS_URL; each worker keeps its own response cache")
+        
+        # Run with FastAPI on uvloop where available (not supported on Windows)
         uvicorn.run(
             "src.app:app",
             host=args.host,
             port=args.port,
-            reload=args.reload,
+            reload=args.reload and args.workers == 1,
+            workers=args.workers,
+            loop="uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
             log_level="info"
         )
     elif args.mode == "advisory":
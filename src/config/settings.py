@@ -1,7 +1,7 @@
 import os
 from typing import Optional
-from pydantic import validator
-from pydantic_settings import BaseSettings
+from pydantic import field_validator, model_validator
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -17,6 +17,8 @@ class Settings(BaseSettings):
     # Scheduler Settings
     SCHEDULE_CRON: str = "30 7 * * *"
     TIMEZONE: str = "Asia/Ho_Chi_Minh"
+    THREAD_POOL_SIZE: int = min(32, (os.cpu_count() or 1) + 4)  # Workers for blocking I/O (fetches, LLM, SMTP)
+    EXECUTOR_TYPE: str = "thread"  # Scheduler job pool: "thread" (recommended) or "process"
     
     # Email Settings
     SMTP_HOST: Optional[str] = None
@@ -27,6 +29,9 @@ class Settings(BaseSettings):
     MAIL_TO: Optional[str] = None
     MAIL_FROM: Optional[str] = None
     NOTIFICATION_EMAIL: Optional[str] = None
+    SMTP_POOL_SIZE: int = 5  # Max concurrent keep-alive SMTP sessions
+    SMTP_MAX_MESSAGES_PER_CONNECTION: int = 100  # Recycle a session after this many sends
+    SMTP_API_LOG: bool = True  # Record each email in the API request logs
     
     # AI/LLM Settings
     LLM_PROVIDER: str = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
@@ -40,6 +45,10 @@ class Settings(BaseSettings):
     # Cache Settings
     CACHE_ENABLED: bool = True
     CACHE_TTL_MINUTES: int = 5  # Cache market data for 5 minutes
+    RESPONSE_CACHE_ENABLED: bool = True  # Cache GET API responses (see utils/response_cache.py)
+    REDIS_URL: Optional[str] = None  # e.g. redis://redis:6379/0; in-process cache when unset
+    CACHE_FALLBACK_ENABLED: bool = True  # Serve the last saved advisory when generation fails
+    CACHE_FALLBACK_MAX_AGE_HOURS: int = 72  # Oldest saved advisory that may be served as a fallback
     
     # Logging Settings
     LOG_LEVEL: str = "INFO"
@@ -49,6 +58,10 @@ class Settings(BaseSettings):
     MAX_RETRIES: int = 3
     REQUEST_TIMEOUT: int = 30
     RATE_LIMIT_DELAY: float = 1.0
+    EMAIL_RATE_PER_SEC: float = 0.33  # Sustained outbound email rate
+    EMAIL_RATE_BURST: int = 1  # Emails allowed back-to-back before pacing kicks in
+    LLM_RATE_PER_SEC: float = 0.25  # Gemini free tier: 15 requests/minute
+    LLM_RATE_BURST: int = 3
     
     # Development Settings
     DEBUG: bool = False
@@ -61,40 +74,56 @@ class Settings(BaseSettings):
     SSI_CONSUMER_ID: Optional[str] = None
     SSI_CONSUMER_SECRET: Optional[str] = None
     
-    @validator('VN_DATA_PROVIDER')
+    model_config = SettingsConfigDict(env_file=".env", case_sensitive=True)
+    
+    @field_validator('VN_DATA_PROVIDER')
+    @classmethod
     def validate_provider(cls, v):
         valid_providers = ['mock', 'vietcap', 'cafef']
         if v not in valid_providers:
             raise ValueError(f'VN_DATA_PROVIDER must be one of {valid_providers}')
         return v
     
-    @validator('LLM_PROVIDER')
-    def validate_llm_provider(cls, v):
-        return v  # Simplified validation for now
-    
-    @validator('SMTP_HOST')
-    def validate_smtp_settings(cls, v, values):
-        """Validate SMTP settings if email is enabled"""
-        if not values.get('DRY_RUN', False) and not v:
-            raise ValueError('SMTP_HOST is required when DRY_RUN is False')
+    @field_validator('EXECUTOR_TYPE')
+    @classmethod
+    def validate_executor_type(cls, v):
+        valid_types = ['thread', 'process']
+        if v not in valid_types:
+            raise ValueError(f'EXECUTOR_TYPE must be one of {valid_types}')
         return v
     
-    @validator('MAIL_TO')
-    def validate_email_recipient(cls, v, values):
-        """Validate email recipient if email is enabled"""
-        if not values.get('DRY_RUN', False) and not v:
-            raise ValueError('MAIL_TO is required when DRY_RUN is False')
-        return v
+    @field_validator('LLM_PROVIDER')
+    @classmethod
+    def validate_llm_provider(cls, v):
+        return v  # Simplified validation for now
     
-    class Config:
-        env_file = ".env"
-        case_sensitive = True
+    @model_validator(mode='after')
+    def validate_email_settings(self):
+        """Validate SMTP host and recipient if email is enabled"""
+        # Runs after all fields, so DRY_RUN is known regardless of declaration order;
+        # like the old field validators, only explicitly provided values are checked
+        if not self.DRY_RUN:
+            if 'SMTP_HOST' in self.model_fields_set and not self.SMTP_HOST:
+                raise ValueError('SMTP_HOST is required when DRY_RUN is False')
+            if 'MAIL_TO' in self.model_fields_set and not self.MAIL_TO:
+                raise ValueError('MAIL_TO is required when DRY_RUN is False')
+        return self
 
 # Global settings instance
 settings = Settings()
 
+def get_settings() -> Settings:
+    """The process-wide settings; .env and the environment are only parsed once, at import"""
+    return settings
+
 # Logging configuration
+import atexit
 import logging.config
+import logging.handlers
+import queue
+
+from utils.logger import OrjsonFormatter
+
 
 LOGGING_CONFIG = {
     'version': 1,
@@ -123,16 +152,31 @@ LOGGING_CONFIG = {
     }
 }
 
-# Add file handler if log file is specified
+# Add file handler if log file is specified. Loggers only enqueue records; a
+# QueueListener thread does the (blocking) file writes and rotation.
+LOG_QUEUE: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+log_listener: Optional[logging.handlers.QueueListener] = None
+
 if settings.LOG_FILE:
     LOGGING_CONFIG['handlers']['file'] = {
+        '()': 'logging.handlers.QueueHandler',
         'level': settings.LOG_LEVEL,
-        'class': 'logging.handlers.RotatingFileHandler',
-        'filename': settings.LOG_FILE,
-        'maxBytes': 10485760,  # 10MB
-        'backupCount': 5,
-        'formatter': 'json'
+        'queue': LOG_QUEUE
     }
     LOGGING_CONFIG['loggers']['']['handlers'].append('file')
 
-logging.config.dictConfig(LOGGING_CONFIG)
\ No newline at end of file
+logging.config.dictConfig(LOGGING_CONFIG)
+
+if settings.LOG_FILE:
+    os.makedirs(os.path.dirname(settings.LOG_FILE) or ".", exist_ok=True)
+    file_handler = logging.handlers.RotatingFileHandler(
+        settings.LOG_FILE,
+        maxBytes=10485760,  # 10MB
+        backupCount=5
+    )
+    file_handler.setLevel(settings.LOG_LEVEL)
+    file_handler.setFormatter(OrjsonFormatter())
+    
+    log_listener = logging.handlers.QueueListener(LOG_QUEUE, file_handler, respect_handler_level=True)
+    log_listener.start()
+    atexit.register(log_listener.stop)
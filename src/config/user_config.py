@@ -7,18 +7,42 @@ User Configuration Management System
 - Scheduling preferences
 """
 
+import orjson
 import yaml
-import tomli
 import tomli_w
+
+try:
+    import tomllib as tomli  # Python 3.11+
+except ImportError:
+    import tomli
+
+# libyaml C bindings when PyYAML was built with them, pure-Python otherwise
+try:
+    from yaml import CSafeLoader as YamlLoader, CSafeDumper as YamlDumper
+except ImportError:
+    from yaml import SafeLoader as YamlLoader, SafeDumper as YamlDumper
 from typing import Dict, Any, Optional, List
 from pathlib import Path
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, fields
 from enum import Enum
+import copy
 import logging
+import time
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# (time.time() of the last refresh, ISO string); timestamps only need second resolution
+_ts_cache = [0.0, ""]
+
+def _now_iso() -> str:
+    """Current local time as an ISO string, re-formatted at most once per second"""
+    t = time.time()
+    if t - _ts_cache[0] >= 1.0:
+        _ts_cache[0] = t
+        _ts_cache[1] = datetime.fromtimestamp(t).isoformat()
+    return _ts_cache[1]
+
 class ConfigFormat(Enum):
     YAML = "yaml"
     TOML = "toml"
@@ -123,63 +147,106 @@ class UserConfiguration:
         if self.data is None:
             self.data = DataConfig()
         if not self.created_at:
-            self.created_at = datetime.now().isoformat()
-        self.last_updated = datetime.now().isoformat()
+            self.created_at = _now_iso()
+        # Only save_config bumps last_updated; loading a config must not rewrite it
+        if not self.last_updated:
+            self.last_updated = self.created_at
+
+# Nested section dataclasses and top-level scalar fields of UserConfiguration
+_CONFIG_SECTIONS = {
+    "email": EmailConfig,
+    "risk": RiskConfig,
+    "advisory": AdvisoryConfig,
+    "notifications": NotificationConfig,
+    "data": DataConfig,
+}
+_CONFIG_SCALAR_FIELDS = tuple(f.name for f in fields(UserConfiguration) if f.name not in _CONFIG_SECTIONS)
 
 class ConfigManager:
     """
     Configuration Manager for user preferences and settings
     """
     
+    # How long load_config trusts the current config before checking the file's mtime again
+    RECHECK_INTERVAL = 1.0
+    
     def __init__(self, config_file: str = "config/user_config.yaml", 
                  format_type: ConfigFormat = ConfigFormat.YAML):
         self.config_file = Path(config_file)
         self.format_type = format_type
         self.config: Optional[UserConfiguration] = None
         
+        # mtime of the file self.config came from (None: file missing), and when it was last checked
+        self._mtime_ns: Optional[int] = None
+        self._checked_at = 0.0
+        
+        # asdict() snapshot of the last saved/exported config, reused until that config changes
+        self._config_dict: Optional[Dict[str, Any]] = None
+        self._config_dict_source: Optional[UserConfiguration] = None
+        
+        # Pre-serialized JSON of the advisory/risk/email view served by GET /config/user
+        self._serialized_bytes: Optional[bytes] = None
+        self._serialized_source: Optional[UserConfiguration] = None
+        
         # Ensure config directory exists
         self.config_file.parent.mkdir(parents=True, exist_ok=True)
     
     def load_config(self) -> UserConfiguration:
-        """Load configuration from file"""
+        """
+        Load configuration from file
+        
+        The file is re-parsed only when its mtime changes (checked at most every
+        RECHECK_INTERVAL seconds). A missing or unreadable file yields a default
+        config once; it is kept until the file changes.
+        """
+        now = time.monotonic()
+        if self.config is not None and now - self._checked_at < self.RECHECK_INTERVAL:
+            return self.config
+        self._checked_at = now
+        
+        mtime_ns = None
         try:
-            if not self.config_file.exists():
+            try:
+                mtime_ns = self.config_file.stat().st_mtime_ns
+            except FileNotFoundError:
+                pass
+            
+            if self.config is not None and mtime_ns == self._mtime_ns:
+                return self.config
+            
+            if mtime_ns is None:
                 logger.info(f"Config file not found, creating default: {self.config_file}")
                 return self.create_default_config()
             
-            with open(self.config_file, 'r', encoding='utf-8') as f:
-                if self.format_type == ConfigFormat.YAML:
-                    data = yaml.safe_load(f)
-                elif self.format_type == ConfigFormat.TOML:
-                    data = tomli.load(f)
-                else:
-                    raise ValueError(f"Unsupported format: {self.format_type}")
+            with open(self.config_file, 'rb') as f:
+                config = self._parse(f.read(), self.format_type)
             
-            # Convert to UserConfiguration object
-            self.config = self._dict_to_config(data)
             logger.info(f"Loaded configuration from {self.config_file}")
-            return self.config
+            self.config = config
+            self._mtime_ns = mtime_ns
+            return config
             
         except Exception as e:
             logger.error(f"Error loading config: {e}")
             logger.info("Using default configuration")
+            # Don't retry (and re-create defaults) until the file changes
+            self._mtime_ns = mtime_ns
             return self.create_default_config()
     
     def save_config(self, config: UserConfiguration) -> bool:
         """Save configuration to file"""
         try:
-            config.last_updated = datetime.now().isoformat()
-            data = asdict(config)
+            config.last_updated = _now_iso()
+            self._invalidate_snapshots()
+            data = self._to_dict(config)
             
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                if self.format_type == ConfigFormat.YAML:
-                    yaml.dump(data, f, default_flow_style=False, allow_unicode=True, indent=2)
-                elif self.format_type == ConfigFormat.TOML:
-                    tomli_w.dump(data, f)
-                else:
-                    raise ValueError(f"Unsupported format: {self.format_type}")
+            self._write_file(self.config_file, data, self.format_type)
             
             self.config = config
+            self._serialized_bytes = self._serialize_api_view(data)
+            self._serialized_source = config
+            # Our own write must not trigger a re-parse
+            self._mtime_ns = self.config_file.stat().st_mtime_ns
             logger.info(f"Saved configuration to {self.config_file}")
             return True
             
@@ -190,20 +257,21 @@ class ConfigManager:
     def create_default_config(self) -> UserConfiguration:
         """Create default configuration"""
         config = UserConfiguration()
-        self.save_config(config)
+        if not self.save_config(config):
+            # Still serve the defaults (from memory) when the file can't be written
+            self.config = config
         return config
     
     def update_advisory_mode(self, primary_mode: str, secondary_modes: List[str] = None) -> bool:
         """Update advisory mode preferences"""
         try:
-            if not self.config:
-                self.config = self.load_config()
-            
-            self.config.advisory.primary_mode = primary_mode
+            # Edit a copy; self.config is only replaced once the save succeeds
+            config = copy.deepcopy(self.load_config())
+            config.advisory.primary_mode = primary_mode
             if secondary_modes:
-                self.config.advisory.secondary_modes = secondary_modes
+                config.advisory.secondary_modes = secondary_modes
             
-            return self.save_config(self.config)
+            return self.save_config(config)
             
         except Exception as e:
             logger.error(f"Error updating advisory mode: {e}")
@@ -214,17 +282,16 @@ class ConfigManager:
                            stop_loss_threshold: float = None) -> bool:
         """Update risk management settings"""
         try:
-            if not self.config:
-                self.config = self.load_config()
-            
+            # Edit a copy; self.config is only replaced once the save succeeds
+            config = copy.deepcopy(self.load_config())
             if risk_tolerance:
-                self.config.risk.risk_tolerance = risk_tolerance
+                config.risk.risk_tolerance = risk_tolerance
             if max_position_size:
-                self.config.risk.max_position_size = max_position_size
+                config.risk.max_position_size = max_position_size
             if stop_loss_threshold:
-                self.config.risk.stop_loss_threshold = stop_loss_threshold
+                config.risk.stop_loss_threshold = stop_loss_threshold
             
-            return self.save_config(self.config)
+            return self.save_config(config)
             
         except Exception as e:
             logger.error(f"Error updating risk settings: {e}")
@@ -235,27 +302,36 @@ class ConfigManager:
                                include_explanations: bool = None) -> bool:
         """Update email preferences"""
         try:
-            if not self.config:
-                self.config = self.load_config()
-            
+            # Edit a copy; self.config is only replaced once the save succeeds
+            config = copy.deepcopy(self.load_config())
             if template_style:
-                self.config.email.template_style = template_style
+                config.email.template_style = template_style
             if language:
-                self.config.email.language = language
+                config.email.language = language
             if include_explanations is not None:
-                self.config.email.include_explanations = include_explanations
+                config.email.include_explanations = include_explanations
             
-            return self.save_config(self.config)
+            return self.save_config(config)
             
         except Exception as e:
             logger.error(f"Error updating email preferences: {e}")
             return False
     
     def get_config(self) -> UserConfiguration:
-        """Get current configuration"""
-        if not self.config:
-            self.config = self.load_config()
-        return self.config
+        """
+        Get current configuration (re-read only when the file changed on disk)
+        
+        The returned object is shared; copy it before modifying it.
+        """
+        return self.load_config()
+    
+    def get_serialized_view(self) -> bytes:
+        """JSON bytes of the advisory/risk/email settings, rebuilt only when the config changes"""
+        config = self.load_config()
+        if self._serialized_bytes is None or self._serialized_source is not config:
+            self._serialized_bytes = self._serialize_api_view(self._to_dict(config))
+            self._serialized_source = config
+        return self._serialized_bytes
     
     def validate_config(self) -> Dict[str, Any]:
         """Validate configuration settings"""
@@ -298,13 +374,9 @@ class ConfigManager:
             export_file = Path(export_path)
             export_format = format_type or self.format_type
             
-            data = asdict(self.config)
+            data = self._to_dict(self.config)
             
-            with open(export_file, 'w', encoding='utf-8') as f:
-                if export_format == ConfigFormat.YAML:
-                    yaml.dump(data, f, default_flow_style=False, allow_unicode=True, indent=2)
-                elif export_format == ConfigFormat.TOML:
-                    tomli_w.dump(data, f)
+            self._write_file(export_file, data, export_format)
             
             logger.info(f"Exported configuration to {export_file}")
             return True
@@ -313,35 +385,86 @@ class ConfigManager:
             logger.error(f"Error exporting config: {e}")
             return False
     
-    def _dict_to_config(self, data: Dict[str, Any]) -> UserConfiguration:
+    def _to_dict(self, config: UserConfiguration) -> Dict[str, Any]:
+        """asdict(config), reusing the previous snapshot while the same config is unchanged"""
+        if self._config_dict is None or self._config_dict_source is not config:
+            self._config_dict = asdict(config)
+            self._config_dict_source = config
+        return self._config_dict
+    
+    def _invalidate_snapshots(self) -> None:
+        """Drop cached dict/JSON views before the current config is mutated"""
+        self._config_dict = None
+        self._serialized_bytes = None
+    
+    @staticmethod
+    def _serialize_api_view(data: Dict[str, Any]) -> bytes:
+        """Serialize the subset of the config exposed by the API"""
+        email = data["email"]
+        return orjson.dumps({
+            "advisory": data["advisory"],
+            "risk": data["risk"],
+            "email": {
+                "enabled": email["enabled"],
+                "recipients": email["recipients"],
+                "schedule": email["schedule"]
+            }
+        }, option=orjson.OPT_NON_STR_KEYS)
+    
+    @staticmethod
+    def _parse(raw: bytes, format_type: ConfigFormat) -> UserConfiguration:
+        """Parse raw config file bytes into a UserConfiguration"""
+        # libyaml decodes UTF-8 bytes itself
+        if format_type == ConfigFormat.YAML:
+            data = yaml.load(raw, Loader=YamlLoader)
+        elif format_type == ConfigFormat.TOML:
+            data = tomli.loads(raw.decode('utf-8'))
+        else:
+            raise ValueError(f"Unsupported format: {format_type}")
+        
+        return ConfigManager._dict_to_config(data)
+    
+    @staticmethod
+    def _serialize(data: Dict[str, Any], format_type: ConfigFormat) -> bytes:
+        """Serialize configuration data in the given format"""
+        if format_type == ConfigFormat.YAML:
+            return yaml.dump(data, Dumper=YamlDumper, default_flow_style=False, allow_unicode=True,
+                             indent=2, encoding='utf-8')
+        elif format_type == ConfigFormat.TOML:
+            # TOML has no null, so unset optional fields are omitted (dataclass defaults restore them)
+            return tomli_w.dumps(_drop_none(data)).encode('utf-8')
+        else:
+            raise ValueError(f"Unsupported format: {format_type}")
+    
+    @staticmethod
+    def _write_file(path: Path, data: Dict[str, Any], format_type: ConfigFormat) -> None:
+        """Write configuration data to path in the given format"""
+        raw = ConfigManager._serialize(data, format_type)
+        with open(path, 'wb') as f:
+            f.write(raw)
+    
+    @staticmethod
+    def _dict_to_config(data: Dict[str, Any]) -> UserConfiguration:
         """Convert dictionary to UserConfiguration object"""
         try:
-            # Create config objects from dictionaries
-            email_config = EmailConfig(**data.get('email', {}))
-            risk_config = RiskConfig(**data.get('risk', {}))
-            advisory_config = AdvisoryConfig(**data.get('advisory', {}))
-            notification_config = NotificationConfig(**data.get('notifications', {}))
-            data_config = DataConfig(**data.get('data', {}))
+            # Sections missing from the file are left as None so __post_init__ fills in defaults
+            kwargs = {
+                name: section_cls(**data[name])
+                for name, section_cls in _CONFIG_SECTIONS.items()
+                if data.get(name)
+            }
+            kwargs.update((name, data[name]) for name in _CONFIG_SCALAR_FIELDS if name in data)
             
-            # Create main config
-            config = UserConfiguration(
-                user_name=data.get('user_name', 'User'),
-                created_at=data.get('created_at', ''),
-                last_updated=data.get('last_updated', ''),
-                version=data.get('version', '1.0'),
-                email=email_config,
-                risk=risk_config,
-                advisory=advisory_config,
-                notifications=notification_config,
-                data=data_config
-            )
-            
-            return config
+            return UserConfiguration(**kwargs)
             
         except Exception as e:
             logger.error(f"Error converting dict to config: {e}")
             return UserConfiguration()
 
+def _drop_none(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Recursively remove None values from nested dicts"""
+    return {k: _drop_none(v) if isinstance(v, dict) else v for k, v in data.items() if v is not None}
+
 # Global configuration manager instance
 config_manager = ConfigManager()
 
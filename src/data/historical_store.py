@@ -6,21 +6,242 @@ Local Data Storage System for Historical Portfolio Tracking
 - Performance analytics
 """
 
+import hashlib
 import sqlite3
-import json
 import logging
+import threading
+from contextlib import contextmanager
 from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timedelta
 from pathlib import Path
+import numpy as np
+import orjson
 import pandas as pd
 from dataclasses import dataclass
 
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:  # Numba is optional; metrics then use the NumPy implementation
+    NUMBA_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# SQLite 3.45+ stores JSON as pre-parsed binary JSONB; older versions keep plain JSON text.
+# Either way the value is a Python JSON string on the way in and out of SQL.
+JSONB_SUPPORTED = sqlite3.sqlite_version_info >= (3, 45, 0)
+_JSON_IN = "jsonb(?)" if JSONB_SUPPORTED else "?"
+
+def _dump_json(data: Any) -> str:
+    """
+    Serialize a payload column with orjson
+    
+    Returns text rather than bytes: jsonb(?) would read a bytes parameter as binary JSONB.
+    """
+    return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode()
+
+def _json_out(column: str) -> str:
+    """SELECT expression returning a JSON column as text"""
+    return f"json({column})" if JSONB_SUPPORTED else column
+
+# Statements that depend on the JSON storage format are built once here, so every call
+# passes the same text and hits the connection's prepared-statement cache
+SQL_INSERT_SNAPSHOT = f'''
+    INSERT OR REPLACE INTO portfolio_snapshots 
+    (snapshot_id, date, owner, total_positions, total_invested_value, 
+     portfolio_data, ai_analysis, advisory_mode, created_at)
+    VALUES (?, ?, ?, ?, ?, {_JSON_IN}, {_JSON_IN}, ?, ?)
+'''
+
+_SQL_SELECT_HISTORY = '''
+    SELECT snapshot_id, date, owner, total_positions, total_invested_value,
+           {payload_columns}, advisory_mode, created_at
+    FROM portfolio_snapshots
+    WHERE owner = ? AND date >= ?
+    ORDER BY date DESC
+'''
+SQL_SELECT_HISTORY = _SQL_SELECT_HISTORY.format(
+    payload_columns=f"{_json_out('portfolio_data')}, {_json_out('ai_analysis')}")
+SQL_SELECT_HISTORY_LIGHT = _SQL_SELECT_HISTORY.format(payload_columns="NULL, NULL")
+
+SQL_SELECT_LATEST_ADVISORY = f'''
+    SELECT {_json_out('ai_analysis')}
+    FROM portfolio_snapshots
+    WHERE created_at >= ? AND ai_analysis IS NOT NULL
+    ORDER BY created_at DESC
+    LIMIT 1
+'''
+
+PERFORMANCE_EVOLUTION_DTYPE = np.dtype([
+    ('date', 'datetime64[D]'),
+    ('total_value', np.float64),
+    ('daily_return', np.float64),
+    ('cumulative_return', np.float64),
+    ('volatility', np.float64),
+    ('sharpe_ratio', np.float64),
+    ('max_drawdown', np.float64),
+    ('benchmark_return', np.float64),
+])
+
+def _return_stats(values: np.ndarray) -> Tuple[float, float, float, float, int, int, float]:
+    """
+    Daily-return statistics of a value series
+    
+    Returns (mean, sample std, best, worst, up days, down days) of the returns plus the max drawdown.
+    """
+    returns = np.diff(values) / values[:-1]
+    std = returns.std(ddof=1) if len(returns) > 1 else 0.0
+    rolling_max = np.maximum.accumulate(values)
+    max_drawdown = ((values - rolling_max) / rolling_max).min()
+    return (returns.mean(), std, returns.max(), returns.min(),
+            int((returns > 0).sum()), int((returns < 0).sum()), max_drawdown)
+
+if NUMBA_AVAILABLE:
+    @njit
+    def _return_stats(values):  # noqa: F811
+        """JIT version of _return_stats: one pass, no temporary arrays (Welford variance)"""
+        mean = 0.0
+        m2 = 0.0
+        best = -np.inf
+        worst = np.inf
+        up = 0
+        down = 0
+        peak = values[0]
+        max_drawdown = 0.0
+        for i in range(1, len(values)):
+            ret = (values[i] - values[i - 1]) / values[i - 1]
+            delta = ret - mean
+            mean += delta / i
+            m2 += delta * (ret - mean)
+            best = max(best, ret)
+            worst = min(worst, ret)
+            if ret > 0:
+                up += 1
+            elif ret < 0:
+                down += 1
+            
+            peak = max(peak, values[i])
+            max_drawdown = min(max_drawdown, (values[i] - peak) / peak)
+        
+        n = len(values) - 1
+        std = np.sqrt(m2 / (n - 1)) if n > 1 else 0.0
+        return mean, std, best, worst, up, down, max_drawdown
+
+def _snapshot_id(owner: str, date: str) -> int:
+    """
+    Integer snapshot key for (owner, 'YYYY-MM-DD')
+    
+    A 40-bit owner hash above the day ordinal: stable across processes (unlike hash()),
+    and an 8-byte INTEGER PRIMARY KEY is the table's rowid instead of a separate TEXT index.
+    """
+    owner_hash = int.from_bytes(hashlib.blake2b(owner.encode(), digest_size=5).digest(), 'big')
+    return (owner_hash << 20) | datetime.strptime(date, '%Y-%m-%d').toordinal()
+
+# Bump SCHEMA_VERSION whenever _SCHEMA_SQL changes; databases at this version skip the DDL entirely
+SCHEMA_VERSION = 2
+
+_SCHEMA_SQL = '''
+
+    CREATE TABLE IF NOT EXISTS portfolio_snapshots (
+        snapshot_id INTEGER PRIMARY KEY,
+        date TEXT NOT NULL,
+        owner TEXT NOT NULL,
+        total_positions INTEGER,
+        total_invested_value REAL,
+        portfolio_data TEXT,
+        ai_analysis TEXT,
+        advisory_mode TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(date, owner)
+    );
+
+    CREATE TABLE IF NOT EXISTS performance_metrics (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT NOT NULL,
+        owner TEXT NOT NULL,
+        total_value REAL,
+        daily_return REAL,
+        cumulative_return REAL,
+        volatility REAL,
+        sharpe_ratio REAL,
+        max_drawdown REAL,
+        benchmark_return REAL,
+        alpha REAL,
+        beta REAL,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(date, owner)
+    );
+
+    CREATE TABLE IF NOT EXISTS ai_insights (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT NOT NULL,
+        owner TEXT NOT NULL,
+        insight_type TEXT,
+        ticker TEXT,
+        recommendation TEXT,
+        rationale TEXT,
+        confidence_score REAL,
+        priority TEXT,
+        status TEXT DEFAULT 'active',
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS position_changes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT NOT NULL,
+        owner TEXT NOT NULL,
+        ticker TEXT NOT NULL,
+        change_type TEXT,
+        old_shares REAL,
+        new_shares REAL,
+        old_avg_price REAL,
+        new_avg_price REAL,
+        reason TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS config_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT NOT NULL,
+        owner TEXT NOT NULL,
+        config_type TEXT,
+        old_value TEXT,
+        new_value TEXT,
+        reason TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    );
+
+-- Reads filter on owner and a date range, so index (owner, date) together; DESC matches
+-- the newest-first ORDER BY. UNIQUE(date, owner) still covers date-only scans.
+DROP INDEX IF EXISTS idx_snapshots_date;
+DROP INDEX IF EXISTS idx_snapshots_owner;
+DROP INDEX IF EXISTS idx_performance_date;
+DROP INDEX IF EXISTS idx_insights_date;
+DROP INDEX IF EXISTS idx_insights_ticker;
+CREATE INDEX IF NOT EXISTS idx_snapshots_owner_date ON portfolio_snapshots(owner, date DESC);
+CREATE INDEX IF NOT EXISTS idx_performance_owner_date ON performance_metrics(owner, date DESC);
+CREATE INDEX IF NOT EXISTS idx_insights_owner_date ON ai_insights(owner, date DESC);
+CREATE INDEX IF NOT EXISTS idx_insights_owner_ticker_date ON ai_insights(owner, ticker, date DESC);
+'''
+
+# Version 1 keyed snapshots by TEXT "owner_YYYYMMDD"; the table is moved aside before
+# _SCHEMA_SQL recreates it and the rows are copied back with integer ids
+_MIGRATE_SNAPSHOTS_PRE_SQL = '''
+DROP INDEX IF EXISTS idx_snapshots_owner_date;
+ALTER TABLE portfolio_snapshots RENAME TO portfolio_snapshots_v1;
+'''
+_MIGRATE_SNAPSHOTS_POST_SQL = '''
+INSERT OR REPLACE INTO portfolio_snapshots
+SELECT snapshot_id(owner, date), date, owner, total_positions, total_invested_value,
+       portfolio_data, ai_analysis, advisory_mode, created_at
+FROM portfolio_snapshots_v1;
+DROP TABLE portfolio_snapshots_v1;
+'''
+
 @dataclass
 class PortfolioSnapshot:
     """Portfolio snapshot data structure"""
-    snapshot_id: str
+    snapshot_id: int
     date: str
     owner: str
     total_positions: int
@@ -52,106 +273,63 @@ class HistoricalDataStore:
     def __init__(self, db_path: str = "data/portfolio_history.db"):
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        # One long-lived connection shared by all threads; the lock serializes its use
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, cached_statements=256)
+        self._configure(self._conn)
+        self._lock = threading.RLock()
+        
         self.init_database()
     
+    @contextmanager
+    def _connect(self):
+        """Exclusive use of the shared connection; commits on success, rolls back on error"""
+        with self._lock, self._conn:
+            yield self._conn
+    
+    def close(self):
+        """Close the shared connection"""
+        with self._lock:
+            self._conn.close()
+    
+    @staticmethod
+    def _configure(conn: sqlite3.Connection):
+        """Apply performance PRAGMAs that do not persist in the database file"""
+        conn.execute('PRAGMA synchronous=NORMAL')  # With WAL: no fsync per commit, still crash-safe
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute('PRAGMA mmap_size=268435456')  # 256 MB memory-mapped reads
+        conn.execute('PRAGMA cache_size=-65536')  # 64 MB page cache
+        conn.create_function('snapshot_id', 2, _snapshot_id, deterministic=True)
+    
     def init_database(self):
         """Initialize SQLite database with required tables"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Portfolio snapshots table
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS portfolio_snapshots (
-                        snapshot_id TEXT PRIMARY KEY,
-                        date TEXT NOT NULL,
-                        owner TEXT NOT NULL,
-                        total_positions INTEGER,
-                        total_invested_value REAL,
-                        portfolio_data TEXT,
-                        ai_analysis TEXT,
-                        advisory_mode TEXT,
-                        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                        UNIQUE(date, owner)
-                    )
-                ''')
-                
-                # Performance metrics table
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS performance_metrics (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        date TEXT NOT NULL,
-                        owner TEXT NOT NULL,
-                        total_value REAL,
-                        daily_return REAL,
-                        cumulative_return REAL,
-                        volatility REAL,
-                        sharpe_ratio REAL,
-                        max_drawdown REAL,
-                        benchmark_return REAL,
-                        alpha REAL,
-                        beta REAL,
-                        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                        UNIQUE(date, owner)
-                    )
-                ''')
-                
-                # AI insights table
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS ai_insights (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        date TEXT NOT NULL,
-                        owner TEXT NOT NULL,
-                        insight_type TEXT,
-                        ticker TEXT,
-                        recommendation TEXT,
-                        rationale TEXT,
-                        confidence_score REAL,
-                        priority TEXT,
-                        status TEXT DEFAULT 'active',
-                        created_at TEXT DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
-                
-                # Position changes table
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS position_changes (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        date TEXT NOT NULL,
-                        owner TEXT NOT NULL,
-                        ticker TEXT NOT NULL,
-                        change_type TEXT,
-                        old_shares REAL,
-                        new_shares REAL,
-                        old_avg_price REAL,
-                        new_avg_price REAL,
-                        reason TEXT,
-                        created_at TEXT DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
-                
-                # Configuration history table
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS config_history (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        date TEXT NOT NULL,
-                        owner TEXT NOT NULL,
-                        config_type TEXT,
-                        old_value TEXT,
-                        new_value TEXT,
-                        reason TEXT,
-                        created_at TEXT DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
-                
-                # Create indexes for better performance
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_snapshots_date ON portfolio_snapshots(date)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_snapshots_owner ON portfolio_snapshots(owner)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_performance_date ON performance_metrics(date)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_insights_date ON ai_insights(date)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_insights_ticker ON ai_insights(ticker)')
-                
-                conn.commit()
+            with self._connect() as conn:
+                if conn.execute('PRAGMA user_version').fetchone()[0] >= SCHEMA_VERSION:
+                    return
+                
+                # Lets cleanup_old_data return freed pages to the OS; only takes effect while the
+                # database is still empty (an existing file needs a one-off VACUUM)
+                conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+                # WAL persists in the database file: readers no longer block the writer
+                # and commits append to the log instead of rewriting pages
+                conn.execute('PRAGMA journal_mode=WAL')
+                
+                # TEXT snapshot ids predate user_version, so detect them from the column type
+                legacy_snapshots = any(
+                    col[1] == 'snapshot_id' and col[2] == 'TEXT'
+                    for col in conn.execute('PRAGMA table_info(portfolio_snapshots)')
+                )
+                
+                # Whole schema in one parse, applied atomically together with the version stamp
+                script = ['BEGIN;']
+                if legacy_snapshots:
+                    script.append(_MIGRATE_SNAPSHOTS_PRE_SQL)
+                script.append(_SCHEMA_SQL)
+                if legacy_snapshots:
+                    script.append(_MIGRATE_SNAPSHOTS_POST_SQL)
+                script.append(f'PRAGMA user_version = {SCHEMA_VERSION};\nCOMMIT;')
+                conn.executescript(''.join(script))
                 logger.info(f"Database initialized at {self.db_path}")
                 
         except Exception as e:
@@ -163,27 +341,21 @@ class HistoricalDataStore:
                               advisory_mode: str = "long_term") -> bool:
         """Save daily portfolio snapshot"""
         try:
-            snapshot_id = f"{portfolio_data.get('owner', 'unknown')}_{datetime.now().strftime('%Y%m%d')}"
-            date = datetime.now().strftime('%Y-%m-%d')
+            now = datetime.now()
+            date = now.strftime('%Y-%m-%d')
+            snapshot_id = _snapshot_id(portfolio_data.get('owner', 'unknown'), date)
             
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    INSERT OR REPLACE INTO portfolio_snapshots 
-                    (snapshot_id, date, owner, total_positions, total_invested_value, 
-                     portfolio_data, ai_analysis, advisory_mode, created_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
+            with self._connect() as conn:
+                conn.execute(SQL_INSERT_SNAPSHOT, (
                     snapshot_id,
                     date,
                     portfolio_data.get('owner', 'unknown'),
                     portfolio_data.get('total_positions', 0),
                     portfolio_data.get('total_invested_value', 0),
-                    json.dumps(portfolio_data),
-                    json.dumps(ai_analysis),
+                    _dump_json(portfolio_data),
+                    _dump_json(ai_analysis),
                     advisory_mode,
-                    datetime.now().isoformat()
+                    now.isoformat()
                 ))
                 
                 conn.commit()
@@ -197,28 +369,30 @@ class HistoricalDataStore:
     def save_ai_insights(self, insights: List[Dict[str, Any]], owner: str) -> bool:
         """Save AI insights and recommendations"""
         try:
-            date = datetime.now().strftime('%Y-%m-%d')
+            now = datetime.now()
+            date = now.strftime('%Y-%m-%d')
+            created_at = now.isoformat()
             
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                for insight in insights:
-                    cursor.execute('''
-                        INSERT INTO ai_insights 
-                        (date, owner, insight_type, ticker, recommendation, 
-                         rationale, confidence_score, priority, created_at)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        date,
-                        owner,
-                        insight.get('type', 'general'),
-                        insight.get('ticker', ''),
-                        insight.get('recommendation', ''),
-                        insight.get('rationale', ''),
-                        insight.get('confidence_score', 0.5),
-                        insight.get('priority', 'medium'),
-                        datetime.now().isoformat()
-                    ))
+            rows = [(
+                date,
+                owner,
+                insight.get('type', 'general'),
+                insight.get('ticker', ''),
+                insight.get('recommendation', ''),
+                insight.get('rationale', ''),
+                insight.get('confidence_score', 0.5),
+                insight.get('priority', 'medium'),
+                created_at
+            ) for insight in insights]
+            
+            with self._connect() as conn:
+                # One prepared statement for the whole batch, committed as a single transaction
+                conn.executemany('''
+                    INSERT INTO ai_insights 
+                    (date, owner, insight_type, ticker, recommendation, 
+                     rationale, confidence_score, priority, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', rows)
                 
                 conn.commit()
                 logger.info(f"Saved {len(insights)} AI insights for {date}")
@@ -228,23 +402,20 @@ class HistoricalDataStore:
             logger.error(f"Error saving AI insights: {e}")
             return False
     
-    def get_portfolio_history(self, owner: str, days: int = 30) -> List[PortfolioSnapshot]:
-        """Get portfolio history for specified period"""
+    def get_portfolio_history(self, owner: str, days: int = 30,
+                              include_payload: bool = True) -> List[PortfolioSnapshot]:
+        """
+        Get portfolio history for specified period
+        
+        With include_payload=False the portfolio_data/ai_analysis JSON is neither read nor
+        decoded and both fields are left empty; use it when only the numeric columns are needed.
+        """
         try:
             start_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+            query = SQL_SELECT_HISTORY if include_payload else SQL_SELECT_HISTORY_LIGHT
             
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    SELECT snapshot_id, date, owner, total_positions, total_invested_value,
-                           portfolio_data, ai_analysis, advisory_mode, created_at
-                    FROM portfolio_snapshots
-                    WHERE owner = ? AND date >= ?
-                    ORDER BY date DESC
-                ''', (owner, start_date))
-                
-                rows = cursor.fetchall()
+            with self._connect() as conn:
+                rows = conn.execute(query, (owner, start_date)).fetchall()
                 
                 snapshots = []
                 for row in rows:
@@ -254,8 +425,8 @@ class HistoricalDataStore:
                         owner=row[2],
                         total_positions=row[3],
                         total_invested_value=row[4],
-                        portfolio_data=json.loads(row[5]) if row[5] else {},
-                        ai_analysis=json.loads(row[6]) if row[6] else {},
+                        portfolio_data=orjson.loads(row[5]) if row[5] else {},
+                        ai_analysis=orjson.loads(row[6]) if row[6] else {},
                         advisory_mode=row[7],
                         created_at=row[8]
                     ))
@@ -266,80 +437,83 @@ class HistoricalDataStore:
             logger.error(f"Error getting portfolio history: {e}")
             return []
     
-    def get_performance_evolution(self, owner: str, days: int = 90) -> pd.DataFrame:
-        """Get portfolio performance evolution as DataFrame"""
+    def get_latest_advisory(self, max_age_hours: int = 72) -> Optional[Dict[str, Any]]:
+        """Get the most recent saved advisory analysis, if it is not older than max_age_hours"""
+        try:
+            cutoff = (datetime.now() - timedelta(hours=max_age_hours)).isoformat()
+            
+            with self._connect() as conn:
+                row = conn.execute(SQL_SELECT_LATEST_ADVISORY, (cutoff,)).fetchone()
+                return orjson.loads(row[0]) if row and row[0] else None
+                
+        except Exception as e:
+            logger.error(f"Error getting latest advisory: {e}")
+            return None
+    
+    def get_performance_evolution(self, owner: str, days: int = 90) -> np.recarray:
+        """
+        Get portfolio performance evolution, oldest first
+        
+        Returns a record array with one field per PERFORMANCE_EVOLUTION_DTYPE column (missing
+        metrics are NaN); wrap it in pd.DataFrame() where a frame is needed.
+        """
         try:
             start_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
             
-            with sqlite3.connect(self.db_path) as conn:
-                query = '''
+            with self._connect() as conn:
+                rows = conn.execute('''
                     SELECT date, total_value, daily_return, cumulative_return,
                            volatility, sharpe_ratio, max_drawdown, benchmark_return
                     FROM performance_metrics
                     WHERE owner = ? AND date >= ?
                     ORDER BY date
-                '''
-                
-                df = pd.read_sql_query(query, conn, params=(owner, start_date))
-                return df
+                ''', (owner, start_date)).fetchall()
+            
+            result = np.empty(len(rows), dtype=PERFORMANCE_EVOLUTION_DTYPE)
+            if rows:
+                # One column-wise copy per field; float conversion turns NULL into NaN
+                for name, column in zip(PERFORMANCE_EVOLUTION_DTYPE.names, zip(*rows)):
+                    result[name] = column
+            return result.view(np.recarray)
                 
         except Exception as e:
             logger.error(f"Error getting performance evolution: {e}")
-            return pd.DataFrame()
+            return np.empty(0, dtype=PERFORMANCE_EVOLUTION_DTYPE).view(np.recarray)
     
     def calculate_portfolio_metrics(self, owner: str) -> Dict[str, Any]:
         """Calculate comprehensive portfolio metrics"""
         try:
-            snapshots = self.get_portfolio_history(owner, days=365)
+            _, values = self.get_portfolio_values(owner, days=365)
             
-            if len(snapshots) < 2:
+            if len(values) < 2:
                 return {"error": "Insufficient data for metrics calculation"}
             
-            # Convert to DataFrame for easier analysis
-            df_data = []
-            for snapshot in snapshots:
-                df_data.append({
-                    'date': snapshot.date,
-                    'total_value': snapshot.total_invested_value,
-                    'positions': snapshot.total_positions
-                })
-            
-            df = pd.DataFrame(df_data)
-            df['date'] = pd.to_datetime(df['date'])
-            df = df.sort_values('date')
-            
-            # Calculate returns
-            df['daily_return'] = df['total_value'].pct_change()
-            df['cumulative_return'] = (1 + df['daily_return']).cumprod() - 1
+            # Returns, volatility and drawdown in one call (single pass when Numba is installed)
+            mean, std, best_day, worst_day, positive_days, negative_days, max_drawdown = _return_stats(values)
             
             # Calculate risk metrics
-            volatility = df['daily_return'].std() * (252 ** 0.5) if len(df) > 1 else 0
-            mean_return = df['daily_return'].mean() * 252
+            volatility = float(std * np.sqrt(252))
+            mean_return = float(mean * 252)
             sharpe_ratio = mean_return / volatility if volatility > 0 else 0
             
-            # Calculate max drawdown
-            rolling_max = df['total_value'].expanding().max()
-            drawdown = (df['total_value'] - rolling_max) / rolling_max
-            max_drawdown = drawdown.min()
-            
             # Current vs initial value
-            initial_value = df['total_value'].iloc[0]
-            current_value = df['total_value'].iloc[-1]
+            initial_value = float(values[0])
+            current_value = float(values[-1])
             total_return = (current_value - initial_value) / initial_value
             
             metrics = {
-                'period_days': len(df),
+                'period_days': len(values),
                 'initial_value': initial_value,
                 'current_value': current_value,
                 'total_return': total_return,
                 'annualized_return': mean_return,
                 'volatility': volatility,
                 'sharpe_ratio': sharpe_ratio,
-                'max_drawdown': max_drawdown,
-                'best_day': df['daily_return'].max(),
-                'worst_day': df['daily_return'].min(),
-                'positive_days': (df['daily_return'] > 0).sum(),
-                'negative_days': (df['daily_return'] < 0).sum(),
+                'max_drawdown': float(max_drawdown),
+                'best_day': float(best_day),
+                'worst_day': float(worst_day),
+                'positive_days': int(positive_days),
+                'negative_days': int(negative_days),
                 'calculated_at': datetime.now().isoformat()
             }
             
@@ -349,33 +523,52 @@ class HistoricalDataStore:
             logger.error(f"Error calculating portfolio metrics: {e}")
             return {"error": f"Metrics calculation failed: {e}"}
     
+    def get_portfolio_values(self, owner: str, days: int = 365) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get (dates, total invested values) for specified period, oldest first
+        
+        Only the two scalar columns are read; this is the cheapest way to get a value series.
+        """
+        start_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+        
+        with self._connect() as conn:
+            rows = conn.execute('''
+                SELECT date, COALESCE(total_invested_value, 0)
+                FROM portfolio_snapshots
+                WHERE owner = ? AND date >= ?
+                ORDER BY date
+            ''', (owner, start_date)).fetchall()
+        
+        if not rows:
+            return np.empty(0, dtype=object), np.empty(0, dtype=np.float64)
+        
+        # zip transposes the rows in C; no per-row Python loop for either column
+        dates, values = zip(*rows)
+        return np.array(dates, dtype=object), np.array(values, dtype=np.float64)
+    
     def get_ai_insights_history(self, owner: str, days: int = 30, 
                               ticker: Optional[str] = None) -> List[Dict[str, Any]]:
         """Get historical AI insights"""
         try:
             start_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
             
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
+            with self._connect() as conn:
                 if ticker:
-                    cursor.execute('''
+                    rows = conn.execute('''
                         SELECT date, insight_type, ticker, recommendation, rationale,
                                confidence_score, priority, status, created_at
                         FROM ai_insights
                         WHERE owner = ? AND date >= ? AND ticker = ?
                         ORDER BY created_at DESC
-                    ''', (owner, start_date, ticker))
+                    ''', (owner, start_date, ticker)).fetchall()
                 else:
-                    cursor.execute('''
+                    rows = conn.execute('''
                         SELECT date, insight_type, ticker, recommendation, rationale,
                                confidence_score, priority, status, created_at
                         FROM ai_insights
                         WHERE owner = ? AND date >= ?
                         ORDER BY created_at DESC
-                    ''', (owner, start_date))
-                
-                rows = cursor.fetchall()
+                    ''', (owner, start_date)).fetchall()
                 
                 insights = []
                 for row in rows:
@@ -401,88 +594,94 @@ class HistoricalDataStore:
                              new_portfolio: Dict[str, Any], reason: str = "manual_update") -> bool:
         """Track changes in portfolio positions"""
         try:
-            date = datetime.now().strftime('%Y-%m-%d')
-            
-            # Create lookup dictionaries
-            old_positions = {pos['ticker']: pos for pos in old_portfolio.get('positions', [])}
-            new_positions = {pos['ticker']: pos for pos in new_portfolio.get('positions', [])}
+            now = datetime.now()
+            date = now.strftime('%Y-%m-%d')
+            created_at = now.isoformat()
             
-            all_tickers = set(old_positions.keys()) | set(new_positions.keys())
+            def position_rows(portfolio: Dict[str, Any]):
+                return [(pos['ticker'], pos.get('shares', 0), pos.get('avg_price', 0))
+                        for pos in portfolio.get('positions', [])]
             
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                for ticker in all_tickers:
-                    old_pos = old_positions.get(ticker, {})
-                    new_pos = new_positions.get(ticker, {})
-                    
-                    old_shares = old_pos.get('shares', 0)
-                    new_shares = new_pos.get('shares', 0)
-                    old_avg_price = old_pos.get('avg_price', 0)
-                    new_avg_price = new_pos.get('avg_price', 0)
-                    
-                    # Determine change type
-                    if old_shares == 0 and new_shares > 0:
-                        change_type = "added"
-                    elif old_shares > 0 and new_shares == 0:
-                        change_type = "removed"
-                    elif old_shares != new_shares:
-                        change_type = "shares_changed"
-                    elif old_avg_price != new_avg_price:
-                        change_type = "price_updated"
-                    else:
-                        continue  # No change
-                    
-                    cursor.execute('''
-                        INSERT INTO position_changes
-                        (date, owner, ticker, change_type, old_shares, new_shares,
-                         old_avg_price, new_avg_price, reason, created_at)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        date, owner, ticker, change_type,
-                        old_shares, new_shares, old_avg_price, new_avg_price,
-                        reason, datetime.now().isoformat()
-                    ))
+            with self._connect() as conn:
+                # Load both sides into temp tables and let SQLite diff them in one statement;
+                # INSERT OR REPLACE keeps the last entry for a duplicated ticker
+                for table, portfolio in (('tmp_old_positions', old_portfolio), ('tmp_new_positions', new_portfolio)):
+                    conn.execute(f'''
+                        CREATE TEMP TABLE IF NOT EXISTS {table}
+                        (ticker TEXT PRIMARY KEY, shares REAL, avg_price REAL)
+                    ''')
+                    conn.execute(f'DELETE FROM {table}')
+                    conn.executemany(f'INSERT OR REPLACE INTO {table} VALUES (?, ?, ?)',
+                                     position_rows(portfolio))
+                
+                # Full outer join of old and new positions, written as LEFT JOIN + anti-join
+                # so it also runs on SQLite versions before 3.39
+                cursor = conn.execute('''
+                    INSERT INTO position_changes
+                    (date, owner, ticker, change_type, old_shares, new_shares,
+                     old_avg_price, new_avg_price, reason, created_at)
+                    SELECT ?, ?, ticker,
+                           CASE
+                               WHEN old_shares = 0 AND new_shares > 0 THEN 'added'
+                               WHEN old_shares > 0 AND new_shares = 0 THEN 'removed'
+                               WHEN old_shares != new_shares THEN 'shares_changed'
+                               WHEN old_avg_price != new_avg_price THEN 'price_updated'
+                           END AS change_type,
+                           old_shares, new_shares, old_avg_price, new_avg_price, ?, ?
+                    FROM (
+                        SELECT n.ticker,
+                               COALESCE(o.shares, 0) AS old_shares, COALESCE(n.shares, 0) AS new_shares,
+                               COALESCE(o.avg_price, 0) AS old_avg_price, COALESCE(n.avg_price, 0) AS new_avg_price
+                        FROM tmp_new_positions n LEFT JOIN tmp_old_positions o USING (ticker)
+                        UNION ALL
+                        SELECT o.ticker, COALESCE(o.shares, 0), 0, COALESCE(o.avg_price, 0), 0
+                        FROM tmp_old_positions o
+                        WHERE o.ticker NOT IN (SELECT ticker FROM tmp_new_positions)
+                    )
+                    WHERE change_type IS NOT NULL
+                ''', (date, owner, reason, created_at))
                 
                 conn.commit()
-                logger.info(f"Tracked position changes for {date}")
+                logger.info(f"Tracked {cursor.rowcount} position changes for {date}")
                 return True
                 
         except Exception as e:
             logger.error(f"Error tracking position changes: {e}")
             return False
     
-    def cleanup_old_data(self, days_to_keep: int = 365) -> bool:
-        """Clean up old data beyond specified days"""
+    def cleanup_old_data(self, days_to_keep: int = 365, batch_size: int = 1000) -> bool:
+        """
+        Clean up old data beyond specified days
+        
+        Rows are deleted batch_size at a time with a commit in between, so no single transaction
+        holds the write lock (or grows the WAL) for the whole cleanup.
+        """
         try:
             cutoff_date = (datetime.now() - timedelta(days=days_to_keep)).strftime('%Y-%m-%d')
             
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Clean up old snapshots
-                cursor.execute('DELETE FROM portfolio_snapshots WHERE date < ?', (cutoff_date,))
-                deleted_snapshots = cursor.rowcount
-                
-                # Clean up old performance metrics
-                cursor.execute('DELETE FROM performance_metrics WHERE date < ?', (cutoff_date,))
-                deleted_metrics = cursor.rowcount
-                
-                # Clean up old AI insights
-                cursor.execute('DELETE FROM ai_insights WHERE date < ?', (cutoff_date,))
-                deleted_insights = cursor.rowcount
-                
-                # Clean up old position changes
-                cursor.execute('DELETE FROM position_changes WHERE date < ?', (cutoff_date,))
-                deleted_changes = cursor.rowcount
-                
-                conn.commit()
-                
-                logger.info(f"Cleaned up old data: {deleted_snapshots} snapshots, "
-                          f"{deleted_metrics} metrics, {deleted_insights} insights, "
-                          f"{deleted_changes} position changes")
-                
-                return True
+            deleted = {}
+            for table in ('portfolio_snapshots', 'performance_metrics', 'ai_insights', 'position_changes'):
+                deleted[table] = 0
+                while True:
+                    # Reacquire the connection per batch so other threads can use it in between
+                    with self._connect() as conn:
+                        cursor = conn.execute(f'''
+                            DELETE FROM {table} WHERE rowid IN
+                            (SELECT rowid FROM {table} WHERE date < ? LIMIT ?)
+                        ''', (cutoff_date, batch_size))
+                    deleted[table] += cursor.rowcount
+                    if cursor.rowcount < batch_size:
+                        break
+            
+            with self._connect() as conn:
+                # executescript steps the PRAGMA to completion; execute() would free only one page
+                conn.executescript('PRAGMA incremental_vacuum;')
+            
+            logger.info(f"Cleaned up old data: {deleted['portfolio_snapshots']} snapshots, "
+                      f"{deleted['performance_metrics']} metrics, {deleted['ai_insights']} insights, "
+                      f"{deleted['position_changes']} position changes")
+            
+            return True
                 
         except Exception as e:
             logger.error(f"Error cleaning up old data: {e}")
@@ -490,28 +689,47 @@ class HistoricalDataStore:
     
     def export_data(self, owner: str, export_path: str, 
                    start_date: Optional[str] = None,
-                   end_date: Optional[str] = None) -> bool:
-        """Export portfolio data to CSV/JSON files"""
+                   end_date: Optional[str] = None,
+                   file_format: str = "csv") -> bool:
+        """
+        Export portfolio data to CSV or Parquet files
+        
+        file_format="parquet" writes Snappy-compressed Parquet (requires pyarrow), which is
+        much smaller than CSV and keeps column types. Parquet exports are meant for analytics
+        and leave out the nested portfolio_data/ai_analysis JSON columns.
+        """
         try:
+            if file_format not in ("csv", "parquet"):
+                raise ValueError(f"Unsupported export format: {file_format}")
+            
             export_dir = Path(export_path)
             export_dir.mkdir(parents=True, exist_ok=True)
             
             # Set date range
+            now = datetime.now()
             if not start_date:
-                start_date = (datetime.now() - timedelta(days=365)).strftime('%Y-%m-%d')
+                start_date = (now - timedelta(days=365)).strftime('%Y-%m-%d')
             if not end_date:
-                end_date = datetime.now().strftime('%Y-%m-%d')
+                end_date = now.strftime('%Y-%m-%d')
+            params = (owner, start_date, end_date)
+            
+            if file_format == "parquet":
+                payload_columns = ""
+            else:
+                # JSON columns as text, whatever their storage format
+                payload_columns = (f"{_json_out('portfolio_data')} AS portfolio_data, "
+                                   f"{_json_out('ai_analysis')} AS ai_analysis,")
             
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 # Export portfolio snapshots
-                snapshots_query = '''
-                    SELECT * FROM portfolio_snapshots 
+                snapshots_query = f'''
+                    SELECT snapshot_id, date, owner, total_positions, total_invested_value,
+                           {payload_columns} advisory_mode, created_at
+                    FROM portfolio_snapshots 
                     WHERE owner = ? AND date BETWEEN ? AND ?
                     ORDER BY date
                 '''
-                df_snapshots = pd.read_sql_query(snapshots_query, conn, 
-                                               params=(owner, start_date, end_date))
-                df_snapshots.to_csv(export_dir / 'portfolio_snapshots.csv', index=False)
+                self._export_query(conn, snapshots_query, params, export_dir / 'portfolio_snapshots', file_format)
                 
                 # Export performance metrics
                 metrics_query = '''
@@ -519,9 +737,7 @@ class HistoricalDataStore:
                     WHERE owner = ? AND date BETWEEN ? AND ?
                     ORDER BY date
                 '''
-                df_metrics = pd.read_sql_query(metrics_query, conn, 
-                                             params=(owner, start_date, end_date))
-                df_metrics.to_csv(export_dir / 'performance_metrics.csv', index=False)
+                self._export_query(conn, metrics_query, params, export_dir / 'performance_metrics', file_format)
                 
                 # Export AI insights
                 insights_query = '''
@@ -529,9 +745,7 @@ class HistoricalDataStore:
                     WHERE owner = ? AND date BETWEEN ? AND ?
                     ORDER BY created_at
                 '''
-                df_insights = pd.read_sql_query(insights_query, conn, 
-                                              params=(owner, start_date, end_date))
-                df_insights.to_csv(export_dir / 'ai_insights.csv', index=False)
+                self._export_query(conn, insights_query, params, export_dir / 'ai_insights', file_format)
                 
                 logger.info(f"Exported data to {export_dir}")
                 return True
@@ -539,6 +753,43 @@ class HistoricalDataStore:
         except Exception as e:
             logger.error(f"Error exporting data: {e}")
             return False
+    
+    @staticmethod
+    def _export_query(conn: sqlite3.Connection, query: str, params: Tuple, path: Path,
+                      file_format: str, chunksize: int = 4096):
+        """Stream a query to path.csv / path.parquet in chunks, so at most chunksize rows are in memory"""
+        chunks = pd.read_sql_query(query, conn, params=params, chunksize=chunksize)
+        
+        if file_format == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            
+            writer = None
+            try:
+                for chunk in chunks:
+                    if writer is None:
+                        # Schema comes from the first chunk; later chunks are cast to it
+                        table = pa.Table.from_pandas(chunk, preserve_index=False)
+                        writer = pq.ParquetWriter(path.with_suffix('.parquet'), table.schema, compression='snappy')
+                    else:
+                        table = pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+                    writer.write_table(table)
+            finally:
+                if writer is not None:
+                    writer.close()
+        else:
+            csv_path = path.with_suffix('.csv')
+            for i, chunk in enumerate(chunks):
+                chunk.to_csv(csv_path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+
+# Global instance, created on first access (PEP 562) so importing this module touches no files
+_singleton: Optional[HistoricalDataStore] = None
+
 
-# Global instance
-historical_store = HistoricalDataStore()
+def __getattr__(name):
+    global _singleton
+    if name == 'historical_store':
+        if _singleton is None:
+            _singleton = HistoricalDataStore()
+        return _singleton
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
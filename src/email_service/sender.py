@@ -1,22 +1,287 @@
+import base64
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
-from email import encoders
+from email.generator import BytesGenerator
+from email.policy import compat32
+from io import BytesIO, StringIO
 import os
+import asyncio
+import atexit
 import logging
+import queue
+import re
+import threading
 import time
-from typing import Dict, Any, List, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple, Union
 from datetime import datetime
-import jinja2
 from pathlib import Path
 from utils.api_logger import APILogger
 
+try:
+    import aiosmtplib
+    AIOSMTPLIB_AVAILABLE = True
+except ImportError:  # aiosmtplib is optional; batches then go through the thread pool
+    AIOSMTPLIB_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Characters dropped from dry-run file names: anything but letters, digits, space, '-' and '_'
+_UNSAFE_FILENAME_CHARS = re.compile(r'[^\w \-]')
+
+# Attachment read size: 57 raw bytes encode to one 76-column base64 line
+ATTACHMENT_CHUNK_SIZE = 57 * 1024
+
+def _flatten_message(msg: MIMEMultipart) -> bytes:
+    """
+    Serialize a message for the SMTP DATA command in one generator pass
+    
+    send_message would copy the message and re-flatten it under its own policy; the envelope
+    is passed to sendmail explicitly instead.
+    """
+    buffer = BytesIO()
+    BytesGenerator(buffer, mangle_from_=False, policy=compat32).flatten(msg, linesep='\r\n')
+    return buffer.getvalue()
+
+class PipeliningSMTP(smtplib.SMTP):
+    """
+    smtplib.SMTP that pipelines MAIL FROM, RCPT TO and DATA (RFC 2920)
+    
+    When the server advertises PIPELINING the envelope commands go out in one write and
+    their replies are read afterwards, one round trip instead of two plus one per recipient.
+    Servers without the extension get the stock smtplib behaviour.
+    """
+    
+    def sendmail(self, from_addr, to_addrs, msg, mail_options=(), rcpt_options=()):
+        self.ehlo_or_helo_if_needed()
+        if not self.has_extn('pipelining'):
+            return super().sendmail(from_addr, to_addrs, msg, mail_options, rcpt_options)
+        
+        if isinstance(msg, str):
+            msg = smtplib._fix_eols(msg).encode('ascii')
+        if isinstance(to_addrs, str):
+            to_addrs = [to_addrs]
+        
+        esmtp_opts = []
+        if self.has_extn('size'):
+            esmtp_opts.append("size=%d" % len(msg))
+        esmtp_opts.extend(mail_options)
+        mail_suffix = ' ' + ' '.join(esmtp_opts) if esmtp_opts else ''
+        rcpt_suffix = ' ' + ' '.join(rcpt_options) if rcpt_options else ''
+        
+        commands = [f"mail FROM:{smtplib.quoteaddr(from_addr)}{mail_suffix}"]
+        commands.extend(f"rcpt TO:{smtplib.quoteaddr(addr)}{rcpt_suffix}" for addr in to_addrs)
+        commands.append("data")
+        self.send(''.join(command + smtplib.CRLF for command in commands))
+        
+        # Replies come back in command order
+        mail_reply = self.getreply()
+        rcpt_replies = [self.getreply() for _ in to_addrs]
+        data_code, data_resp = self.getreply()
+        
+        refused = {addr: reply for addr, reply in zip(to_addrs, rcpt_replies) if reply[0] not in (250, 251)}
+        error = None
+        if mail_reply[0] != 250:
+            error = smtplib.SMTPSenderRefused(mail_reply[0], mail_reply[1], from_addr)
+        elif len(refused) == len(to_addrs):
+            error = smtplib.SMTPRecipientsRefused(refused)
+        elif data_code != 354:
+            error = smtplib.SMTPDataError(data_code, data_resp)
+        
+        if error is not None:
+            if 421 in (mail_reply[0], data_code, *(code for code, _ in rcpt_replies)):
+                self.close()
+            else:
+                if data_code == 354:
+                    # The server is waiting for a body; end it empty before resetting
+                    self.send(b"." + smtplib.bCRLF)
+                    self.getreply()
+                self._rset()
+            raise error
+        
+        body = smtplib._quote_periods(msg)
+        if body[-2:] != smtplib.bCRLF:
+            body += smtplib.bCRLF
+        self.send(body + b"." + smtplib.bCRLF)
+        code, resp = self.getreply()
+        if code != 250:
+            if code == 421:
+                self.close()
+            else:
+                self._rset()
+            raise smtplib.SMTPDataError(code, resp)
+        
+        return refused
+
+class SMTPConnectionPool:
+    """
+    Fixed-size pool of authenticated keep-alive SMTP sessions
+    - Connections are opened lazily and reused across sends
+    - Idle sessions are health-checked with NOOP before reuse
+    - Sessions are recycled after max_messages sends
+    - Envelope commands are pipelined when the server supports it
+    """
+    
+    def __init__(self, smtp_host: str, smtp_port: int, smtp_user: Optional[str] = None,
+                 smtp_pass: Optional[str] = None, smtp_tls: bool = True,
+                 max_connections: int = 5, max_messages: int = 100, timeout: int = 30):
+        self.smtp_host = smtp_host
+        self.smtp_port = smtp_port
+        self.smtp_user = smtp_user
+        self.smtp_pass = smtp_pass
+        self.smtp_tls = smtp_tls
+        self.max_messages = max_messages
+        self.timeout = timeout
+        
+        # Idle sessions as (server, messages_sent); the semaphore caps open sessions
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_connections)
+    
+    def _connect(self) -> smtplib.SMTP:
+        """Open a new SMTP session with STARTTLS and AUTH"""
+        server = PipeliningSMTP(self.smtp_host, self.smtp_port, timeout=self.timeout)
+        try:
+            if self.smtp_tls:
+                server.starttls()
+            
+            if self.smtp_user and self.smtp_pass:
+                server.login(self.smtp_user, self.smtp_pass)
+        except Exception:
+            self._close(server)
+            raise
+        
+        logger.debug(f"Opened SMTP session to {self.smtp_host}:{self.smtp_port}")
+        return server
+    
+    @staticmethod
+    def _close(server: smtplib.SMTP) -> None:
+        """Close a session, ignoring errors from already-dead connections"""
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+    
+    @staticmethod
+    def _is_alive(server: smtplib.SMTP) -> bool:
+        """Health check an idle session with NOOP"""
+        try:
+            return server.noop()[0] == 250
+        except Exception:
+            return False
+    
+    def _checkout(self) -> Tuple[smtplib.SMTP, int]:
+        """Get a live idle session or open a new one"""
+        while True:
+            try:
+                server, messages_sent = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect(), 0
+            
+            if self._is_alive(server):
+                return server, messages_sent
+            
+            logger.debug("Discarding dead SMTP session from pool")
+            self._close(server)
+    
+    @contextmanager
+    def acquire(self, messages: int = 1):
+        """Borrow an SMTP session for up to messages sends; it is returned to the pool on success"""
+        self._slots.acquire()
+        try:
+            server, messages_sent = self._checkout()
+            try:
+                yield server
+            except Exception:
+                # Session state is unknown after a failed send, don't reuse it
+                self._close(server)
+                raise
+            
+            messages_sent += messages
+            if messages_sent >= self.max_messages:
+                self._close(server)
+            else:
+                self._idle.put((server, messages_sent))
+        finally:
+            self._slots.release()
+    
+    def close_all(self) -> None:
+        """Close all idle sessions"""
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close(server)
+
+
+# Shared pools keyed by SMTP account so every sender for the same account reuses sessions
+_smtp_pools: Dict[Tuple[str, int, Optional[str], bool], SMTPConnectionPool] = {}
+_smtp_pools_lock = threading.Lock()
+
+def get_smtp_pool(smtp_host: str, smtp_port: int, smtp_user: Optional[str] = None,
+                  smtp_pass: Optional[str] = None, smtp_tls: bool = True,
+                  max_connections: int = 5, max_messages: int = 100) -> SMTPConnectionPool:
+    """Get (or create) the shared connection pool for an SMTP account"""
+    key = (smtp_host, smtp_port, smtp_user, smtp_tls)
+    with _smtp_pools_lock:
+        pool = _smtp_pools.get(key)
+        if pool is None:
+            pool = SMTPConnectionPool(
+                smtp_host, smtp_port, smtp_user, smtp_pass, smtp_tls,
+                max_connections=max_connections, max_messages=max_messages
+            )
+            _smtp_pools[key] = pool
+        return pool
+
+def close_smtp_pools() -> None:
+    """Close all pooled SMTP sessions"""
+    with _smtp_pools_lock:
+        for pool in _smtp_pools.values():
+            pool.close_all()
+
+atexit.register(close_smtp_pools)
+
+@lru_cache(maxsize=None)
+def _get_jinja_env():
+    """Process-wide Jinja2 environment for the email templates; jinja2 is imported on first use"""
+    import jinja2
+    
+    # auto_reload=False: templates ship with the code, so skip the mtime check per lookup.
+    # Compiled bytecode is kept in a per-user temp directory, so later processes skip
+    # parsing and code generation (the cache key includes the template source checksum).
+    # Every template is HTML, so autoescape is always on; trim/lstrip_blocks drop the
+    # whitespace around block tags from the rendered (and transmitted) output.
+    env = jinja2.Environment(
+        loader=jinja2.FileSystemLoader(Path(__file__).parent / "templates"),
+        autoescape=True,
+        trim_blocks=True,
+        lstrip_blocks=True,
+        auto_reload=False,
+        cache_size=400,
+        bytecode_cache=jinja2.FileSystemBytecodeCache()
+    )
+    
+    # Add custom filters
+    env.filters['strftime'] = EmailSender._strftime_filter
+    return env
+
 class EmailSender:
+    TEMPLATE_NAMES = ("stock_detail.html", "portfolio_overview.html", "all_stocks_advisory.html")
+    
+    # Send batches over aiosmtplib when it is installed; subclasses that override send_email turn this off
+    async_batch = True
+    
     def __init__(self, smtp_host: str, smtp_port: int, smtp_user: str, smtp_pass: str, 
-                 mail_from: Optional[str] = None, smtp_tls: bool = True):
+                 mail_from: Optional[str] = None, smtp_tls: bool = True,
+                 pool_size: int = 5, max_messages_per_connection: int = 100,
+                 api_log: bool = True):
         self.smtp_host = smtp_host
         self.smtp_port = smtp_port
         self.smtp_user = smtp_user
@@ -24,23 +289,28 @@ class EmailSender:
         self.mail_from = mail_from or smtp_user
         self.smtp_tls = smtp_tls
         
-        # Initialize API logger
-        self.api_logger = APILogger()
-        
-        # Setup Jinja2 template environment
-        template_dir = Path(__file__).parent / "templates"
-        self.jinja_env = jinja2.Environment(
-            loader=jinja2.FileSystemLoader(template_dir),
-            autoescape=jinja2.select_autoescape(['html', 'xml'])
+        # Keep-alive SMTP sessions shared by all senders for this account
+        self.smtp_pool = get_smtp_pool(
+            smtp_host, smtp_port, smtp_user, smtp_pass, smtp_tls,
+            max_connections=pool_size, max_messages=max_messages_per_connection
         )
         
-        # Add custom filters
-        self.jinja_env.filters['strftime'] = self._strftime_filter
+        # Initialize API logger; with api_log=False sends skip the per-email log records
+        self.api_logger = APILogger() if api_log else None
+        
+        # Jinja2 template environment, shared by every sender in the process
+        self.jinja_env = _get_jinja_env()
+        
+        # Compile the email templates once; render paths index this dict directly
+        self._templates = {name: self.jinja_env.get_template(name) for name in self.TEMPLATE_NAMES}
+        
+        # Per-thread SMTP session pinned by session()
+        self._pinned = threading.local()
 
-    def send_stock_advisory_email(self, stock_advisory: Dict[str, Any], recipient: str) -> bool:
+    def send_stock_advisory_email(self, stock_advisory: Dict[str, Any], recipient: Union[str, List[str]]) -> bool:
         """Send individual stock advisory email"""
         try:
-            template = self.jinja_env.get_template("stock_detail.html")
+            template = self._templates["stock_detail.html"]
             
             # Prepare template data
             template_data = {
@@ -64,17 +334,17 @@ class EmailSender:
             
             subject = f"📈 {stock_advisory['position']['ticker']} Stock Advisory - {datetime.now().strftime('%B %d, %Y')}"
             
-            return self.send_email(recipient, subject, html_content)
+            return self._deliver(recipient, subject, html_content)
             
         except Exception as e:
             logger.error(f"Error sending stock advisory email: {e}")
             return False
 
     def send_portfolio_overview_email(self, portfolio_advisory: Dict[str, Any], 
-                                    holdings_data: Dict[str, Any], recipient: str) -> bool:
+                                    holdings_data: Dict[str, Any], recipient: Union[str, List[str]]) -> bool:
         """Send portfolio overview email"""
         try:
-            template = self.jinja_env.get_template("portfolio_overview.html")
+            template = self._templates["portfolio_overview.html"]
             
             # Prepare template data
             template_data = {
@@ -88,7 +358,7 @@ class EmailSender:
             
             subject = f"📊 Portfolio Overview - {datetime.now().strftime('%B %d, %Y')}"
             
-            return self.send_email(recipient, subject, html_content)
+            return self._deliver(recipient, subject, html_content)
             
         except Exception as e:
             logger.error(f"Error sending portfolio overview email: {e}")
@@ -97,143 +367,392 @@ class EmailSender:
     def send_all_stocks_advisory_email(self, stock_advisories: List[Dict[str, Any]], 
                                      portfolio_data: Dict[str, Any], 
                                      portfolio_metrics: Dict[str, Any],
-                                     recipient: str) -> bool:
+                                     recipient: Union[str, List[str]]) -> bool:
         logger.info(f"Sending consolidated all-stocks advisory email to {recipient} with {len(stock_advisories)} advisories")
         """Send consolidated email with all stock advisories"""
         try:
-            template = self.jinja_env.get_template("all_stocks_advisory.html")
+            template = self._templates["all_stocks_advisory.html"]
+            
+            # One clock read for the date, timestamp and subject
+            now = datetime.now()
+            today = now.strftime('%B %d, %Y')
             
             # Prepare template data
             template_data = {
-                "date": datetime.now().strftime('%B %d, %Y'),
+                "date": today,
                 "portfolio": portfolio_data,
                 "portfolio_metrics": portfolio_metrics,
                 "stock_advisories": stock_advisories,
-                "generated_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                "generated_at": now.strftime('%Y-%m-%d %H:%M:%S')
             }
             
             html_content = template.render(**template_data)
             
-            subject = f"📈 Daily Stock Advisory - {len(stock_advisories)} Positions - {datetime.now().strftime('%B %d, %Y')}"
+            subject = f"📈 Daily Stock Advisory - {len(stock_advisories)} Positions - {today}"
             
-            return self.send_email(recipient, subject, html_content)
+            return self._deliver(recipient, subject, html_content)
             
         except Exception as e:
             logger.error(f"Error sending all-stocks advisory email: {e}")
             return False
 
+    def _deliver(self, recipient: Union[str, List[str]], subject: str, html_content: str) -> bool:
+        """
+        Send a rendered email to one address or to each address in a list
+        
+        A list goes through send_batch_emails, so the template is rendered once however many
+        recipients there are. Returns True only if every recipient was sent to.
+        """
+        if isinstance(recipient, str):
+            return self.send_email(recipient, subject, html_content)
+        
+        results = self.send_batch_emails([
+            {"recipient": address, "subject": subject, "html_content": html_content}
+            for address in recipient
+        ])
+        return results["failed"] == 0
+
     def send_email(self, recipient: str, subject: str, html_content: str, 
-                   attachments: Optional[List[Dict[str, Any]]] = None) -> bool:
-        """Send email with HTML content and optional attachments"""
+                   attachments: Optional[List[Dict[str, Any]]] = None,
+                   server: Optional[smtplib.SMTP] = None) -> bool:
+        """
+        Send email with HTML content and optional attachments
+        
+        Pass server to send over an already borrowed session (see send_batch_emails);
+        otherwise the session pinned by session() is used, or one is checked out of
+        the pool for this message.
+        """
+        pinned = server is None and getattr(self._pinned, "server", None) is not None
+        if pinned:
+            server = self._pinned.server
         try:
-            # Create message
-            msg = MIMEMultipart('alternative')
-            msg['From'] = self.mail_from
-            msg['To'] = recipient
-            msg['Subject'] = subject
-            msg['Date'] = datetime.now().strftime('%a, %d %b %Y %H:%M:%S %z')
-            
-            # Add HTML content
-            html_part = MIMEText(html_content, 'html', 'utf-8')
-            msg.attach(html_part)
-            
-            # Add attachments if provided
-            if attachments:
-                for attachment in attachments:
-                    self._add_attachment(msg, attachment)
+            msg = self._build_message(recipient, subject, html_content, attachments)
             
             # Log the SMTP request
             start_time = time.time()
-            request_id = self.api_logger.log_request(
-                api_name="SMTP_Email",
-                method="SEND",
-                url=f"smtp://{self.smtp_host}:{self.smtp_port}",
-                params={
-                    "recipient": recipient,
-                    "subject": subject,
-                    "content_size": len(html_content),
-                    "attachments_count": len(attachments) if attachments else 0,
-                    "tls_enabled": self.smtp_tls
-                }
-            )
+            request_id = self._log_smtp_request(recipient, subject, html_content, attachments)
             
-            # Send email
-            with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-                if self.smtp_tls:
-                    server.starttls()
-                
-                if self.smtp_user and self.smtp_pass:
-                    server.login(self.smtp_user, self.smtp_pass)
-                
-                server.send_message(msg)
+            # Send email over the caller's session or a pooled one
+            data = _flatten_message(msg)
+            if server is not None:
+                server.sendmail(self.mail_from, [recipient], data)
+            else:
+                with self.smtp_pool.acquire() as pooled:
+                    pooled.sendmail(self.mail_from, [recipient], data)
             
-            duration_ms = (time.time() - start_time) * 1000
+            self._log_smtp_response(request_id, recipient, subject, start_time)
+            logger.info(f"Email sent successfully to {recipient}: {subject}")
+            return True
             
-            # Log successful email response
-            self.api_logger.log_response(
-                request_id=request_id,
-                api_name="SMTP_Email",
-                status_code=250,  # SMTP success code
-                response_data={
-                    "message": "Email sent successfully",
-                    "recipient": recipient,
-                    "subject": subject
-                },
-                duration_ms=duration_ms
-            )
+        except Exception as e:
+            if 'request_id' in locals():
+                self._log_smtp_response(request_id, recipient, subject, start_time, error=str(e))
+            if pinned and isinstance(e, smtplib.SMTPServerDisconnected):
+                # Later sends in the session fall back to the pool
+                self._pinned.server = None
+            
+            logger.error(f"Failed to send email to {recipient}: {e}")
+            return False
+
+    async def send_email_async(self, server: "aiosmtplib.SMTP", recipient: str, subject: str,
+                               html_content: str, attachments: Optional[List[Dict[str, Any]]] = None) -> bool:
+        """Send email over an open aiosmtplib session"""
+        try:
+            msg = self._build_message(recipient, subject, html_content, attachments)
+            
+            start_time = time.time()
+            request_id = self._log_smtp_request(recipient, subject, html_content, attachments)
+            
+            await server.sendmail(self.mail_from, [recipient], _flatten_message(msg))
             
+            self._log_smtp_response(request_id, recipient, subject, start_time)
             logger.info(f"Email sent successfully to {recipient}: {subject}")
             return True
             
         except Exception as e:
-            duration_ms = (time.time() - start_time) * 1000 if 'start_time' in locals() else 0
-            
-            # Log error response
             if 'request_id' in locals():
-                self.api_logger.log_response(
-                    request_id=request_id,
-                    api_name="SMTP_Email",
-                    status_code=0,
-                    duration_ms=duration_ms,
-                    error=str(e)
-                )
+                self._log_smtp_response(request_id, recipient, subject, start_time, error=str(e))
             
             logger.error(f"Failed to send email to {recipient}: {e}")
             return False
 
-    def send_batch_emails(self, email_batch: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Send multiple emails in batch"""
+    def _build_message(self, recipient: str, subject: str, html_content: str,
+                       attachments: Optional[List[Dict[str, Any]]] = None) -> MIMEMultipart:
+        """Create the MIME message for an HTML email"""
+        msg = MIMEMultipart('alternative')
+        msg['From'] = self.mail_from
+        msg['To'] = recipient
+        msg['Subject'] = subject
+        msg['Date'] = datetime.now().strftime('%a, %d %b %Y %H:%M:%S %z')
+        
+        # Add HTML content
+        html_part = MIMEText(html_content, 'html', 'utf-8')
+        msg.attach(html_part)
+        
+        # Add attachments if provided
+        if attachments:
+            for attachment in attachments:
+                self._add_attachment(msg, attachment)
+        
+        return msg
+
+    def _log_smtp_request(self, recipient: str, subject: str, html_content: str,
+                          attachments: Optional[List[Dict[str, Any]]] = None) -> Optional[str]:
+        """Log an outgoing email with the API logger; returns the request ID (None when logging is off)"""
+        if self.api_logger is None:
+            return None
+        
+        return self.api_logger.log_request(
+            api_name="SMTP_Email",
+            method="SEND",
+            url=f"smtp://{self.smtp_host}:{self.smtp_port}",
+            params={
+                "recipient": recipient,
+                "subject": subject,
+                "content_size": len(html_content),
+                "attachments_count": len(attachments) if attachments else 0,
+                "tls_enabled": self.smtp_tls
+            }
+        )
+
+    def _log_smtp_response(self, request_id: Optional[str], recipient: str, subject: str,
+                           start_time: float, error: Optional[str] = None) -> None:
+        """Log the outcome of an email sent with _log_smtp_request"""
+        if request_id is None:
+            return
+        
+        duration_ms = (time.time() - start_time) * 1000
+        
+        if error:
+            self.api_logger.log_response(
+                request_id=request_id,
+                api_name="SMTP_Email",
+                status_code=0,
+                duration_ms=duration_ms,
+                error=error
+            )
+            return
+        
+        self.api_logger.log_response(
+            request_id=request_id,
+            api_name="SMTP_Email",
+            status_code=250,  # SMTP success code
+            response_data={
+                "message": "Email sent successfully",
+                "recipient": recipient,
+                "subject": subject
+            },
+            duration_ms=duration_ms
+        )
+
+    def send_batch_emails(self, email_batch: List[Dict[str, Any]], concurrency: int = 4) -> Dict[str, Any]:
+        """
+        Send multiple emails in batch
+        
+        With aiosmtplib installed (and no event loop running in this thread) the batch is sent
+        by send_batch_emails_async on one event loop. Otherwise it is split across up to
+        concurrency worker threads. Each worker sends its share over one SMTP session, recycled
+        every max_messages sends, instead of checking a session out of the pool (and
+        health-checking it) per message. The pool size still caps how many sessions are open at once.
+        """
+        if AIOSMTPLIB_AVAILABLE and self.async_batch and not self._in_event_loop():
+            return asyncio.run(self._send_batch_async(email_batch, connections=concurrency))
+        
         results = {
             "sent": 0,
             "failed": 0,
             "errors": []
         }
         
-        for email_data in email_batch:
+        workers = max(1, min(concurrency, len(email_batch)))
+        shares = [email_batch[i::workers] for i in range(workers)]
+        
+        if workers == 1:
+            partials = [self._send_batch_share(shares[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="smtp-batch") as executor:
+                futures = [executor.submit(self._send_batch_share, share) for share in shares]
+                partials = [future.result() for future in as_completed(futures)]
+        
+        for partial in partials:
+            results["sent"] += partial["sent"]
+            results["failed"] += partial["failed"]
+            results["errors"].extend(partial["errors"])
+        
+        logger.info(f"Batch email results: {results['sent']} sent, {results['failed']} failed")
+        return results
+
+    def _send_batch_share(self, email_batch: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Send part of a batch sequentially over one SMTP session at a time"""
+        results = {
+            "sent": 0,
+            "failed": 0,
+            "errors": []
+        }
+        
+        pending = list(email_batch)
+        while pending:
+            group = pending[:self.smtp_pool.max_messages]
+            processed = 0
             try:
-                success = self.send_email(**email_data)
-                if success:
-                    results["sent"] += 1
+                with self._open_smtp(len(group)) as server:
+                    for email_data in group:
+                        processed += 1
+                        try:
+                            success = self.send_email(**email_data, server=server)
+                        except Exception as e:
+                            results["failed"] += 1
+                            results["errors"].append(f"Error sending to {email_data.get('recipient', 'unknown')}: {str(e)}")
+                            continue
+                        
+                        if success:
+                            results["sent"] += 1
+                            continue
+                        
+                        results["failed"] += 1
+                        results["errors"].append(f"Failed to send to {email_data.get('recipient', 'unknown')}")
+                        if server is not None and not SMTPConnectionPool._is_alive(server):
+                            # Drop the dead session and retry the rest of the group on a new one
+                            raise smtplib.SMTPServerDisconnected("SMTP session lost during batch")
+                        
+            except Exception as e:
+                if processed == 0:
+                    # Could not open a session at all; fail this group rather than retrying forever
+                    processed = len(group)
+                    results["failed"] += processed
+                    results["errors"].extend(
+                        f"Error sending to {email_data.get('recipient', 'unknown')}: {str(e)}" for email_data in group
+                    )
                 else:
+                    logger.warning(f"SMTP session failed during batch, reconnecting: {e}")
+            
+            pending = pending[processed:]
+        
+        return results
+
+    async def send_batch_emails_async(self, email_batch: List[Dict[str, Any]], connections: int = 4) -> Dict[str, Any]:
+        """Async variant of send_batch_emails for callers already running an event loop"""
+        if AIOSMTPLIB_AVAILABLE and self.async_batch:
+            return await self._send_batch_async(email_batch, connections)
+        # run_in_executor rather than asyncio.to_thread, which needs Python 3.9
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.send_batch_emails, email_batch, connections)
+
+    async def _send_batch_async(self, email_batch: List[Dict[str, Any]], connections: int = 4) -> Dict[str, Any]:
+        """
+        Send a batch over up to connections aiosmtplib sessions on the current event loop
+        
+        Each session pulls messages from a shared queue, so a slow recipient only holds up
+        its own session. Sessions are recycled after the pool's max_messages sends.
+        """
+        results = {
+            "sent": 0,
+            "failed": 0,
+            "errors": []
+        }
+        
+        pending: asyncio.Queue = asyncio.Queue()
+        for email_data in email_batch:
+            pending.put_nowait(email_data)
+        
+        async def worker():
+            server = None
+            messages_sent = 0
+            try:
+                while not pending.empty():
+                    email_data = pending.get_nowait()
+                    
+                    try:
+                        if server is None or messages_sent >= self.smtp_pool.max_messages:
+                            if server is not None:
+                                await self._close_smtp_async(server)
+                            server = None
+                            server = await self._connect_smtp_async()
+                            messages_sent = 0
+                        
+                        success = await self.send_email_async(server, **email_data)
+                        messages_sent += 1
+                    except Exception as e:
+                        results["failed"] += 1
+                        results["errors"].append(f"Error sending to {email_data.get('recipient', 'unknown')}: {str(e)}")
+                        continue
+                    
+                    if success:
+                        results["sent"] += 1
+                        continue
+                    
                     results["failed"] += 1
                     results["errors"].append(f"Failed to send to {email_data.get('recipient', 'unknown')}")
-                    
-            except Exception as e:
-                results["failed"] += 1
-                results["errors"].append(f"Error sending to {email_data.get('recipient', 'unknown')}: {str(e)}")
+                    if not server.is_connected:
+                        # Reconnect for the next message
+                        server = None
+            finally:
+                if server is not None:
+                    await self._close_smtp_async(server)
+        
+        workers = max(1, min(connections, len(email_batch)))
+        await asyncio.gather(*(worker() for _ in range(workers)))
         
         logger.info(f"Batch email results: {results['sent']} sent, {results['failed']} failed")
         return results
 
+    async def _connect_smtp_async(self) -> "aiosmtplib.SMTP":
+        """Open an aiosmtplib session with STARTTLS and AUTH"""
+        server = aiosmtplib.SMTP(
+            hostname=self.smtp_host, port=self.smtp_port,
+            timeout=self.smtp_pool.timeout, start_tls=self.smtp_tls
+        )
+        await server.connect()
+        try:
+            if self.smtp_user and self.smtp_pass:
+                await server.login(self.smtp_user, self.smtp_pass)
+        except Exception:
+            await self._close_smtp_async(server)
+            raise
+        return server
+
+    @staticmethod
+    async def _close_smtp_async(server: "aiosmtplib.SMTP") -> None:
+        """Close an aiosmtplib session, ignoring errors from already-dead connections"""
+        try:
+            await server.quit()
+        except Exception:
+            server.close()
+
+    @staticmethod
+    def _in_event_loop() -> bool:
+        """Whether an asyncio event loop is running in this thread (asyncio.run would fail)"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        return True
+
+    def _open_smtp(self, messages: int):
+        """Borrow one pooled SMTP session for a run of messages sends"""
+        return self.smtp_pool.acquire(messages)
+
+    @contextmanager
+    def session(self, messages: int = 1):
+        """
+        Send several emails from this thread over one SMTP session
+        
+        Inside the block, send_email (and the send_* helpers built on it) reuse a single
+        pooled session instead of checking one out, and liveness-probing it, per message.
+        """
+        previous = getattr(self._pinned, "server", None)
+        with self._open_smtp(messages) as server:
+            self._pinned.server = server
+            try:
+                yield self
+            finally:
+                self._pinned.server = previous
+
     def test_connection(self) -> bool:
-        """Test SMTP connection"""
+        """Test SMTP connection (the verified session stays in the pool)"""
         try:
-            with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-                if self.smtp_tls:
-                    server.starttls()
-                
-                if self.smtp_user and self.smtp_pass:
-                    server.login(self.smtp_user, self.smtp_pass)
+            with self.smtp_pool.acquire():
+                pass
             
             logger.info("SMTP connection test successful")
             return True
@@ -242,14 +761,24 @@ class EmailSender:
             logger.error(f"SMTP connection test failed: {e}")
             return False
 
+    def close(self) -> None:
+        """Close pooled SMTP sessions for this sender's account"""
+        self.smtp_pool.close_all()
+
     def _add_attachment(self, msg: MIMEMultipart, attachment: Dict[str, Any]):
         """Add attachment to email message"""
         try:
+            # Encode while reading into one buffer: the raw file is never held in memory, only
+            # its base64 text (twice, briefly, while getvalue() builds the payload string).
+            # Chunks are a multiple of 57 bytes, so every chunk ends on a full 76-column line.
+            encoded = StringIO()
             with open(attachment['filepath'], 'rb') as file:
-                part = MIMEBase('application', 'octet-stream')
-                part.set_payload(file.read())
-                
-            encoders.encode_base64(part)
+                for chunk in iter(lambda: file.read(ATTACHMENT_CHUNK_SIZE), b''):
+                    encoded.write(base64.encodebytes(chunk).decode('ascii'))
+            
+            part = MIMEBase('application', 'octet-stream')
+            part.set_payload(encoded.getvalue())
+            part['Content-Transfer-Encoding'] = 'base64'
             part.add_header(
                 'Content-Disposition',
                 f'attachment; filename= {attachment.get("filename", os.path.basename(attachment["filepath"]))}'
@@ -259,7 +788,8 @@ class EmailSender:
         except Exception as e:
             logger.error(f"Failed to add attachment {attachment.get('filepath')}: {e}")
 
-    def _strftime_filter(self, date_str: str, format_str: str = '%B %d, %Y at %I:%M %p') -> str:
+    @staticmethod
+    def _strftime_filter(date_str: str, format_str: str = '%B %d, %Y at %I:%M %p') -> str:
         """Jinja2 filter for date formatting"""
         try:
             if isinstance(date_str, str):
@@ -274,6 +804,8 @@ class EmailSender:
 class DryRunEmailSender(EmailSender):
     """Email sender for testing that doesn't actually send emails"""
     
+    async_batch = False
+    
     def __init__(self, output_dir: str = "output/emails"):
         # Initialize with dummy SMTP settings
         super().__init__("localhost", 587, "test@test.com", "password")
@@ -281,20 +813,22 @@ class DryRunEmailSender(EmailSender):
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
     def send_email(self, recipient: str, subject: str, html_content: str, 
-                   attachments: Optional[List[Dict[str, Any]]] = None) -> bool:
+                   attachments: Optional[List[Dict[str, Any]]] = None,
+                   server: Optional[smtplib.SMTP] = None) -> bool:
         """Save email to file instead of sending"""
         try:
             # Create filename
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            safe_subject = "".join(c for c in subject if c.isalnum() or c in (' ', '-', '_')).rstrip()
+            safe_subject = _UNSAFE_FILENAME_CHARS.sub('', subject).rstrip()
             filename = f"{timestamp}_{safe_subject[:50]}.html"
             
-            # Save to file
+            # Save to file in a single write
             output_file = self.output_dir / filename
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(f"<!-- Email would be sent to: {recipient} -->\n")
-                f.write(f"<!-- Subject: {subject} -->\n")
-                f.write(html_content)
+            output_file.write_bytes(
+                f"<!-- Email would be sent to: {recipient} -->\n"
+                f"<!-- Subject: {subject} -->\n"
+                f"{html_content}".encode('utf-8')
+            )
             
             logger.info(f"DRY RUN: Email saved to {output_file}")
             return True
@@ -306,33 +840,41 @@ class DryRunEmailSender(EmailSender):
     def send_all_stocks_advisory_email(self, stock_advisories: List[Dict[str, Any]], 
                                      portfolio_data: Dict[str, Any], 
                                      portfolio_metrics: Dict[str, Any],
-                                     recipient: str) -> bool:
+                                     recipient: Union[str, List[str]]) -> bool:
         logger.info(
             "DRY RUN: Sending all-stocks advisory email (not actually sent, saved to file)"
         )
         """Save consolidated all-stocks advisory email to file instead of sending"""
         try:
-            template = self.jinja_env.get_template("all_stocks_advisory.html")
+            template = self._templates["all_stocks_advisory.html"]
+            
+            # One clock read for the date, timestamp and subject
+            now = datetime.now()
+            today = now.strftime('%B %d, %Y')
             
             # Prepare template data
             template_data = {
-                "date": datetime.now().strftime('%B %d, %Y'),
+                "date": today,
                 "portfolio": portfolio_data,
                 "portfolio_metrics": portfolio_metrics,
                 "stock_advisories": stock_advisories,
-                "generated_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                "generated_at": now.strftime('%Y-%m-%d %H:%M:%S')
             }
             
             html_content = template.render(**template_data)
             
-            subject = f"📈 Daily Stock Advisory - {len(stock_advisories)} Positions - {datetime.now().strftime('%B %d, %Y')}"
+            subject = f"📈 Daily Stock Advisory - {len(stock_advisories)} Positions - {today}"
             
-            return self.send_email(recipient, subject, html_content)
+            return self._deliver(recipient, subject, html_content)
             
         except Exception as e:
             logger.error(f"Error generating all-stocks advisory email: {e}")
             return False
 
+    def _open_smtp(self, messages: int):
+        """No SMTP session for dry runs"""
+        return nullcontext()
+
     def test_connection(self) -> bool:
         """Always return True for dry run"""
         logger.info("DRY RUN: SMTP connection test (simulated)")
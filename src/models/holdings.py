@@ -1,7 +1,8 @@
-from pydantic import BaseModel, validator
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, PrivateAttr, field_validator
+from typing import List, Optional, Dict, Any, Tuple
+from collections import Counter
 from datetime import datetime
-import json
+import numpy as np
 
 class Position(BaseModel):
     ticker: str
@@ -13,30 +14,35 @@ class Position(BaseModel):
     notes: Optional[str] = None
     date_added: Optional[datetime] = None
     
-    @validator('ticker')
+    @field_validator('ticker')
+    @classmethod
     def ticker_must_be_uppercase(cls, v):
         return v.upper()
     
-    @validator('exchange')
+    @field_validator('exchange')
+    @classmethod
     def exchange_must_be_valid(cls, v):
         valid_exchanges = ['HOSE', 'HNX', 'UPCoM']
         if v not in valid_exchanges:
             raise ValueError(f'Exchange must be one of {valid_exchanges}')
         return v
     
-    @validator('shares')
+    @field_validator('shares')
+    @classmethod
     def shares_must_be_positive(cls, v):
         if v <= 0:
             raise ValueError('Shares must be positive')
         return v
     
-    @validator('avg_price', 'target_price')
+    @field_validator('avg_price', 'target_price')
+    @classmethod
     def prices_must_be_positive(cls, v):
         if v <= 0:
             raise ValueError('Prices must be positive')
         return v
     
-    @validator('max_drawdown_pct')
+    @field_validator('max_drawdown_pct')
+    @classmethod
     def max_drawdown_must_be_negative(cls, v):
         if v > 0:
             raise ValueError('Max drawdown percentage must be negative')
@@ -50,13 +56,38 @@ class Holdings(BaseModel):
     last_updated: Optional[datetime] = None
     version: str = "1.0"
     
-    @validator('currency')
+    # ticker -> Position, kept in sync by add/update/remove_position
+    _index: Dict[str, Position] = PrivateAttr(default_factory=dict)
+    
+    def model_post_init(self, __context: Any) -> None:
+        self._reindex()
+    
+    def _reindex(self) -> None:
+        """Rebuild the ticker index; the first position wins for duplicated tickers"""
+        self._index = {position.ticker: position for position in reversed(self.positions)}
+    
+    def _arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Positions as (tickers, shares, avg_prices) column arrays
+        
+        Built on every call: positions can be edited in place, and a portfolio is small.
+        """
+        tickers = np.array([position.ticker for position in self.positions], dtype=object)
+        shares = np.fromiter((position.shares for position in self.positions),
+                             dtype=np.int64, count=len(self.positions))
+        avg_prices = np.fromiter((position.avg_price for position in self.positions),
+                                 dtype=np.float64, count=len(self.positions))
+        return tickers, shares, avg_prices
+    
+    @field_validator('currency')
+    @classmethod
     def currency_must_be_vnd(cls, v):
         if v != "VND":
             raise ValueError('Only VND currency is supported')
         return v
     
-    @validator('positions')
+    @field_validator('positions')
+    @classmethod
     def positions_must_not_be_empty(cls, v):
         if not v:
             raise ValueError('Holdings must contain at least one position')
@@ -64,9 +95,15 @@ class Holdings(BaseModel):
     
     def get_position(self, ticker: str) -> Optional[Position]:
         """Get position by ticker"""
-        for position in self.positions:
-            if position.ticker == ticker.upper():
-                return position
+        ticker = ticker.upper()
+        position = self._index.get(ticker)
+        if position is not None and position.ticker == ticker:
+            return position
+        
+        # Positions may have been changed on the list directly; resync once before giving up
+        if len(self._index) != len(self.positions) or position is not None:
+            self._reindex()
+            return self._index.get(ticker)
         return None
     
     def add_position(self, position: Position) -> None:
@@ -77,6 +114,7 @@ class Holdings(BaseModel):
             raise ValueError(f"Position for {position.ticker} already exists")
         
         self.positions.append(position)
+        self._index[position.ticker] = position
         self.last_updated = datetime.now()
     
     def update_position(self, ticker: str, **updates) -> bool:
@@ -94,39 +132,46 @@ class Holdings(BaseModel):
     
     def remove_position(self, ticker: str) -> bool:
         """Remove a position"""
-        for i, position in enumerate(self.positions):
-            if position.ticker == ticker.upper():
-                del self.positions[i]
-                self.last_updated = datetime.now()
-                return True
-        return False
+        position = self.get_position(ticker)
+        if not position:
+            return False
+        
+        del self.positions[next(i for i, p in enumerate(self.positions) if p is position)]
+        self._reindex()
+        self.last_updated = datetime.now()
+        return True
+    
+    def get_position_values(self, current_prices: Dict[str, float]) -> np.ndarray:
+        """Value of each position at given prices (average price where none is given), in positions order"""
+        tickers, shares, avg_prices = self._arrays()
+        get_price = current_prices.get
+        prices = np.fromiter((get_price(ticker, avg) for ticker, avg in zip(tickers, avg_prices)),
+                             dtype=np.float64, count=len(tickers))
+        return shares * prices
     
     def get_total_value_at_prices(self, current_prices: Dict[str, float]) -> float:
         """Calculate total portfolio value at given prices"""
-        total = 0
-        for position in self.positions:
-            price = current_prices.get(position.ticker, position.avg_price)
-            total += position.shares * price
-        return total
+        return float(self.get_position_values(current_prices).sum())
     
     def get_total_cost(self) -> float:
         """Calculate total cost basis of portfolio"""
-        return sum(position.shares * position.avg_price for position in self.positions)
+        _, shares, avg_prices = self._arrays()
+        return float(shares @ avg_prices)
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary"""
-        return self.dict()
+        return self.model_dump()
     
     def to_json(self) -> str:
         """Convert to JSON string"""
-        return self.json(indent=2, default=str)
+        return self.model_dump_json(indent=2)
     
     @classmethod
     def from_json_file(cls, file_path: str) -> 'Holdings':
         """Load holdings from JSON file"""
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return cls(**data)
+        # Parsed and validated in one pass by pydantic-core, without an intermediate dict
+        with open(file_path, 'rb') as f:
+            return cls.model_validate_json(f.read())
     
     def save_to_json_file(self, file_path: str) -> None:
         """Save holdings to JSON file"""
@@ -149,35 +194,27 @@ class PortfolioSummary(BaseModel):
     def from_holdings(cls, holdings: Holdings, current_prices: Dict[str, float], 
                      fundamentals: Dict[str, Dict[str, Any]] = {}) -> 'PortfolioSummary':
         """Create portfolio summary from holdings"""
+        position_values = holdings.get_position_values(current_prices)
         total_cost = holdings.get_total_cost()
-        total_value = holdings.get_total_value_at_prices(current_prices)
+        total_value = float(position_values.sum())
         total_pl = total_value - total_cost
         total_pl_pct = (total_pl / total_cost * 100) if total_cost > 0 else 0
         
-        # Find largest position
+        # Find largest position (first one on ties)
         largest_position = None
         largest_value = 0
+        if len(position_values):
+            largest = int(np.argmax(position_values))
+            if position_values[largest] > 0:
+                largest_value = float(position_values[largest])
+                largest_position = holdings.positions[largest].ticker
         
-        # Count by exchange
-        exchanges = {}
-        sectors = {}
-        
-        for position in holdings.positions:
-            # Position value
-            price = current_prices.get(position.ticker, position.avg_price)
-            position_value = position.shares * price
-            
-            if position_value > largest_value:
-                largest_value = position_value
-                largest_position = position.ticker
-            
-            # Count exchanges
-            exchanges[position.exchange] = exchanges.get(position.exchange, 0) + 1
-            
-            # Count sectors if available
-            if position.ticker in fundamentals:
-                sector = fundamentals[position.ticker].get('sector', 'Unknown')
-                sectors[sector] = sectors.get(sector, 0) + 1
+        # Count by exchange, and by sector where fundamentals are available
+        exchanges = dict(Counter(position.exchange for position in holdings.positions))
+        sectors = dict(Counter(
+            fundamentals[position.ticker].get('sector', 'Unknown')
+            for position in holdings.positions if position.ticker in fundamentals
+        ))
         
         largest_position_pct = (largest_value / total_value * 100) if total_value > 0 else 0
         
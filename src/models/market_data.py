@@ -0,0 +1,77 @@
+"""
+Market data cache for the daily advisory job
+- One namespace per provider endpoint (quote, ohlcv, fundamentals, news)
+- Each entry carries its own expiry, so a stale quote does not evict fresh fundamentals
+"""
+
+import time
+from typing import Any, Dict, Optional
+
+# Default TTL in seconds per namespace, matched to how often the data changes
+DEFAULT_TTLS: Dict[str, int] = {
+    "quote": 300,
+    "ohlcv": 900,
+    "fundamentals": 86400,
+    "news": 900,
+}
+
+
+class MarketDataCache:
+    """
+    In-process TTL cache of provider responses, keyed "<namespace>:<ticker>"
+
+    There is no lock: entries are immutable (expiry, value) tuples and every read or
+    write is a single dict operation, which is atomic under the GIL. Readers therefore
+    never wait on writers, and get_cache_info works on a snapshot so status calls from
+    other threads cannot stall or break a fetch. Hit counters are best-effort.
+
+    Args:
+        cache_ttl_minutes: TTL for quotes (the fastest-moving namespace)
+        ttls: Per-namespace overrides in seconds
+    """
+
+    def __init__(self, cache_ttl_minutes: int = 5, ttls: Optional[Dict[str, int]] = None):
+        self.ttls = {**DEFAULT_TTLS, "quote": cache_ttl_minutes * 60, **(ttls or {})}
+        self._entries: Dict[str, tuple] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, namespace: str, ticker: str) -> Optional[Any]:
+        """Cached value, or None if missing or expired"""
+        key = f"{namespace}:{ticker}"
+        item = self._entries.get(key)
+        if item is None or time.monotonic() >= item[0]:
+            if item is not None:
+                self._entries.pop(key, None)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return item[1]
+
+    def set(self, namespace: str, ticker: str, value: Any, ttl: Optional[int] = None) -> None:
+        """Store value; ttl defaults to the namespace TTL"""
+        ttl = self.ttls[namespace] if ttl is None else ttl
+        self._entries[f"{namespace}:{ticker}"] = (time.monotonic() + ttl, value)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def get_cache_info(self) -> Dict[str, Any]:
+        """Live entry counts per namespace plus hit statistics"""
+        now = time.monotonic()
+        entries = {namespace: 0 for namespace in self.ttls}
+        # list() copies the items in one step, so concurrent writers cannot resize the dict mid-iteration
+        for key, (expires_at, _) in list(self._entries.items()):
+            if expires_at > now:
+                namespace = key.split(":", 1)[0]
+                entries[namespace] = entries.get(namespace, 0) + 1
+
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "ttl_seconds": dict(self.ttls),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None
+        }
@@ -1,11 +1,19 @@
+import bisect
+import html
 import logging
 import asyncio
-from typing import Dict, Any, List
-from datetime import datetime, timezone
+import time
+import concurrent.futures
+import functools
+import os
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import date, datetime, timedelta, timezone
+from string import Template
 import pytz
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.executors.asyncio import AsyncIOExecutor
+from apscheduler.executors.pool import ProcessPoolExecutor, ThreadPoolExecutor
 from apscheduler.jobstores.memory import MemoryJobStore
 
 from config.settings import settings
@@ -18,24 +26,71 @@ from email_service.sender import EmailSender, DryRunEmailSender
 
 logger = logging.getLogger(__name__)
 
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking call (provider HTTP, engine, SMTP, file I/O) in the loop's default thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+# OHLCV is fetched once for the widest window; the view handed on covers this many days
+OHLCV_FETCH_WINDOW = "3M"
+OHLCV_VIEW_DAYS = 5
+
+# Positions whose market data is ready wait in a bounded queue for the advisory workers
+ADVISORY_QUEUE_SIZE = 8
+ADVISORY_WORKERS = 8
+
+# Error notification body; $error must be HTML-escaped before substitution
+_ERROR_TEMPLATE = Template("""
+            <html>
+            <body style="font-family: Arial, sans-serif;">
+                <div style="background-color: #f8d7da; padding: 20px; border-radius: 5px;">
+                    <h2 style="color: #721c24;">Stock Advisory System Error</h2>
+                    <p><strong>Time:</strong> $time</p>
+                    <p><strong>Error:</strong> $error</p>
+                    <p>Please check the system logs for more details.</p>
+                </div>
+            </body>
+            </html>
+            """)
+
+
+def _slice_ohlcv(data: Dict[str, Any], days: int) -> Dict[str, Any]:
+    """Bars from the last `days` calendar days of an OHLCV series (dates ascending, ISO format)"""
+    dates = data.get("dates") or []
+    if not dates:
+        return data
+    try:
+        cutoff = (date.fromisoformat(dates[-1][:10]) - timedelta(days=days)).isoformat()
+    except (TypeError, ValueError):
+        return data
+    start = bisect.bisect_right(dates, cutoff)
+    return {key: values[start:] if isinstance(values, list) else values for key, values in data.items()}
+
 class StockAdvisoryScheduler:
     """Main scheduler for stock advisory notifications"""
     
     def __init__(self):
         # Setup scheduler
         jobstores = {'default': MemoryJobStore()}
-        executors = {'default': ThreadPoolExecutor(20)}
+        # Coroutine jobs run on the event loop; plain functions go to the thread pool.
+        # The jobs only wait on HTTP/SMTP/LLM I/O, which releases the GIL, so processes
+        # buy no throughput and cost a full interpreter (~20 MB RSS) per worker.
+        executors = {'default': self._create_job_executor(), 'asyncio': AsyncIOExecutor()}
         job_defaults = {
             'coalesce': True,
             'max_instances': 1,
             'misfire_grace_time': 300  # 5 minutes
         }
         
+        # One timezone object and one parsed trigger, reused whenever the job is (re)added
+        self._tz = pytz.timezone(settings.TIMEZONE)
+        self._daily_trigger = self._build_daily_trigger()
+        
         self.scheduler = AsyncIOScheduler(
             jobstores=jobstores,
             executors=executors,
             job_defaults=job_defaults,
-            timezone=pytz.timezone(settings.TIMEZONE)
+            timezone=self._tz
         )
         
         # Initialize components
@@ -62,17 +117,43 @@ class StockAdvisoryScheduler:
                 smtp_user=settings.SMTP_USER,
                 smtp_pass=settings.SMTP_PASS,
                 mail_from=settings.MAIL_FROM,
-                smtp_tls=settings.SMTP_TLS
+                smtp_tls=settings.SMTP_TLS,
+                pool_size=settings.SMTP_POOL_SIZE,
+                max_messages_per_connection=settings.SMTP_MAX_MESSAGES_PER_CONNECTION,
+                api_log=settings.SMTP_API_LOG
             )
         
         self.market_cache = MarketDataCache(cache_ttl_minutes=settings.CACHE_TTL_MINUTES)
+        self._holdings_cache: Optional[Tuple[Tuple[int, int], Holdings]] = None  # ((mtime_ns, size), holdings)
         
+    @staticmethod
+    def _create_job_executor():
+        """Thread pool for plain-function jobs, or a small process pool if explicitly configured"""
+        if settings.EXECUTOR_TYPE == 'process':
+            max_workers = min(8, os.cpu_count() or 1)
+            logger.warning(
+                f"EXECUTOR_TYPE=process: scheduler jobs are I/O-bound, so worker processes add "
+                f"memory (~20 MB each) without improving throughput; capping at {max_workers} workers"
+            )
+            return ProcessPoolExecutor(max_workers)
+        return ThreadPoolExecutor(settings.THREAD_POOL_SIZE)
+    
     def start(self):
         """Start the scheduler"""
         try:
             # Add the daily job
             self.add_daily_advisory_job()
             
+            # run_blocking uses the loop's default executor; size it like the job pool. Outside a
+            # running loop this is the thread's current loop, which AsyncIOScheduler also runs on.
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = asyncio.get_event_loop()
+            loop.set_default_executor(concurrent.futures.ThreadPoolExecutor(
+                max_workers=settings.THREAD_POOL_SIZE, thread_name_prefix="advisory-io"
+            ))
+            
             # Start scheduler
             self.scheduler.start()
             logger.info("Stock advisory scheduler started")
@@ -91,10 +172,11 @@ class StockAdvisoryScheduler:
     def stop(self):
         """Stop the scheduler"""
         self.scheduler.shutdown()
+        self.email_sender.close()
         logger.info("Stock advisory scheduler stopped")
     
-    def add_daily_advisory_job(self):
-        """Add the daily advisory job to scheduler"""
+    def _build_daily_trigger(self) -> CronTrigger:
+        """Parse SCHEDULE_CRON into the daily job's trigger"""
         # Parse cron expression
         cron_parts = settings.SCHEDULE_CRON.split()
         if len(cron_parts) != 5:
@@ -102,184 +184,268 @@ class StockAdvisoryScheduler:
         
         minute, hour, day, month, day_of_week = cron_parts
         
-        trigger = CronTrigger(
+        return CronTrigger(
             minute=minute,
             hour=hour,
             day=day,
             month=month,
             day_of_week=day_of_week,
-            timezone=pytz.timezone(settings.TIMEZONE)
+            timezone=self._tz
         )
-        
+    
+    def add_daily_advisory_job(self):
+        """Add the daily advisory job to scheduler"""
         self.scheduler.add_job(
             func=self.run_daily_advisory,
-            trigger=trigger,
+            trigger=self._daily_trigger,
             id='daily_advisory',
             name='Daily Stock Advisory',
+            executor='asyncio',
             replace_existing=True
         )
         
         logger.info(f"Daily advisory job scheduled: {settings.SCHEDULE_CRON} {settings.TIMEZONE}")
     
-    def run_daily_advisory(self):
+    async def run_daily_advisory(self):
         """Main job function that runs daily advisory"""
-        start_time = datetime.now()
+        start_time = time.monotonic()  # wall-clock adjustments (NTP, DST) can't skew the duration
         logger.info("=== Starting Daily Stock Advisory Analysis ===")
         
         try:
             # Load holdings
-            holdings = self.load_holdings()
+            holdings = await run_blocking(self.load_holdings)
             logger.info(f"Loaded {len(holdings.positions)} positions")
             
-            # Fetch market data for all positions
-            market_data = self.fetch_market_data(holdings)
+            # Serialize the holdings once for every step that needs plain dicts
+            holdings_dict = holdings.dict()
+            position_dicts = [position.dict() for position in holdings.positions]
+            
+            # Fetch market data for all positions. Each position is queued as soon as its data
+            # is complete, so stock advisories start while other fetches are still in flight
+            ready = asyncio.Queue(maxsize=ADVISORY_QUEUE_SIZE)
+            advisories: Dict[int, Dict[str, Any]] = {}
+            workers = [
+                asyncio.create_task(self._advise_from_queue(ready, position_dicts, advisories))
+                for _ in range(ADVISORY_WORKERS)
+            ]
+            try:
+                market_data = await self.fetch_market_data(holdings, ready)
+            finally:
+                for _ in workers:
+                    await ready.put(None)
             logger.info(f"Fetched market data for {len(market_data)} positions")
             
-            # Generate individual stock advisories
-            stock_advisories = self.generate_stock_advisories(holdings, market_data)
+            # The portfolio advisory needs every position, so it overlaps the remaining stock advisories
+            portfolio_advisory, _ = await asyncio.gather(
+                self.generate_portfolio_advisory(holdings, market_data, position_dicts),
+                asyncio.gather(*workers)
+            )
+            stock_advisories = [advisories[index] for index in sorted(advisories)]
             logger.info(f"Generated {len(stock_advisories)} stock advisories")
-            
-            # Generate portfolio advisory
-            portfolio_advisory = self.generate_portfolio_advisory(holdings, market_data)
             logger.info("Generated portfolio advisory")
             
-            # Send emails
-            self.send_advisory_emails(stock_advisories, portfolio_advisory, holdings)
+            # Send emails (blocking SMTP, so off the event loop)
+            await run_blocking(self.send_advisory_emails, stock_advisories, portfolio_advisory, holdings,
+                               holdings_dict)
             
             # Log completion
-            duration = datetime.now() - start_time
-            logger.info(f"=== Daily advisory completed in {duration.total_seconds():.2f} seconds ===")
+            duration = time.monotonic() - start_time
+            logger.info(f"=== Daily advisory completed in {duration:.2f} seconds ===")
             
         except Exception as e:
             logger.error(f"Daily advisory job failed: {e}", exc_info=True)
             
             # Send error notification
-            self.send_error_notification(str(e))
+            await run_blocking(self.send_error_notification, str(e))
     
     def load_holdings(self) -> Holdings:
-        """Load holdings from file"""
+        """Load holdings from file, reusing the last parse while the file is unchanged"""
         try:
-            return Holdings.from_json_file(settings.HOLDINGS_FILE)
+            stat = os.stat(settings.HOLDINGS_FILE)
+            file_key = (stat.st_mtime_ns, stat.st_size)
+            if self._holdings_cache and self._holdings_cache[0] == file_key:
+                return self._holdings_cache[1]
+            
+            holdings = Holdings.from_json_file(settings.HOLDINGS_FILE)
+            self._holdings_cache = (file_key, holdings)
+            return holdings
         except Exception as e:
             logger.error(f"Failed to load holdings from {settings.HOLDINGS_FILE}: {e}")
             raise
     
-    def fetch_market_data(self, holdings: Holdings) -> Dict[str, Dict[str, Any]]:
-        """Fetch market data for all positions"""
-        market_data = {}
+    async def fetch_market_data(self, holdings: Holdings,
+                                ready: Optional[asyncio.Queue] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch market data for all positions, batching lookups and reusing cached fields
+        
+        If ready is given, (position index, market data) pairs are put on it as soon as
+        each position's data is complete.
+        """
+        positions = holdings.positions
+        fields = {name: {} for name in ("quote", "ohlcv", "fundamentals", "news")}
+        
+        if settings.CACHE_ENABLED:
+            # Each field has its own TTL, so a stale quote does not force refetching fundamentals
+            for position in positions:
+                for name, values in fields.items():
+                    cached = self.market_cache.get(name, position.ticker)
+                    if cached is not None:
+                        values[position.ticker] = cached
+        
+        def missing(name: str) -> List[str]:
+            return list(dict.fromkeys(position.ticker for position in positions if position.ticker not in fields[name]))
+        
+        def store(name: str, values: Dict[str, Any]):
+            fields[name].update(values)
+            if settings.CACHE_ENABLED:
+                for ticker, value in values.items():
+                    if value:
+                        self.market_cache.set(name, ticker, value)
+        
+        # One batch call per endpoint instead of one request per ticker; the provider is
+        # synchronous, so each batch (and each OHLCV lookup) gets a worker thread
+        exchanges = {position.ticker: position.exchange for position in positions}
+        # Fallback timestamp for records without a quote timestamp, read once per run
+        now_iso = datetime.now(timezone.utc).isoformat()
+        logger.debug(f"Fetching fresh data for {len(missing('quote'))} quotes, {len(missing('ohlcv'))} OHLCV")
         
-        for position in holdings.positions:
+        async def fetch_batches():
+            quotes, fundamentals, news = await asyncio.gather(
+                self._fetch_batch("quotes", self.data_provider.get_batch_quotes, missing("quote"), exchanges),
+                self._fetch_batch("fundamentals", self.data_provider.get_batch_fundamentals,
+                                  missing("fundamentals"), exchanges),
+                self._fetch_batch("news", self.data_provider.get_batch_news, missing("news"))
+            )
+            store("quote", quotes)
+            store("fundamentals", fundamentals)
+            store("news", news)
+        
+        batches = asyncio.create_task(fetch_batches())
+        ohlcv_tasks = {
+            ticker: asyncio.create_task(self._fetch_ohlcv(ticker, exchanges[ticker]))
+            for ticker in missing("ohlcv")
+        }
+        
+        async def complete(index: int, position) -> Dict[str, Any]:
             ticker = position.ticker
+            if ticker in ohlcv_tasks:
+                ohlcv_data = await ohlcv_tasks[ticker]
+                if ticker not in fields["ohlcv"]:
+                    store("ohlcv", {ticker: ohlcv_data})
+            await batches
             
-            try:
-                # Check cache first
-                cached_data = self.market_cache.get(ticker)
-                if cached_data and settings.CACHE_ENABLED:
-                    logger.debug(f"Using cached data for {ticker}")
-                    market_data[ticker] = cached_data.dict()
-                    continue
-                
-                # Fetch fresh data
-                logger.debug(f"Fetching fresh data for {ticker}")
-                
-                # Get quote
-                quote_data = self.data_provider.get_quote(ticker, position.exchange)
-                
-                # Get OHLCV data for multiple timeframes
-                ohlcv_data = {}
-                for window in ["5D", "1M", "3M"]:
-                    try:
-                        ohlcv = self.data_provider.get_ohlcv(ticker, window, position.exchange)
-                        if ohlcv and ohlcv.get("data"):
-                            ohlcv_data = ohlcv["data"]  # Use the most recent successful fetch
-                            break
-                    except Exception as e:
-                        logger.warning(f"Failed to fetch {window} OHLCV for {ticker}: {e}")
-                
-                # Get fundamentals
-                fundamentals_data = {}
-                try:
-                    fundamentals_data = self.data_provider.get_fundamentals(ticker, position.exchange)
-                except Exception as e:
-                    logger.warning(f"Failed to fetch fundamentals for {ticker}: {e}")
-                
-                # Get news sentiment
-                news_data = {}
-                try:
-                    news_data = self.data_provider.get_news(ticker)
-                except Exception as e:
-                    logger.warning(f"Failed to fetch news for {ticker}: {e}")
-                
-                # Combine all data
-                combined_data = {
-                    "ticker": ticker,
-                    "exchange": position.exchange,
-                    "price": quote_data.get("price", 0),
-                    "change": quote_data.get("change", 0),
-                    "change_pct": quote_data.get("change_pct", 0),
-                    "volume": quote_data.get("volume", 0),
-                    "timestamp": quote_data.get("timestamp", datetime.now().isoformat()),
-                    "ohlcv": ohlcv_data,
-                    "fundamentals": fundamentals_data,
-                    "news_sentiment": news_data
-                }
-                
-                market_data[ticker] = combined_data
-                
-                # Cache the data
-                if settings.CACHE_ENABLED:
-                    # Would need to convert to MarketData model for caching
-                    pass
-                
-            except Exception as e:
-                logger.error(f"Failed to fetch market data for {ticker}: {e}")
-                # Use fallback data
-                market_data[ticker] = {
-                    "ticker": ticker,
-                    "exchange": position.exchange,
-                    "price": position.avg_price,  # Fallback to avg price
-                    "change": 0,
-                    "change_pct": 0,
-                    "volume": 0,
-                    "timestamp": datetime.now().isoformat(),
-                    "ohlcv": {},
-                    "fundamentals": {},
-                    "news_sentiment": {}
-                }
+            data = self._combine_market_data(
+                position, fields["quote"].get(ticker), fields["ohlcv"].get(ticker, {}),
+                fields["fundamentals"].get(ticker, {}), fields["news"].get(ticker, {}), now_iso
+            )
+            if ready is not None:
+                await ready.put((index, data))
+            return data
         
-        return market_data
+        results = await asyncio.gather(*(complete(index, position) for index, position in enumerate(positions)))
+        return {position.ticker: data for position, data in zip(positions, results)}
     
-    def generate_stock_advisories(self, holdings: Holdings, 
-                                  market_data: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Generate advisory for each stock position"""
-        advisories = []
+    def _combine_market_data(self, position, quote_data: Optional[Dict[str, Any]], ohlcv_data: Dict[str, Any],
+                             fundamentals_data: Dict[str, Any], news_data: Dict[str, Any],
+                             now_iso: str) -> Dict[str, Any]:
+        """Build one position's market data record, falling back to avg price without a quote"""
+        ticker = position.ticker
         
-        for position in holdings.positions:
-            ticker = position.ticker
+        if not quote_data:
+            logger.error(f"Failed to fetch market data for {ticker}: no quote returned")
+            # Use fallback data
+            return {
+                "ticker": ticker,
+                "exchange": position.exchange,
+                "price": position.avg_price,  # Fallback to avg price
+                "change": 0,
+                "change_pct": 0,
+                "volume": 0,
+                "timestamp": now_iso,
+                "ohlcv": {},
+                "fundamentals": {},
+                "news_sentiment": {}
+            }
+        
+        # Combine all data
+        combined_data = {
+            "ticker": ticker,
+            "exchange": position.exchange,
+            "price": quote_data.get("price", 0),
+            "change": quote_data.get("change", 0),
+            "change_pct": quote_data.get("change_pct", 0),
+            "volume": quote_data.get("volume", 0),
+            "timestamp": quote_data.get("timestamp", now_iso),
+            "ohlcv": ohlcv_data,
+            "fundamentals": fundamentals_data,
+            "news_sentiment": news_data
+        }
+        
+        return combined_data
+    
+    async def _fetch_batch(self, label: str, func, tickers: List[str], *args) -> Dict[str, Dict[str, Any]]:
+        """Run a batch provider call in a worker thread; a failed batch is logged and yields {}"""
+        if not tickers:
+            return {}
+        try:
+            return await run_blocking(func, tickers, *args)
+        except Exception as e:
+            logger.warning(f"Failed to fetch batch {label}: {e}")
+            return {}
+    
+    async def _fetch_ohlcv(self, ticker: str, exchange: str) -> Dict[str, Any]:
+        """Get recent OHLCV data with a single request, sliced locally to the view window"""
+        try:
+            ohlcv = await run_blocking(self.data_provider.get_ohlcv, ticker, OHLCV_FETCH_WINDOW, exchange)
+        except Exception as e:
+            logger.warning(f"Failed to fetch {OHLCV_FETCH_WINDOW} OHLCV for {ticker}: {e}")
+            return {}
+        
+        if not ohlcv or not ohlcv.get("data"):
+            return {}
+        return _slice_ohlcv(ohlcv["data"], OHLCV_VIEW_DAYS)
+    
+    async def _generate_stock_advisory(self, ticker: str, position_dict: Dict[str, Any],
+                                       position_market_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Generate one stock advisory in a worker thread; failures are logged and yield None"""
+        try:
+            advisory = await run_blocking(
+                self.advisory_engine.generate_stock_advisory,
+                position_dict, 
+                position_market_data
+            )
+            logger.debug(f"Generated advisory for {ticker}: {advisory['advisory']['action']}")
+            return advisory
             
-            if ticker not in market_data:
-                logger.warning(f"No market data available for {ticker}, skipping advisory")
-                continue
+        except Exception as e:
+            logger.error(f"Failed to generate advisory for {ticker}: {e}")
+            return None
+    
+    async def _advise_from_queue(self, ready: asyncio.Queue, position_dicts: List[Dict[str, Any]],
+                                 advisories: Dict[int, Dict[str, Any]]):
+        """Advisory worker: generate stock advisories for queued positions until a None sentinel"""
+        while True:
+            item = await ready.get()
+            if item is None:
+                return
             
-            try:
-                advisory = self.advisory_engine.generate_stock_advisory(
-                    position.dict(), 
-                    market_data[ticker]
-                )
-                advisories.append(advisory)
-                logger.debug(f"Generated advisory for {ticker}: {advisory['advisory']['action']}")
-                
-            except Exception as e:
-                logger.error(f"Failed to generate advisory for {ticker}: {e}")
-        
-        return advisories
+            index, position_market_data = item
+            advisory = await self._generate_stock_advisory(
+                position_market_data["ticker"], position_dicts[index], position_market_data
+            )
+            if advisory is not None:
+                advisories[index] = advisory
     
-    def generate_portfolio_advisory(self, holdings: Holdings, 
-                                   market_data: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    async def generate_portfolio_advisory(self, holdings: Holdings, 
+                                          market_data: Dict[str, Dict[str, Any]],
+                                          position_dicts: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
         """Generate portfolio-level advisory"""
+        if position_dicts is None:
+            position_dicts = [pos.dict() for pos in holdings.positions]
         try:
-            return self.advisory_engine.generate_portfolio_advisory(
-                [pos.dict() for pos in holdings.positions],
+            return await run_blocking(
+                self.advisory_engine.generate_portfolio_advisory,
+                position_dicts,
                 market_data
             )
         except Exception as e:
@@ -291,7 +457,8 @@ class StockAdvisoryScheduler:
             }
     
     def send_advisory_emails(self, stock_advisories: List[Dict[str, Any]], 
-                            portfolio_advisory: Dict[str, Any], holdings: Holdings):
+                            portfolio_advisory: Dict[str, Any], holdings: Holdings,
+                            holdings_dict: Optional[Dict[str, Any]] = None):
         """Send all advisory emails"""
         logger.info("Sending advisory emails")
         if not stock_advisories:
@@ -300,29 +467,33 @@ class StockAdvisoryScheduler:
         if not portfolio_advisory:
             logger.warning("No portfolio advisory to send")
             return
+        if holdings_dict is None:
+            holdings_dict = holdings.dict()
         try:
-            # Send consolidated all-stocks advisory email
-            success = self.email_sender.send_all_stocks_advisory_email(
-                stock_advisories,
-                holdings.dict(),
-                portfolio_advisory["portfolio_metrics"],
-                settings.MAIL_TO
-            )
-            if success:
-                logger.info(f"Sent consolidated stock advisory email for {len(stock_advisories)} positions")
-            else:
-                logger.error("Failed to send consolidated stock advisory email")
-            
-            # Still send portfolio overview email for high-level summary
-            success = self.email_sender.send_portfolio_overview_email(
-                portfolio_advisory, 
-                holdings.dict(), 
-                settings.MAIL_TO
-            )
-            if success:
-                logger.info("Sent portfolio overview email")
-            else:
-                logger.error("Failed to send portfolio overview email")
+            # Both emails go out over one SMTP session
+            with self.email_sender.session(messages=2):
+                # Send consolidated all-stocks advisory email
+                success = self.email_sender.send_all_stocks_advisory_email(
+                    stock_advisories,
+                    holdings_dict,
+                    portfolio_advisory["portfolio_metrics"],
+                    settings.MAIL_TO
+                )
+                if success:
+                    logger.info(f"Sent consolidated stock advisory email for {len(stock_advisories)} positions")
+                else:
+                    logger.error("Failed to send consolidated stock advisory email")
+                
+                # Still send portfolio overview email for high-level summary
+                success = self.email_sender.send_portfolio_overview_email(
+                    portfolio_advisory, 
+                    holdings_dict, 
+                    settings.MAIL_TO
+                )
+                if success:
+                    logger.info("Sent portfolio overview email")
+                else:
+                    logger.error("Failed to send portfolio overview email")
                 
         except Exception as e:
             logger.error(f"Error sending advisory emails: {e}")
@@ -330,31 +501,31 @@ class StockAdvisoryScheduler:
     def send_error_notification(self, error_message: str):
         """Send error notification email"""
         try:
-            subject = f"🚨 VN Stock Advisory Error - {datetime.now().strftime('%Y-%m-%d')}"
-            html_content = f"""
-            <html>
-            <body style="font-family: Arial, sans-serif;">
-                <div style="background-color: #f8d7da; padding: 20px; border-radius: 5px;">
-                    <h2 style="color: #721c24;">Stock Advisory System Error</h2>
-                    <p><strong>Time:</strong> {datetime.now().isoformat()}</p>
-                    <p><strong>Error:</strong> {error_message}</p>
-                    <p>Please check the system logs for more details.</p>
-                </div>
-            </body>
-            </html>
-            """
+            now = datetime.now()
+            subject = f"🚨 VN Stock Advisory Error - {now.strftime('%Y-%m-%d')}"
+            # Exception text can contain markup, so it is escaped rather than interpolated raw
+            html_content = _ERROR_TEMPLATE.substitute(time=now.isoformat(), error=html.escape(error_message))
             
             self.email_sender.send_email(settings.MAIL_TO, subject, html_content)
             
         except Exception as e:
             logger.error(f"Failed to send error notification: {e}")
     
-    def run_manual_advisory(self) -> Dict[str, Any]:
-        """Run advisory manually (for testing)"""
+    def run_manual_advisory(self) -> Optional[asyncio.Task]:
+        """
+        Run advisory manually (for testing)
+        
+        Called from inside a running event loop (e.g. a FastAPI handler), the run is
+        scheduled on that loop and the Task is returned for the caller to await;
+        otherwise it runs to completion on a fresh loop.
+        """
         logger.info("Running manual advisory analysis")
         
-        import asyncio
-        return asyncio.run(self.run_daily_advisory())
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.run_daily_advisory())
+        return loop.create_task(self.run_daily_advisory())
     
     def get_job_status(self) -> Dict[str, Any]:
         """Get status of scheduled jobs"""
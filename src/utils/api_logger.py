@@ -1,68 +1,220 @@
-import json
+import atexit
 import logging
+import logging.handlers
+import mmap
 import os
+import queue
+import re
+import threading
+import time
 from datetime import datetime
 from typing import Dict, Any, Optional
 from pathlib import Path
-import uuid
+
+import orjson
+
+_JSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+# Header/payload keys containing any of these terms (case-insensitive) are masked
+SENSITIVE_KEYS = (
+    'authorization', 'auth', 'token', 'key', 'secret', 'password', 'pass',
+    'api_key', 'apikey', 'api-key', 'bearer', 'x-api-key'
+)
+_SENSITIVE_RE = re.compile('|'.join(map(re.escape, SENSITIVE_KEYS)), re.IGNORECASE)
+_URL_KEY_RE = re.compile(r'([?&]key=)[^&]+')
+
+# Response bodies at least this many bytes are replaced by a placeholder in the JSONL log
+RESPONSE_LOG_LIMIT = 10000
+
+# (epoch second, "YYYY-MM-DDTHH:MM:SS") last formatted by _iso_now; replaced as one tuple
+_ts_prefix = (0, "")
+
+def _iso_now() -> str:
+    """datetime.now().isoformat() with microseconds, formatting the date/time part once per second"""
+    global _ts_prefix
+    second, nanos = divmod(time.time_ns(), 1_000_000_000)
+    cached_second, prefix = _ts_prefix
+    if second != cached_second:
+        prefix = datetime.fromtimestamp(second).strftime('%Y-%m-%dT%H:%M:%S')
+        _ts_prefix = (second, prefix)
+    return f"{prefix}.{nanos // 1000:06d}"
+
+def _dumps_bytes(data: Any) -> bytes:
+    """Serialize with orjson; values it can't encode fall back to str()"""
+    return orjson.dumps(data, default=str, option=_JSON_OPTIONS)
+
+def _dumps(data: Any) -> str:
+    """Serialize a log entry to a JSONL line"""
+    return _dumps_bytes(data).decode('utf-8')
+
+def _exceeds_size(data: Any, limit: int) -> bool:
+    """
+    Whether data's JSON is clearly longer than limit bytes, judged from a walk that
+    stops as soon as the running lower bound passes limit (so it's cheap for huge data)
+    """
+    total = 0
+    stack = [data]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            total += 1 + max(len(item), 1)  # Braces and separating commas
+            if total > limit:
+                return True
+            for key, value in item.items():
+                total += len(str(key)) + 3
+                stack.append(value)
+        elif isinstance(item, (list, tuple)):
+            total += 1 + max(len(item), 1)  # Brackets and separating commas
+            stack.extend(item)
+        elif isinstance(item, (str, bytes)):
+            total += len(item) + 2
+        else:
+            total += 1
+        if total > limit:
+            return True
+    return False
+
+def _dumps_with_raw(data: Dict[str, Any], key: str, raw: Optional[bytes]) -> str:
+    """Serialize a log entry with already-serialized JSON spliced in as its last field"""
+    line = _dumps_bytes(data)
+    if raw is None:
+        return line.decode('utf-8')
+    return (line[:-1] + b',"' + key.encode('utf-8') + b'":' + raw + b'}').decode('utf-8')
+
+# API loggers only enqueue records; one listener thread per logger does the file writes.
+# A logger's listener is replaced (and flushed) whenever setup_loggers runs again.
+_listeners: Dict[str, logging.handlers.QueueListener] = {}
+_listeners_lock = threading.Lock()
+
+def _attach_queued_handler(logger: logging.Logger, handler: logging.Handler) -> None:
+    """Replace logger's handlers with a queue feeding handler from a background thread"""
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    
+    with _listeners_lock:
+        # Remove existing handlers to avoid duplicates
+        for existing in logger.handlers[:]:
+            logger.removeHandler(existing)
+        
+        previous = _listeners.pop(logger.name, None)
+        if previous is not None:
+            previous.stop()
+            for old_handler in previous.handlers:
+                old_handler.close()
+        
+        listener.start()
+        _listeners[logger.name] = listener
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
+
+class BufferedFileHandler(logging.FileHandler):
+    """
+    FileHandler with a 64 KB write buffer
+    
+    Records below ERROR are not flushed one by one; a daemon thread flushes the buffer
+    every FLUSH_INTERVAL seconds, so the file trails the logger by at most that long.
+    """
+    BUFFER_SIZE = 1 << 16
+    FLUSH_INTERVAL = 0.5
+    
+    def __init__(self, filename, mode: str = 'a', encoding: Optional[str] = None):
+        super().__init__(filename, mode=mode, encoding=encoding)
+        self._stopped = threading.Event()
+        threading.Thread(target=self._flush_periodically, name="api-log-flush", daemon=True).start()
+    
+    def _open(self):
+        return open(self.baseFilename, self.mode, buffering=self.BUFFER_SIZE,
+                    encoding=self.encoding, errors=self.errors)
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(self.format(record) + self.terminator)
+            if record.levelno >= logging.ERROR:
+                self.stream.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+    
+    def _flush_periodically(self) -> None:
+        while not self._stopped.wait(self.FLUSH_INTERVAL):
+            self.flush()
+    
+    def close(self) -> None:
+        self._stopped.set()
+        super().close()
+
+def _read_lines_reversed(path: Path):
+    """Yield a file's lines from last to first, paging in only the part that is read"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = len(mm)
+            while end > 0:
+                # end - 1 skips this line's own trailing newline
+                start = mm.rfind(b'\n', 0, end - 1) + 1
+                yield mm[start:end]
+                end = start
+
+@atexit.register
+def _stop_listeners() -> None:
+    """Drain queued API log records on interpreter exit"""
+    with _listeners_lock:
+        for listener in _listeners.values():
+            listener.stop()
 
 class APILogger:
     """
     Comprehensive API logging system for tracking all API requests and responses
     Logs to both file and structured JSON format for easy analysis
+    
+    JSONL entries carry "timestamp" as an ISO-8601 string (see _iso_now). With
+    json_enabled=False the JSONL log is switched off and entries are never built.
     """
     
-    def __init__(self, log_dir: str = "logs"):
+    def __init__(self, log_dir: str = "logs", json_enabled: bool = True):
         self.log_dir = Path(log_dir)
         self.log_dir.mkdir(exist_ok=True)
+        self.json_enabled = json_enabled
         
         # Create separate loggers for different purposes
         self.setup_loggers()
     
     def setup_loggers(self):
-        """Setup different loggers for API tracking"""
+        """Setup different loggers for API tracking (file writes happen on listener threads)"""
         
         # Main API logger (detailed logs)
         self.api_logger = logging.getLogger('api_requests')
         self.api_logger.setLevel(logging.INFO)
         
-        # Remove existing handlers to avoid duplicates
-        for handler in self.api_logger.handlers[:]:
-            self.api_logger.removeHandler(handler)
-        
         # File handler for detailed API logs
         api_log_file = self.log_dir / "api_requests.log"
-        api_handler = logging.FileHandler(api_log_file, encoding='utf-8')
+        api_handler = BufferedFileHandler(api_log_file, encoding='utf-8')
         api_formatter = logging.Formatter(
             '%(asctime)s | %(levelname)s | %(message)s',
             datefmt='%Y-%m-%d %H:%M:%S'
         )
         api_handler.setFormatter(api_formatter)
-        self.api_logger.addHandler(api_handler)
+        _attach_queued_handler(self.api_logger, api_handler)
         
         # JSON logger for structured data
         self.json_logger = logging.getLogger('api_json')
         self.json_logger.setLevel(logging.INFO)
         
-        # Remove existing handlers
-        for handler in self.json_logger.handlers[:]:
-            self.json_logger.removeHandler(handler)
-        
         # JSON file handler
         json_log_file = self.log_dir / "api_requests.jsonl"
-        json_handler = logging.FileHandler(json_log_file, encoding='utf-8')
+        json_handler = BufferedFileHandler(json_log_file, encoding='utf-8')
         json_formatter = logging.Formatter('%(message)s')
         json_handler.setFormatter(json_formatter)
-        self.json_logger.addHandler(json_handler)
+        _attach_queued_handler(self.json_logger, json_handler)
+        self.json_logger.disabled = not self.json_enabled
         
         # Error logger for API failures
         self.error_logger = logging.getLogger('api_errors')
         self.error_logger.setLevel(logging.ERROR)
         
-        # Remove existing handlers
-        for handler in self.error_logger.handlers[:]:
-            self.error_logger.removeHandler(handler)
-        
         # Error file handler
         error_log_file = self.log_dir / "api_errors.log"
         error_handler = logging.FileHandler(error_log_file, encoding='utf-8')
@@ -71,7 +223,7 @@ class APILogger:
             datefmt='%Y-%m-%d %H:%M:%S'
         )
         error_handler.setFormatter(error_formatter)
-        self.error_logger.addHandler(error_handler)
+        _attach_queued_handler(self.error_logger, error_handler)
     
     def log_request(self, 
                    api_name: str,
@@ -97,29 +249,35 @@ class APILogger:
             Request ID for correlation with response
         """
         if not request_id:
-            request_id = str(uuid.uuid4())[:8]
-        
-        # Mask sensitive data in headers
-        safe_headers = self._mask_sensitive_data(headers) if headers else None
-        safe_payload = self._mask_sensitive_data(payload) if payload else None
-        
-        # Create request log entry
-        log_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "request_id": request_id,
-            "type": "REQUEST",
-            "api_name": api_name,
-            "method": method,
-            "url": self._mask_url_credentials(url),
-            "headers": safe_headers,
-            "params": params,
-            "payload": safe_payload,
-            "payload_size": len(json.dumps(payload)) if payload else 0
-        }
+            request_id = os.urandom(4).hex()
         
         # Log to both structured and human-readable formats
         self.api_logger.info(f"REQUEST | {api_name} | {method} {url} | ID: {request_id}")
-        self.json_logger.info(json.dumps(log_entry, ensure_ascii=False))
+        
+        # The JSON entry (masking and serialization included) is only built if it will be written
+        if self.json_logger.isEnabledFor(logging.INFO):
+            # Mask sensitive data in headers
+            safe_headers = self._mask_sensitive_data(headers) if headers else None
+            safe_payload = self._mask_sensitive_data(payload) if payload else None
+            # Serialized once: the same bytes give the size and go into the log line
+            payload_json = _dumps_bytes(safe_payload) if safe_payload else None
+            
+            # Create request log entry
+            log_entry = {
+                "timestamp": _iso_now(),
+                "request_id": request_id,
+                "type": "REQUEST",
+                "api_name": api_name,
+                "method": method,
+                "url": self._mask_url_credentials(url),
+                "headers": safe_headers,
+                "params": params,
+                "payload_size": len(payload_json) if payload_json else 0
+            }
+            if payload_json is None:
+                log_entry["payload"] = safe_payload
+            
+            self.json_logger.info(_dumps_with_raw(log_entry, "payload", payload_json))
         
         return request_id
     
@@ -144,45 +302,61 @@ class APILogger:
             error: Error message if request failed
         """
         
-        # Determine response size
-        response_size = 0
-        if response_data:
-            try:
-                response_size = len(json.dumps(response_data)) if isinstance(response_data, (dict, list)) else len(str(response_data))
-            except:
-                response_size = len(str(response_data))
-        
-        # Create response log entry
-        log_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "request_id": request_id,
-            "type": "RESPONSE",
-            "api_name": api_name,
-            "status_code": status_code,
-            "response_size": response_size,
-            "duration_ms": duration_ms,
-            "success": 200 <= status_code < 300,
-            "error": error,
-            "response_headers": self._mask_sensitive_data(response_headers) if response_headers else None
-        }
-        
-        # Add response data if not too large
-        if response_size < 10000:  # Less than 10KB
-            log_entry["response_data"] = response_data
-        else:
-            log_entry["response_data"] = f"<Large response: {response_size} bytes>"
+        success = 200 <= status_code < 300
         
         # Log to different files based on success/failure
-        status_emoji = "✅" if log_entry["success"] else "❌"
+        status_emoji = "✅" if success else "❌"
         duration_str = f" | {duration_ms:.0f}ms" if duration_ms else ""
         
         self.api_logger.info(
             f"RESPONSE | {api_name} | {status_emoji} {status_code} | ID: {request_id}{duration_str}"
         )
-        self.json_logger.info(json.dumps(log_entry, ensure_ascii=False))
+        
+        if self.json_logger.isEnabledFor(logging.INFO):
+            # Determine response size; JSON bodies are serialized once and reused in the log line.
+            # Bodies that are obviously over the limit are never serialized; their size stays None
+            response_size = 0
+            response_json = None
+            if response_data:
+                try:
+                    if isinstance(response_data, (dict, list)):
+                        if _exceeds_size(response_data, RESPONSE_LOG_LIMIT):
+                            response_size = None
+                        else:
+                            response_json = _dumps_bytes(response_data)
+                            response_size = len(response_json)
+                    else:
+                        response_size = len(str(response_data))
+                except Exception:
+                    response_size = len(str(response_data))
+            
+            # Create response log entry
+            log_entry = {
+                "timestamp": _iso_now(),
+                "request_id": request_id,
+                "type": "RESPONSE",
+                "api_name": api_name,
+                "status_code": status_code,
+                "response_size": response_size,
+                "duration_ms": duration_ms,
+                "success": success,
+                "error": error,
+                "response_headers": self._mask_sensitive_data(response_headers) if response_headers else None
+            }
+            
+            # Add response data if not too large; JSON bodies are spliced in as serialized
+            if response_size is None:
+                log_entry["response_data"] = f"<Large response: over {RESPONSE_LOG_LIMIT} bytes>"
+            elif response_size >= RESPONSE_LOG_LIMIT:
+                response_json = None
+                log_entry["response_data"] = f"<Large response: {response_size} bytes>"
+            elif response_json is None:
+                log_entry["response_data"] = response_data
+            
+            self.json_logger.info(_dumps_with_raw(log_entry, "response_data", response_json))
         
         # Log errors separately
-        if error or not log_entry["success"]:
+        if error or not success:
             error_msg = f"API_ERROR | {api_name} | {status_code} | {error or 'HTTP Error'} | ID: {request_id}"
             self.error_logger.error(error_msg)
     
@@ -204,23 +378,25 @@ class APILogger:
             Request ID for correlation
         """
         if not request_id:
-            request_id = str(uuid.uuid4())[:8]
-        
-        # Truncate very long prompts for logging
-        prompt_preview = prompt[:500] + "..." if len(prompt) > 500 else prompt
-        
-        log_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "request_id": request_id,
-            "type": "AI_REQUEST",
-            "provider": provider,
-            "model": model,
-            "prompt_length": len(prompt),
-            "prompt_preview": prompt_preview
-        }
+            request_id = os.urandom(4).hex()
         
         self.api_logger.info(f"AI_REQUEST | {provider} | {model} | {len(prompt)} chars | ID: {request_id}")
-        self.json_logger.info(json.dumps(log_entry, ensure_ascii=False))
+        
+        if self.json_logger.isEnabledFor(logging.INFO):
+            # Truncate very long prompts for logging
+            prompt_preview = prompt[:500] + "..." if len(prompt) > 500 else prompt
+            
+            log_entry = {
+                "timestamp": _iso_now(),
+                "request_id": request_id,
+                "type": "AI_REQUEST",
+                "provider": provider,
+                "model": model,
+                "prompt_length": len(prompt),
+                "prompt_preview": prompt_preview
+            }
+            
+            self.json_logger.info(_dumps(log_entry))
         
         return request_id
     
@@ -243,22 +419,6 @@ class APILogger:
             error: Error message if failed
         """
         
-        # Truncate long responses for logging
-        response_preview = response_text[:1000] + "..." if len(response_text) > 1000 else response_text
-        
-        log_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "request_id": request_id,
-            "type": "AI_RESPONSE",
-            "provider": provider,
-            "response_length": len(response_text),
-            "response_preview": response_preview,
-            "tokens_used": tokens_used,
-            "duration_ms": duration_ms,
-            "success": error is None,
-            "error": error
-        }
-        
         status_emoji = "✅" if not error else "❌"
         duration_str = f" | {duration_ms:.0f}ms" if duration_ms else ""
         tokens_str = f" | {tokens_used} tokens" if tokens_used else ""
@@ -266,7 +426,25 @@ class APILogger:
         self.api_logger.info(
             f"AI_RESPONSE | {provider} | {status_emoji} {len(response_text)} chars | ID: {request_id}{duration_str}{tokens_str}"
         )
-        self.json_logger.info(json.dumps(log_entry, ensure_ascii=False))
+        
+        if self.json_logger.isEnabledFor(logging.INFO):
+            # Truncate long responses for logging
+            response_preview = response_text[:1000] + "..." if len(response_text) > 1000 else response_text
+            
+            log_entry = {
+                "timestamp": _iso_now(),
+                "request_id": request_id,
+                "type": "AI_RESPONSE",
+                "provider": provider,
+                "response_length": len(response_text),
+                "response_preview": response_preview,
+                "tokens_used": tokens_used,
+                "duration_ms": duration_ms,
+                "success": error is None,
+                "error": error
+            }
+            
+            self.json_logger.info(_dumps(log_entry))
         
         if error:
             self.error_logger.error(f"AI_ERROR | {provider} | {error} | ID: {request_id}")
@@ -276,26 +454,20 @@ class APILogger:
         if not data:
             return data
         
-        sensitive_keys = {
-            'authorization', 'auth', 'token', 'key', 'secret', 'password', 'pass',
-            'api_key', 'apikey', 'api-key', 'bearer', 'x-api-key'
-        }
-        
-        masked_data = {}
-        for key, value in data.items():
-            key_lower = key.lower()
-            if any(sensitive in key_lower for sensitive in sensitive_keys):
-                masked_data[key] = "***MASKED***"
-            else:
-                masked_data[key] = value
+        # Common case: nothing to mask. The caller's dict is returned as is; entries are
+        # serialized straight away, so it is never held onto or modified
+        if not any(_SENSITIVE_RE.search(str(key)) for key in data):
+            return data
         
-        return masked_data
+        return {
+            key: "***MASKED***" if _SENSITIVE_RE.search(str(key)) else value
+            for key, value in data.items()
+        }
     
     def _mask_url_credentials(self, url: str) -> str:
         """Mask credentials in URLs"""
-        import re
-        # Mask API keys in URLs
-        return re.sub(r'[?&]key=([^&]+)', r'?key=***MASKED***', url)
+        # Mask API keys in URLs, keeping the original ? or & separator
+        return _URL_KEY_RE.sub(r'\1***MASKED***', url)
     
     def get_statistics(self, hours: int = 24) -> Dict[str, Any]:
         """
@@ -325,38 +497,39 @@ class APILogger:
             cutoff_time = datetime.now().timestamp() - (hours * 3600)
             durations = []
             
-            with open(json_log_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    try:
-                        entry = json.loads(line.strip())
-                        entry_time = datetime.fromisoformat(entry["timestamp"]).timestamp()
+            # The log is appended in time order, so scan from the end and stop at the
+            # first entry older than the cutoff instead of parsing the whole file
+            for line in _read_lines_reversed(json_log_file):
+                try:
+                    entry = orjson.loads(line)
+                    entry_time = datetime.fromisoformat(entry["timestamp"]).timestamp()
+                    
+                    if entry_time < cutoff_time:
+                        break
+                    
+                    if entry["type"] == "RESPONSE":
+                        api_name = entry["api_name"]
+                        stats["total_requests"] += 1
                         
-                        if entry_time < cutoff_time:
-                            continue
+                        if api_name not in stats["apis"]:
+                            stats["apis"][api_name] = {
+                                "total": 0, "success": 0, "errors": 0
+                            }
                         
-                        if entry["type"] == "RESPONSE":
-                            api_name = entry["api_name"]
-                            stats["total_requests"] += 1
-                            
-                            if api_name not in stats["apis"]:
-                                stats["apis"][api_name] = {
-                                    "total": 0, "success": 0, "errors": 0
-                                }
-                            
-                            stats["apis"][api_name]["total"] += 1
-                            
-                            if entry["success"]:
-                                stats["successful_requests"] += 1
-                                stats["apis"][api_name]["success"] += 1
-                            else:
-                                stats["failed_requests"] += 1
-                                stats["apis"][api_name]["errors"] += 1
-                            
-                            if entry.get("duration_ms"):
-                                durations.append(entry["duration_ms"])
-                    
-                    except (json.JSONDecodeError, KeyError):
-                        continue
+                        stats["apis"][api_name]["total"] += 1
+                        
+                        if entry["success"]:
+                            stats["successful_requests"] += 1
+                            stats["apis"][api_name]["success"] += 1
+                        else:
+                            stats["failed_requests"] += 1
+                            stats["apis"][api_name]["errors"] += 1
+                        
+                        if entry.get("duration_ms"):
+                            durations.append(entry["duration_ms"])
+                
+                except (ValueError, TypeError, KeyError):  # malformed line or timestamp
+                    continue
             
             # Calculate averages
             if stats["total_requests"] > 0:
@@ -373,12 +546,16 @@ class APILogger:
     def cleanup_old_logs(self, days: int = 30) -> None:
         """Remove log files older than specified days"""
         try:
-            cutoff_time = datetime.now().timestamp() - (days * 24 * 3600)
+            cutoff_time = time.time() - (days * 24 * 3600)
             
-            for log_file in self.log_dir.glob("*.log*"):
-                if log_file.stat().st_mtime < cutoff_time:
-                    log_file.unlink()
-                    self.api_logger.info(f"Cleaned up old log file: {log_file}")
+            # scandir yields the file type with each entry; only log files get stat()ed
+            with os.scandir(self.log_dir) as entries:
+                for entry in entries:
+                    if ".log" not in entry.name or not entry.is_file():
+                        continue
+                    if entry.stat().st_mtime < cutoff_time:
+                        os.unlink(entry.path)
+                        self.api_logger.info(f"Cleaned up old log file: {entry.path}")
         
         except Exception as e:
             self.error_logger.error(f"Error cleaning up logs: {e}")
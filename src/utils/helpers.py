@@ -1,10 +1,56 @@
+import bisect
 import json
+import logging
 import re
-from datetime import datetime, timezone, timedelta
+import time
+from datetime import datetime, timezone, timedelta, time as dt_time
 from typing import Dict, List, Any, Optional, Union
-import pytz
 from pathlib import Path
 
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python 3.8
+    from backports.zoneinfo import ZoneInfo
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+_FILENAME_BAD = str.maketrans(dict.fromkeys('<>:"/\\|?*', '_'))
+
+VN_TIMEZONE = "Asia/Ho_Chi_Minh"
+_VN_TZ = ZoneInfo(VN_TIMEZONE)
+
+# HOSE trading sessions (Vietnam time)
+_MKT_MORN_OPEN = dt_time(9, 0)
+_MKT_MORN_CLOSE = dt_time(11, 30)
+_MKT_AFT_OPEN = dt_time(13, 0)
+_MKT_AFT_CLOSE = dt_time(15, 0)
+
+# Risk score thresholds: scores below the first are LOW, at or above the last CRITICAL
+_RISK_THRESH = [1, 3, 5]
+_RISK_LABELS = ["LOW", "MEDIUM", "HIGH", "CRITICAL"]
+
+# Subject line emoji per advisory action
+_ACTION_EMOJI = {
+    "buy": "🚀",
+    "add": "📈",
+    "add_small": "📊",
+    "hold": "⚖️",
+    "trim": "📉",
+    "reduce": "⚠️",
+    "exit": "🚨",
+    "take_profit": "💰"
+}
+
+# Default format_large_number suffixes as (threshold, suffix), largest first
+_DEFAULT_SUFFIXES = (
+    (1_000_000_000, 'B'),   # Billion
+    (1_000_000, 'M'),       # Million
+    (1_000, 'K'),           # Thousand
+)
+
 def format_currency(value: Union[int, float], currency: str = 'VND', 
                    show_decimals: bool = False) -> str:
     """
@@ -49,20 +95,19 @@ def safe_divide(numerator: float, denominator: float, default: float = 0.0) -> f
         return default
     return numerator / denominator
 
-def convert_timezone(dt: datetime, target_tz: str = "Asia/Ho_Chi_Minh") -> datetime:
+def convert_timezone(dt: datetime, target_tz: str = VN_TIMEZONE) -> datetime:
     """Convert datetime to target timezone"""
-    target_timezone = pytz.timezone(target_tz)
+    target_timezone = _VN_TZ if target_tz == VN_TIMEZONE else ZoneInfo(target_tz)
     
     # If datetime is naive, assume UTC
     if dt.tzinfo is None:
-        dt = pytz.UTC.localize(dt)
+        dt = dt.replace(tzinfo=timezone.utc)
     
     return dt.astimezone(target_timezone)
 
 def get_vietnam_time() -> datetime:
     """Get current time in Vietnam timezone"""
-    vn_tz = pytz.timezone("Asia/Ho_Chi_Minh")
-    return datetime.now(vn_tz)
+    return datetime.now(_VN_TZ)
 
 def is_market_hours(dt: Optional[datetime] = None) -> bool:
     """
@@ -73,7 +118,7 @@ def is_market_hours(dt: Optional[datetime] = None) -> bool:
         dt = get_vietnam_time()
     
     # Convert to Vietnam time if not already
-    if dt.tzinfo != pytz.timezone("Asia/Ho_Chi_Minh"):
+    if dt.tzinfo is not _VN_TZ:
         dt = convert_timezone(dt)
     
     # Check if it's a weekday
@@ -81,13 +126,8 @@ def is_market_hours(dt: Optional[datetime] = None) -> bool:
         return False
     
     time_only = dt.time()
-    morning_start = datetime.strptime("09:00", "%H:%M").time()
-    morning_end = datetime.strptime("11:30", "%H:%M").time()
-    afternoon_start = datetime.strptime("13:00", "%H:%M").time()
-    afternoon_end = datetime.strptime("15:00", "%H:%M").time()
-    
-    return (morning_start <= time_only <= morning_end) or \
-           (afternoon_start <= time_only <= afternoon_end)
+    return (_MKT_MORN_OPEN <= time_only <= _MKT_MORN_CLOSE) or \
+           (_MKT_AFT_OPEN <= time_only <= _MKT_AFT_CLOSE)
 
 def generate_email_subject(ticker: str, action: str, date: Optional[datetime] = None) -> str:
     """Generate email subject line for stock advisory"""
@@ -95,18 +135,7 @@ def generate_email_subject(ticker: str, action: str, date: Optional[datetime] =
         date = get_vietnam_time()
     
     date_str = date.strftime("%Y-%m-%d")
-    action_emoji = {
-        "buy": "🚀",
-        "add": "📈", 
-        "add_small": "📊",
-        "hold": "⚖️",
-        "trim": "📉",
-        "reduce": "⚠️",
-        "exit": "🚨",
-        "take_profit": "💰"
-    }
-    
-    emoji = action_emoji.get(action.lower(), "📊")
+    emoji = _ACTION_EMOJI.get(action.lower(), "📊")
     return f"{emoji} {ticker} Advisory: {action.title()} - {date_str}"
 
 def parse_cron_expression(cron_expr: str) -> Dict[str, str]:
@@ -125,27 +154,30 @@ def parse_cron_expression(cron_expr: str) -> Dict[str, str]:
 
 def validate_email(email: str) -> bool:
     """Validate email address format"""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+    return _EMAIL_RE.match(email) is not None
 
 def sanitize_filename(filename: str) -> str:
     """Sanitize filename for safe file system usage"""
     # Remove or replace invalid characters
-    sanitized = re.sub(r'[<>:"/\\|?*]', '_', filename)
+    sanitized = filename.translate(_FILENAME_BAD)
     # Remove extra spaces and normalize
     sanitized = ' '.join(sanitized.split())
     # Limit length
     return sanitized[:255]
 
 def deep_merge_dicts(dict1: Dict, dict2: Dict) -> Dict:
-    """Deep merge two dictionaries"""
-    result = dict1.copy()
-    
-    for key, value in dict2.items():
-        if key in result and isinstance(result[key], dict) and isinstance(value, dict):
-            result[key] = deep_merge_dicts(result[key], value)
-        else:
-            result[key] = value
+    """Deep merge two dictionaries (iteratively; only nested dicts present in both are copied)"""
+    result = dict(dict1)
+    stack = [(result, dict2)]
+    
+    while stack:
+        dst, src = stack.pop()
+        for key, value in src.items():
+            if key in dst and isinstance(dst[key], dict) and isinstance(value, dict):
+                dst[key] = dict(dst[key])
+                stack.append((dst[key], value))
+            else:
+                dst[key] = value
     
     return result
 
@@ -161,22 +193,22 @@ def retry_with_backoff(func, max_retries: int = 3, initial_delay: float = 1.0,
         backoff_factor: Multiplier for delay on each retry
         exceptions: Tuple of exceptions to catch and retry on
     """
-    import time
-    import logging
-    
-    logger = logging.getLogger(__name__)
+    # Delay after each failed attempt, computed once up front
+    delays = tuple(initial_delay * backoff_factor ** i for i in range(max_retries))
     
-    for attempt in range(max_retries + 1):
+    for attempt, delay in enumerate(delays, start=1):
         try:
             return func()
         except exceptions as e:
-            if attempt == max_retries:
-                logger.error(f"Function failed after {max_retries + 1} attempts: {e}")
-                raise
-            
-            delay = initial_delay * (backoff_factor ** attempt)
-            logger.warning(f"Attempt {attempt + 1} failed: {e}. Retrying in {delay:.2f}s...")
+            logger.warning(f"Attempt {attempt} failed: {e}. Retrying in {delay:.2f}s...")
             time.sleep(delay)
+    
+    # Final attempt: failures propagate
+    try:
+        return func()
+    except exceptions as e:
+        logger.error(f"Function failed after {max_retries + 1} attempts: {e}")
+        raise
 
 def load_json_file(file_path: Union[str, Path], default: Any = None) -> Any:
     """
@@ -190,9 +222,8 @@ def load_json_file(file_path: Union[str, Path], default: Any = None) -> Any:
         Parsed JSON data or default value
     """
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError) as e:
+        return orjson.loads(Path(file_path).read_bytes())
+    except (FileNotFoundError, orjson.JSONDecodeError) as e:
         if default is not None:
             return default
         raise
@@ -209,8 +240,19 @@ def save_json_file(data: Any, file_path: Union[str, Path], indent: int = 2) -> N
     # Ensure directory exists
     Path(file_path).parent.mkdir(parents=True, exist_ok=True)
     
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=indent, ensure_ascii=False, default=str)
+    # orjson only indents by 2; other indent widths keep going through the json module.
+    # Datetimes and dataclasses are passed to default=str, as json.dump did, rather than
+    # getting orjson's RFC 3339 / dict forms.
+    if indent in (None, 0, 2):
+        option = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+                  | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        with open(file_path, 'wb') as f:
+            f.write(orjson.dumps(data, option=option, default=str))
+    else:
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=indent, ensure_ascii=False, default=str)
 
 def calculate_risk_score(pl_pct: float, volatility: float, max_drawdown: float) -> str:
     """
@@ -224,32 +266,16 @@ def calculate_risk_score(pl_pct: float, volatility: float, max_drawdown: float)
     Returns:
         Risk score: "LOW", "MEDIUM", "HIGH", "CRITICAL"
     """
-    risk_score = 0
-    
-    # P/L factor
-    if pl_pct < max_drawdown * 0.8:  # Close to max drawdown
-        risk_score += 3
-    elif pl_pct < 0:  # In loss
-        risk_score += 1
-    
-    # Volatility factor
-    if volatility > 0.3:  # High volatility
-        risk_score += 2
-    elif volatility > 0.2:  # Medium volatility
-        risk_score += 1
-    
-    # Drawdown proximity
-    if pl_pct < max_drawdown * 0.5:  # Very close to max drawdown
-        risk_score += 2
-    
-    if risk_score >= 5:
-        return "CRITICAL"
-    elif risk_score >= 3:
-        return "HIGH"
-    elif risk_score >= 1:
-        return "MEDIUM"
-    else:
-        return "LOW"
+    near_drawdown = max_drawdown * 0.8
+    risk_score = (
+        (pl_pct < near_drawdown) * 3                  # Close to max drawdown
+        + (near_drawdown <= pl_pct < 0) * 1           # In loss
+        + (volatility > 0.3) * 2                      # High volatility
+        + (0.2 < volatility <= 0.3) * 1               # Medium volatility
+        + (pl_pct < max_drawdown * 0.5) * 2           # Very close to max drawdown
+    )
+    
+    return _RISK_LABELS[bisect.bisect_right(_RISK_THRESH, risk_score)]
 
 def format_large_number(value: Union[int, float], suffix_map: Optional[Dict[int, str]] = None) -> str:
     """
@@ -262,18 +288,15 @@ def format_large_number(value: Union[int, float], suffix_map: Optional[Dict[int,
     Returns:
         Formatted number string
     """
-    if suffix_map is None:
-        suffix_map = {
-            9: 'B',   # Billion
-            6: 'M',   # Million
-            3: 'K'    # Thousand
-        }
-    
     if abs(value) < 1000:
         return str(int(value))
     
-    for exp, suffix in sorted(suffix_map.items(), reverse=True):
-        threshold = 10 ** exp
+    if suffix_map is None:
+        suffixes = _DEFAULT_SUFFIXES
+    else:
+        suffixes = [(10 ** exp, suffix) for exp, suffix in sorted(suffix_map.items(), reverse=True)]
+    
+    for threshold, suffix in suffixes:
         if abs(value) >= threshold:
             formatted = value / threshold
             if formatted == int(formatted):
@@ -1,11 +1,110 @@
+import atexit
 import logging
 import logging.config
+import logging.handlers
 import os
+import queue
 import sys
+import threading
+import time
 from pathlib import Path
-from datetime import datetime
 from typing import Optional
 
+import orjson
+
+class CountedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    RotatingFileHandler that only checks the file size every CHECK_EVERY records
+    
+    The file can overshoot maxBytes by up to CHECK_EVERY - 1 records before it rotates.
+    """
+    CHECK_EVERY = 256
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._count = 0
+    
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        self._count += 1
+        if self._count % self.CHECK_EVERY:
+            return False
+        return super().shouldRollover(record)
+
+class TimedMemoryHandler(logging.handlers.MemoryHandler):
+    """
+    MemoryHandler that also flushes its buffer every FLUSH_INTERVAL seconds
+    
+    Without it, records below flushLevel in a quiet process would sit in memory until
+    capacity is reached (and be lost on a hard kill).
+    """
+    FLUSH_INTERVAL = 0.5
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stopped = threading.Event()
+        threading.Thread(target=self._flush_periodically, name="log-flush", daemon=True).start()
+    
+    def _flush_periodically(self) -> None:
+        while not self._stopped.wait(self.FLUSH_INTERVAL):
+            self.flush()
+    
+    def close(self) -> None:
+        self._stopped.set()
+        super().close()
+
+class OrjsonFormatter(logging.Formatter):
+    """One JSON object per record, escaped and serialized by orjson"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'timestamp': self.formatTime(record, self.datefmt),
+            'level': record.levelname,
+            'logger': record.name,
+            'module': record.filename,
+            'line': record.lineno,
+            'message': record.getMessage()
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return orjson.dumps(entry).decode('utf-8')
+
+_FORMATTERS = {
+    'standard': {
+        'format': '%(asctime)s [%(levelname)8s] %(name)s: %(message)s',
+        'datefmt': '%Y-%m-%d %H:%M:%S'
+    },
+    'detailed': {
+        'format': '%(asctime)s [%(levelname)8s] %(name)s [%(filename)s:%(lineno)d]: %(message)s',
+        'datefmt': '%Y-%m-%d %H:%M:%S'
+    },
+    'json': {
+        '()': OrjsonFormatter,
+        'datefmt': '%Y-%m-%d %H:%M:%S'
+    }
+}
+
+# Reduce noise from third-party libraries
+_LIBRARY_LOGGERS = {
+    'urllib3': {'level': 'WARNING'},
+    'requests': {'level': 'WARNING'},
+    'httpx': {'level': 'WARNING'},
+    'apscheduler': {'level': 'INFO'},
+    'pydantic': {'level': 'WARNING'}
+}
+
+# File output runs on this listener's thread; the root logger only enqueues records
+_file_listener: Optional[logging.handlers.QueueListener] = None
+
+@atexit.register
+def _stop_file_listener() -> None:
+    """Drain queued records into the file handlers (logging.shutdown then flushes them)"""
+    global _file_listener
+    if _file_listener is not None:
+        _file_listener.stop()
+        _file_listener = None
+
 def setup_logging(log_level: str = "INFO", log_file: Optional[str] = None, 
                   enable_json: bool = False) -> logging.Logger:
     """
@@ -25,22 +124,6 @@ def setup_logging(log_level: str = "INFO", log_file: Optional[str] = None,
         log_path = Path(log_file)
         log_path.parent.mkdir(parents=True, exist_ok=True)
     
-    # Define formatters
-    formatters = {
-        'standard': {
-            'format': '%(asctime)s [%(levelname)8s] %(name)s: %(message)s',
-            'datefmt': '%Y-%m-%d %H:%M:%S'
-        },
-        'detailed': {
-            'format': '%(asctime)s [%(levelname)8s] %(name)s [%(filename)s:%(lineno)d]: %(message)s',
-            'datefmt': '%Y-%m-%d %H:%M:%S'
-        },
-        'json': {
-            'format': '{"timestamp": "%(asctime)s", "level": "%(levelname)s", "logger": "%(name)s", "module": "%(filename)s", "line": %(lineno)d, "message": "%(message)s"}',
-            'datefmt': '%Y-%m-%d %H:%M:%S'
-        }
-    }
-    
     # Select formatter
     formatter_name = 'json' if enable_json else 'standard'
     file_formatter = 'json' if enable_json else 'detailed'
@@ -59,42 +142,56 @@ def setup_logging(log_level: str = "INFO", log_file: Optional[str] = None,
     if log_file:
         handlers['file'] = {
             'level': log_level,
-            'class': 'logging.handlers.RotatingFileHandler',
+            '()': CountedRotatingFileHandler,
             'filename': log_file,
             'maxBytes': 10 * 1024 * 1024,  # 10MB
             'backupCount': 5,
             'formatter': file_formatter,
             'encoding': 'utf-8'
         }
+        # Batch file records in memory; ERROR and above, the flush timer and shutdown write them out
+        handlers['memory'] = {
+            'level': log_level,
+            'class': f'{__name__}.TimedMemoryHandler',
+            'capacity': 1000,
+            'flushLevel': logging.ERROR,
+            'target': 'file'
+        }
     
     # Logging configuration
     config = {
         'version': 1,
         'disable_existing_loggers': False,
-        'formatters': formatters,
+        # dictConfig pops keys while configuring, so it gets copies of the shared specs
+        'formatters': {name: dict(spec) for name, spec in _FORMATTERS.items()},
         'handlers': handlers,
         'root': {
             'level': log_level,
-            'handlers': list(handlers.keys())
+            'handlers': ['console', 'memory'] if log_file else ['console']
         },
-        'loggers': {
-            # Reduce noise from third-party libraries
-            'urllib3': {'level': 'WARNING'},
-            'requests': {'level': 'WARNING'},
-            'httpx': {'level': 'WARNING'},
-            'apscheduler': {'level': 'INFO'},
-            'pydantic': {'level': 'WARNING'}
-        }
+        'loggers': {name: dict(spec) for name, spec in _LIBRARY_LOGGERS.items()}
     }
     
-    # Apply configuration
+    # Apply configuration (after draining a previous file listener whose handlers it replaces)
+    _stop_file_listener()
     logging.config.dictConfig(config)
     
     # Get root logger
     logger = logging.getLogger()
     
+    # Move file output off the logging threads: the memory/file handler pair is fed
+    # by a background listener, console output stays synchronous
+    if log_file:
+        global _file_listener
+        file_output = next(h for h in logger.handlers if h.name == "memory")
+        log_queue = queue.SimpleQueue()
+        logger.removeHandler(file_output)
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        _file_listener = logging.handlers.QueueListener(log_queue, file_output, respect_handler_level=True)
+        _file_listener.start()
+    
     # Log initial message
-    logger.info(f"Logging initialized - Level: {log_level}, File: {log_file or 'None'}")
+    logger.info("Logging initialized - Level: %s, File: %s", log_level, log_file or 'None')
     
     return logger
 
@@ -105,12 +202,16 @@ def get_logger(name: str) -> logging.Logger:
 def log_function_call(func_name: str, args: tuple = (), kwargs: dict = None):
     """Decorator to log function calls"""
     def decorator(func):
+        logger = get_logger(func.__module__)
+        
         def wrapper(*args, **kwargs):
-            logger = get_logger(func.__module__)
-            logger.debug(f"Calling {func_name} with args={args}, kwargs={kwargs}")
+            debug = logger.isEnabledFor(logging.DEBUG)
+            if debug:
+                logger.debug("Calling %s with args=%r, kwargs=%r", func_name, args, kwargs)
             try:
                 result = func(*args, **kwargs)
-                logger.debug(f"{func_name} completed successfully")
+                if debug:
+                    logger.debug("%s completed successfully", func_name)
                 return result
             except Exception as e:
                 logger.error(f"{func_name} failed: {e}", exc_info=True)
@@ -120,17 +221,18 @@ def log_function_call(func_name: str, args: tuple = (), kwargs: dict = None):
 
 def log_execution_time(func):
     """Decorator to log function execution time"""
+    logger = get_logger(func.__module__)
+    
     def wrapper(*args, **kwargs):
-        logger = get_logger(func.__module__)
-        start_time = datetime.now()
+        start_time = time.perf_counter()
         
         try:
             result = func(*args, **kwargs)
-            execution_time = (datetime.now() - start_time).total_seconds()
-            logger.info(f"{func.__name__} executed in {execution_time:.2f} seconds")
+            execution_time = time.perf_counter() - start_time
+            logger.info("%s executed in %.2f seconds", func.__name__, execution_time)
             return result
         except Exception as e:
-            execution_time = (datetime.now() - start_time).total_seconds()
+            execution_time = time.perf_counter() - start_time
             logger.error(f"{func.__name__} failed after {execution_time:.2f} seconds: {e}")
             raise
     return wrapper
@@ -138,13 +240,19 @@ def log_execution_time(func):
 class LoggerMixin:
     """Mixin class to add logging capabilities to any class"""
     
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._logger = get_logger(cls.__module__ + '.' + cls.__name__)
+    
     @property
     def logger(self) -> logging.Logger:
         """Get logger for this class"""
-        return get_logger(self.__class__.__module__ + '.' + self.__class__.__name__)
+        return type(self)._logger
 
 # Default logger instance
-logger = get_logger(__name__)
+logger = logging.getLogger(__name__)
+
+def log_info(message):
     logger.info(message)
 
 def log_warning(message):
@@ -157,4 +265,4 @@ def log_debug(message):
     logger.debug(message)
 
 def log_exception(exc):
-    logger.exception(f"Exception occurred: {exc}")
\ No newline at end of file
+    logger.exception(f"Exception occurred: {exc}")
@@ -0,0 +1,52 @@
+"""
+Client-side rate limiting for outbound calls (SMTP, LLM APIs)
+- Token bucket: bursts up to capacity, then paces at a steady rate
+- Callers only wait for the exact time until the next token
+"""
+
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter
+
+    Args:
+        rate: Tokens added per second
+        capacity: Maximum number of tokens (burst size)
+    """
+
+    def __init__(self, rate: float, capacity: int = 1):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, n: int = 1) -> float:
+        """
+        Take n tokens and return how long the caller must wait before proceeding.
+        Tokens may go negative, which reserves future tokens for concurrent callers.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+
+            self.tokens -= n
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def wait(self, n: int = 1) -> float:
+        """Block until n tokens are available; returns the time slept"""
+        delay = self.acquire(n)
+        if delay:
+            time.sleep(delay)
+        return delay
@@ -0,0 +1,285 @@
+"""
+Response caching for read-mostly GET endpoints
+- Pure ASGI middleware: cache hits are replayed without reaching FastAPI routing
+- Redis backend when REDIS_URL is set (shared by all workers), in-process LRU otherwise
+- Expired entries are kept for a grace period and served if the endpoint fails
+- ETag/Cache-Control headers let clients revalidate and get an empty 304 back
+"""
+
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Fresh TTL in seconds per path; entries ending in "/" match any sub-path
+CACHE_POLICIES: Dict[str, int] = {
+    "/": 3600,
+    "/portfolio": 10,
+    "/advisory/daily": 3600,
+    "/position/": 60,
+    "/history/evolution": 300,
+    "/config/user": 60,
+}
+
+# Entries stay available this many TTLs past expiry as a fallback for failing endpoints
+STALE_GRACE_FACTOR = 24
+
+# Client-side max-age in seconds; cacheable paths not listed here must always revalidate
+CLIENT_MAX_AGE: Dict[str, int] = {
+    "/": 3600,
+    "/portfolio": 30,
+    "/advisory/daily": 3600,
+    "/history/evolution": 300,
+    "/config/user": 300,
+}
+
+
+def get_cache_ttl(path: str) -> Optional[int]:
+    """Fresh TTL for a request path, or None if the path is not cacheable"""
+    ttl = CACHE_POLICIES.get(path)
+    if ttl is not None:
+        return ttl
+
+    for prefix, prefix_ttl in CACHE_POLICIES.items():
+        if len(prefix) > 1 and prefix.endswith("/") and path.startswith(prefix):
+            return prefix_ttl
+    return None
+
+
+def get_cache_control(path: str) -> str:
+    """Cache-Control header value for a cacheable path"""
+    max_age = CLIENT_MAX_AGE.get(path)
+    return f"public, max-age={max_age}" if max_age is not None else "no-cache"
+
+
+def compute_etag(body: bytes) -> str:
+    """Strong ETag for a response body"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header value matches etag (weak comparison)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+class MemoryCacheBackend:
+    """Bounded in-process LRU store (per worker)"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+
+        expires_at, entry = item
+        if time.time() >= expires_at:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return entry
+
+    async def set(self, key: str, entry: Dict[str, Any], ttl: int) -> None:
+        self._entries[key] = (time.time() + ttl, entry)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def clear(self) -> None:
+        self._entries.clear()
+
+
+class RedisCacheBackend:
+    """Redis hash per response: JSON metadata plus the raw body bytes"""
+
+    def __init__(self, redis_url: str, prefix: str = "vnstock:http:"):
+        import redis.asyncio as redis
+
+        self.redis = redis.from_url(redis_url)
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        data = await self.redis.hgetall(self.prefix + key)
+        if not data:
+            return None
+
+        entry = json.loads(data[b"meta"])
+        entry["body"] = data[b"body"]
+        return entry
+
+    async def set(self, key: str, entry: Dict[str, Any], ttl: int) -> None:
+        meta = {k: v for k, v in entry.items() if k != "body"}
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self.prefix + key, mapping={"meta": json.dumps(meta), "body": entry["body"]})
+            pipe.expire(self.prefix + key, ttl)
+            await pipe.execute()
+
+    async def clear(self) -> None:
+        async for key in self.redis.scan_iter(match=self.prefix + "*"):
+            await self.redis.delete(key)
+
+
+class ResponseCacheMiddleware:
+    """
+    Cache successful GET responses for the paths in CACHE_POLICIES
+
+    Responses marked Cache-Control: no-store are passed through without being stored.
+    Any successful non-GET request clears the cache, since it may have changed the
+    portfolio, advisory mode or configuration the cached responses were built from.
+    Successful responses carry an ETag computed once per stored entry, and requests
+    whose If-None-Match matches it get a bodiless 304.
+    """
+
+    def __init__(self, app, redis_url: Optional[str] = None, enabled: bool = True):
+        self.app = app
+        self.enabled = enabled
+        self.backend = self._create_backend(redis_url)
+
+    @staticmethod
+    def _create_backend(redis_url: Optional[str]):
+        if redis_url:
+            try:
+                return RedisCacheBackend(redis_url)
+            except ImportError:
+                logger.warning("REDIS_URL is set but the redis package is not installed; using in-process cache")
+        return MemoryCacheBackend()
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] != "GET":
+            await self._call_and_invalidate(scope, receive, send)
+            return
+
+        ttl = get_cache_ttl(scope["path"])
+        if ttl is None:
+            await self.app(scope, receive, send)
+            return
+
+        key = f"{scope['path']}?{scope['query_string'].decode('latin-1')}"
+        if_none_match = self._request_header(scope, b"if-none-match")
+        entry = await self._get(key)
+        if entry and entry["stale_at"] > time.time():
+            await self._replay(entry, send, b"HIT", if_none_match)
+            return
+
+        # Buffer the response so a failure can fall back to the stale entry
+        messages = []
+
+        async def capture(message):
+            messages.append(message)
+
+        try:
+            await self.app(scope, receive, capture)
+        except Exception:
+            if entry is None:
+                raise
+            logger.warning(f"Serving stale cached response for {key} after endpoint error", exc_info=True)
+            await self._replay(entry, send, b"STALE", if_none_match)
+            return
+
+        status = messages[0]["status"] if messages else 500
+        if status >= 500 and entry is not None:
+            logger.warning(f"Serving stale cached response for {key} after HTTP {status}")
+            await self._replay(entry, send, b"STALE", if_none_match)
+            return
+
+        # Responses that opt out of caching (e.g. stale fallbacks) pass through unstored
+        if status != 200 or self._is_no_store(messages[0]):
+            for message in messages:
+                if message["type"] == "http.response.start":
+                    message = {**message, "headers": list(message.get("headers", [])) + [(b"x-cache", b"MISS")]}
+                await send(message)
+            return
+
+        start = messages[0]
+        body = b"".join(m.get("body", b"") for m in messages[1:])
+        headers = [(k, v) for k, v in start.get("headers", []) if k.lower() not in (b"etag", b"cache-control")]
+        headers.append((b"etag", compute_etag(body).encode("latin-1")))
+        headers.append((b"cache-control", get_cache_control(scope["path"]).encode("latin-1")))
+
+        new_entry = await self._store(key, start["status"], headers, body, ttl)
+        await self._replay(new_entry, send, b"MISS", if_none_match)
+
+    async def _call_and_invalidate(self, scope, receive, send):
+        status = 0
+
+        async def observe(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        await self.app(scope, receive, observe)
+
+        if 200 <= status < 300:
+            try:
+                await self.backend.clear()
+            except Exception as e:
+                logger.warning(f"Response cache invalidation failed: {e}")
+
+    async def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            return await self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Response cache read failed for {key}: {e}")
+            return None
+
+    async def _store(self, key: str, status: int, headers: list, body: bytes, ttl: int) -> Dict[str, Any]:
+        entry = {
+            "status": status,
+            "headers": [[k.decode("latin-1"), v.decode("latin-1")] for k, v in headers],
+            "body": body,
+            "stale_at": time.time() + ttl
+        }
+        try:
+            await self.backend.set(key, entry, ttl * STALE_GRACE_FACTOR)
+        except Exception as e:
+            logger.warning(f"Response cache write failed for {key}: {e}")
+        return entry
+
+    @staticmethod
+    def _is_no_store(start: Dict[str, Any]) -> bool:
+        """Whether a response start message carries Cache-Control: no-store"""
+        return any(
+            k.lower() == b"cache-control" and b"no-store" in v.lower()
+            for k, v in start.get("headers", [])
+        )
+
+    @staticmethod
+    def _request_header(scope, name: bytes) -> Optional[str]:
+        for key, value in scope.get("headers", []):
+            if key == name:
+                return value.decode("latin-1")
+        return None
+
+    @staticmethod
+    async def _replay(entry: Dict[str, Any], send, cache_status: bytes, if_none_match: Optional[str] = None) -> None:
+        headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in entry["headers"]]
+        etag = next((v for k, v in entry["headers"] if k.lower() == "etag"), None)
+
+        if etag and etag_matches(if_none_match, etag):
+            # 304 keeps the validators but drops the body and its entity headers
+            headers = [(k, v) for k, v in headers if k.lower() not in (b"content-length", b"content-type")]
+            headers.append((b"x-cache", cache_status))
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        headers.append((b"x-cache", cache_status))
+        await send({"type": "http.response.start", "status": entry["status"], "headers": headers})
+        await send({"type": "http.response.body", "body": entry["body"]})
@@ -13,7 +13,8 @@ sample_holdings = {
     ]
 }
 
-@pytest.fixture
+# Shared across the module: every test sets its own market data and recalculates
+@pytest.fixture(scope="module")
 def advisory_engine():
     holdings = Holdings(**sample_holdings)
     return AdvisoryEngine(holdings)
@@ -0,0 +1,117 @@
+import pytest
+import numpy as np
+import pandas as pd
+from src.advisory.indicators import TechnicalIndicators
+
+# Deterministic closing prices with both up and down moves
+prices = [100 + 10 * np.sin(i / 7) + i * 0.3 for i in range(260)]
+
+def test_rsi_insufficient_data():
+    assert TechnicalIndicators.calculate_rsi([100.0] * 10, 14) is None
+
+def test_rsi_matches_simple_average():
+    deltas = np.diff(prices)
+    gains = np.where(deltas > 0, deltas, 0)
+    losses = np.where(deltas < 0, -deltas, 0)
+    expected = round(100 - 100 / (1 + np.mean(gains[-14:]) / np.mean(losses[-14:])), 2)
+
+    assert TechnicalIndicators.calculate_rsi(prices, 14) == expected
+
+def test_rsi_accepts_ndarray():
+    assert TechnicalIndicators.calculate_rsi(np.asarray(prices), 14) == TechnicalIndicators.calculate_rsi(prices, 14)
+
+def test_rsi_only_gains():
+    assert TechnicalIndicators.calculate_rsi(list(range(1, 40)), 14) == 100
+
+def test_analyze_stock_matches_list_inputs():
+    volumes = [1000 + (i % 5) * 100 for i in range(len(prices))]
+    analysis = TechnicalIndicators.analyze_stock({"close": prices, "volume": volumes})
+
+    assert analysis["rsi14"] == TechnicalIndicators.calculate_rsi(prices, 14)
+    assert analysis["macd"] == TechnicalIndicators.calculate_macd(prices)
+    assert analysis["sma"] == TechnicalIndicators.calculate_sma(prices)
+    assert analysis["bollinger"] == TechnicalIndicators.calculate_bollinger_bands(prices)
+    assert analysis["volume"] == TechnicalIndicators.calculate_volume_indicators(volumes, prices)
+    assert analysis["support_resistance"] == TechnicalIndicators.calculate_support_resistance(prices)
+    assert "52_week" in analysis
+
+def test_support_resistance_levels():
+    window = [5.0, 1.0, 9.0, 3.0, 7.0, 2.0, 8.0, 4.0, 6.0, 10.0]
+    levels = TechnicalIndicators.calculate_support_resistance(window, period=10)
+
+    assert levels == {"support": [1.0, 2.0, 3.0], "resistance": [8.0, 9.0, 10.0]}
+    assert TechnicalIndicators.calculate_support_resistance(window, period=20) == {"support": [], "resistance": []}
+
+def test_calculate_ema():
+    from src.advisory.indicators import calculate_ema
+
+    ema = calculate_ema([1.0, 2.0, 3.0, 4.0, 5.0], 3)
+    assert ema == pytest.approx([2.0, 3.0, 4.0])
+    assert calculate_ema([1.0, 2.0], 3) is None
+
+def test_calculate_drawdown():
+    from src.advisory.indicators import calculate_drawdown
+
+    assert calculate_drawdown([100, 120, 90, 110, 60, 130]) == pytest.approx(0.5)
+    assert calculate_drawdown([]) is None
+
+def test_macd_matches_pandas_ewm():
+    series = pd.Series(prices)
+    macd = series.ewm(span=12).mean() - series.ewm(span=26).mean()
+    signal = macd.ewm(span=9).mean()
+
+    result = TechnicalIndicators.calculate_macd(prices)
+    assert result["value"] == round(macd.iloc[-1], 2)
+    assert result["signal"] == round(signal.iloc[-1], 2)
+    assert result["histogram"] == round(macd.iloc[-1] - signal.iloc[-1], 2)
+    assert result["crossover"] in ("bullish", "bearish", "neutral")
+
+def test_macd_crossover_uses_previous_histogram():
+    series = pd.Series(prices)
+    macd = series.ewm(span=12).mean() - series.ewm(span=26).mean()
+    histogram = macd - macd.ewm(span=9).mean()
+    # First bar where the histogram turns positive
+    cross = next(i for i in range(30, len(prices)) if histogram[i] > 0 and histogram[i - 1] <= 0)
+
+    assert TechnicalIndicators.calculate_macd(prices[:cross + 1])["crossover"] == "bullish"
+    assert TechnicalIndicators.calculate_macd(prices[:cross + 2])["crossover"] == "neutral"
+
+def test_sma_matches_window_means():
+    result = TechnicalIndicators.calculate_sma(prices)
+
+    for period in (20, 50, 200):
+        assert result[f"sma{period}"] == round(float(np.mean(prices[-period:])), 2)
+    assert TechnicalIndicators.calculate_sma(prices[:30])["sma50"] is None
+    assert TechnicalIndicators.calculate_sma(prices[:30])["trend"] == "neutral"
+
+@pytest.mark.parametrize("closes,expected", [
+    (list(range(1, 201)), "strong_up"),
+    (list(range(200, 0, -1)), "strong_down"),
+    ([100.0] * 200, "neutral"),
+])
+def test_sma_trend(closes, expected):
+    assert TechnicalIndicators.calculate_sma(closes)["trend"] == expected
+
+def test_sma_trend_up_without_long_term_confirmation():
+    # Long decline then a sharp rally: price > sma20 > sma50 but sma50 < sma200
+    closes = list(range(300, 150, -1)) + list(range(150, 250, 2))
+    result = TechnicalIndicators.calculate_sma(closes)
+
+    assert result["sma50"] < result["sma200"]
+    assert result["trend"] == "up"
+
+def test_52_week_range():
+    analysis = TechnicalIndicators.analyze_stock({"close": prices, "volume": [1000] * len(prices)})
+    year = prices[-252:]
+
+    assert analysis["52_week"]["high"] == max(year)
+    assert analysis["52_week"]["low"] == min(year)
+    assert analysis["52_week"]["position_pct"] == round((prices[-1] - min(year)) / (max(year) - min(year)) * 100, 2)
+
+def test_volume_indicators():
+    volumes = [1000.0] * 19 + [3000.0]
+    result = TechnicalIndicators.calculate_volume_indicators(volumes, prices[:20])
+
+    assert result == {"avg_volume_20d": 1100.0, "volume_ratio": 2.73, "volume_spike": True}
+    assert TechnicalIndicators.calculate_volume_indicators(np.asarray(volumes), prices[:20]) == result
+    assert TechnicalIndicators.calculate_volume_indicators(volumes[:5], prices[:5])["volume_spike"] is False
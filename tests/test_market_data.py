@@ -0,0 +1,25 @@
+from unittest.mock import patch
+from src.models.market_data import MarketDataCache
+
+def test_namespaces_expire_independently():
+    cache = MarketDataCache(cache_ttl_minutes=1, ttls={"fundamentals": 3600})
+    with patch("src.models.market_data.time.monotonic", return_value=0.0):
+        cache.set("quote", "FPT", {"price": 100})
+        cache.set("fundamentals", "FPT", {"pe_ratio": 12})
+
+    with patch("src.models.market_data.time.monotonic", return_value=61.0):
+        assert cache.get("quote", "FPT") is None
+        assert cache.get("fundamentals", "FPT") == {"pe_ratio": 12}
+        assert cache.get("news", "FPT") is None
+
+        info = cache.get_cache_info()
+    assert info["entries"]["fundamentals"] == 1
+    assert info["entries"]["quote"] == 0
+    assert (info["hits"], info["misses"]) == (1, 2)
+
+def test_explicit_ttl_overrides_namespace_default():
+    cache = MarketDataCache()
+    with patch("src.models.market_data.time.monotonic", return_value=0.0):
+        cache.set("news", "VNM", {"news": []}, ttl=10)
+    with patch("src.models.market_data.time.monotonic", return_value=11.0):
+        assert cache.get("news", "VNM") is None
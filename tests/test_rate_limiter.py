@@ -0,0 +1,26 @@
+import pytest
+from unittest.mock import patch
+from src.utils.rate_limiter import TokenBucket
+
+def test_burst_then_paced():
+    with patch("src.utils.rate_limiter.time.monotonic", return_value=100.0):
+        bucket = TokenBucket(rate=0.5, capacity=2)
+        assert bucket.acquire() == 0.0
+        assert bucket.acquire() == 0.0
+        # Bucket empty: next token arrives in 1 / rate seconds
+        assert bucket.acquire() == pytest.approx(2.0)
+        # Concurrent callers queue behind the reserved token
+        assert bucket.acquire() == pytest.approx(4.0)
+
+def test_refills_over_time():
+    with patch("src.utils.rate_limiter.time.monotonic", return_value=0.0):
+        bucket = TokenBucket(rate=1.0, capacity=1)
+        assert bucket.acquire() == 0.0
+    with patch("src.utils.rate_limiter.time.monotonic", return_value=5.0):
+        assert bucket.acquire() == 0.0
+
+def test_invalid_parameters():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+    with pytest.raises(ValueError):
+        TokenBucket(rate=1.0, capacity=0)
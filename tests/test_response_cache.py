@@ -0,0 +1,94 @@
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from src.utils.response_cache import ResponseCacheMiddleware, get_cache_ttl
+
+def make_client():
+    app = FastAPI()
+    state = {"calls": 0, "fail": False}
+
+    @app.get("/portfolio")
+    def portfolio():
+        state["calls"] += 1
+        if state["fail"]:
+            raise HTTPException(status_code=500, detail="LLM timeout")
+        return {"calls": state["calls"]}
+
+    @app.get("/config/user")
+    def user_config():
+        state["calls"] += 1
+        return JSONResponse({"calls": state["calls"]}, headers={"Cache-Control": "no-store"})
+
+    @app.post("/config/advisory_mode")
+    def update_mode():
+        return {"status": "success"}
+
+    app.add_middleware(ResponseCacheMiddleware)
+    return TestClient(app), state, app
+
+def test_cache_ttl_policies():
+    assert get_cache_ttl("/portfolio") == 10
+    assert get_cache_ttl("/position/FPT") == 60
+    assert get_cache_ttl("/scenario/analyze") is None
+
+def test_get_is_served_from_cache():
+    client, state, _ = make_client()
+
+    first = client.get("/portfolio")
+    second = client.get("/portfolio")
+
+    assert first.headers["x-cache"] == "MISS"
+    assert second.headers["x-cache"] == "HIT"
+    assert second.json() == {"calls": 1}
+    assert state["calls"] == 1
+
+def test_successful_write_invalidates_cache():
+    client, state, _ = make_client()
+    client.get("/portfolio")
+
+    client.post("/config/advisory_mode")
+
+    assert client.get("/portfolio").json() == {"calls": 2}
+
+def test_stale_entry_served_when_endpoint_fails():
+    client, state, app = make_client()
+    client.get("/portfolio")
+
+    # Expire the entry, then make the endpoint fail
+    cache = app.middleware_stack
+    while not isinstance(cache, ResponseCacheMiddleware):
+        cache = cache.app
+    for _, entry in cache.backend._entries.values():
+        entry["stale_at"] = 0
+    state["fail"] = True
+
+    response = client.get("/portfolio")
+    assert response.status_code == 200
+    assert response.headers["x-cache"] == "STALE"
+    assert response.json() == {"calls": 1}
+
+def test_etag_revalidation_returns_304():
+    client, state, _ = make_client()
+
+    first = client.get("/portfolio")
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "public, max-age=30"
+
+    revalidated = client.get("/portfolio", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["etag"] == etag
+
+    changed = client.get("/portfolio", headers={"If-None-Match": '"other"'})
+    assert changed.status_code == 200
+    assert changed.json() == {"calls": 1}
+
+def test_no_store_response_is_not_cached():
+    client, state, _ = make_client()
+
+    first = client.get("/config/user")
+    second = client.get("/config/user")
+
+    assert first.headers["x-cache"] == "MISS"
+    assert second.headers["x-cache"] == "MISS"
+    assert second.json() == {"calls": 2}